@@ -0,0 +1,81 @@
+"""
+A small content-addressed cache for incremental analysis of tracefiles
+
+Every derived file is keyed by the identity of its inputs (relative path, size
+and modification time of each input file) and the chain of actions which
+produced it. A derived file only needs to be regenerated if that key changes.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+CACHE_FILE = '.analysis-cache.json'
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(base: Path, files, *extra) -> str:
+    """
+    Return a digest over the identity of all `files` (relative to `base`) and
+    all `extra` parameters, e.g. the action chain. Missing files are ignored.
+    """
+    digest = hashlib.sha1()
+    for part in extra:
+        digest.update('{}\0'.format(part).encode('utf-8'))
+    for file in sorted(files, key=str):
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue
+        try:
+            name = file.relative_to(base)
+        except ValueError:
+            name = file
+        digest.update('{}\0{}\0{}\n'.format(name, stat.st_size,
+                                            stat.st_mtime_ns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class AnalysisCache(object):
+    """
+    Persistent mapping of output names to the fingerprint of the inputs they
+    were generated from, stored as json in `directory`
+    """
+
+    def __init__(self, directory: Path):
+        self.file = directory / CACHE_FILE
+        try:
+            with self.file.open() as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except ValueError:
+            logger.warning("Corrupt analysis cache {}, starting "
+                           "from scratch".format(self.file))
+            self.entries = {}
+
+    def is_fresh(self, key: str, digest: str, output: Path = None) -> bool:
+        """
+        True if `key` was generated from inputs with `digest` and, if given,
+        the `output` file still exists
+        """
+        if output is not None and not output.exists():
+            return False
+        return self.entries.get(key) == digest
+
+    def update(self, key: str, digest: str):
+        self.entries[key] = digest
+
+    def save(self):
+        try:
+            self.file.parent.mkdir(parents=True)
+        except FileExistsError:
+            pass
+        # Write to a temporary file and atomically replace the cache so an
+        # interrupted run never leaves a corrupt cache behind
+        tmp_file = self.file.with_name(self.file.name + '.tmp')
+        with tmp_file.open('w') as f:
+            json.dump(self.entries, f, sort_keys=True, indent=1)
+        os.replace(str(tmp_file), str(self.file))
@@ -1,29 +1,60 @@
+"""
+Reduce the paths of a routing message to the minimal set of paths which still
+contains all the routing information
+
+A path which is a prefix of another path of the same policy does not carry
+any additional information and can be dropped. The prefixes are found with a
+trie over the path elements (nodes and links), which keeps the reduction
+linear in the total length of all paths.
+"""
 import json
 
-
-def path_in(path, new_paths):
-    for n in new_paths:
-        if n.startswith(path):
-            return True
-    return False
+SEPARATOR = '>'
 
 
 def get_nodes(path):
-    return path.split('>')[::2]
+    return path.split(SEPARATOR)[::2]
+
+
+def reduce_paths(paths) -> list:
+    """
+    Return all paths which are no prefix of another path, without duplicates
+
+    Longer paths (by number of nodes) are returned first, paths of the same
+    length keep their original order
+    """
+    trie = {}
+    leaves = []
+    for path in paths:
+        node = trie
+        for element in path.split(SEPARATOR):
+            node = node.setdefault(element, {})
+        leaves.append((path, node))
+
+    result = []
+    seen = set()
+    for path, node in leaves:
+        # A non-empty trie node means that a longer path continues this one
+        if node or path in seen:
+            continue
+        seen.add(path)
+        result.append(path)
+    result.sort(key=lambda p: -len(get_nodes(p)))
+    return result
+
+
+def reduce_msg(msg: dict) -> dict:
+    """
+    Replace the routing-data of a parsed routing message with the reduced
+    lists of paths per policy, the message is modified in place
+    """
+    routing_data = msg.get('routing-data')
+    if routing_data:
+        for policy, nodes in routing_data.items():
+            routing_data[policy] = reduce_paths(
+                node['path'] for node in nodes.values() if node is not None)
+    return msg
 
 
 def compress_paths(msg: str) -> str:
-    msg = json.loads(msg)
-    if 'routing-data' in msg:
-        for policy, nodes in msg.get('routing-data').items():
-            paths = [node['path'] for node in nodes.values() if node is not None]
-            paths = sorted(paths, key=lambda p: -len(get_nodes(p)))
-
-            new_paths = []
-
-            for path in paths:
-                if not path_in(path, new_paths):
-                    new_paths.append(path)
-            msg['routing-data'][policy] = new_paths
-
-    return json.dumps(msg, separators=(',', ':'))
+    return json.dumps(reduce_msg(json.loads(msg)), separators=(',', ':'))
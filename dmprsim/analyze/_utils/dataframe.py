@@ -0,0 +1,181 @@
+"""
+Load tracefiles of one or many scenario directories into a pandas DataFrame
+
+The tracefiles are parsed in chunks of a fixed number of messages, categorical
+columns are encoded on the fly, so memory usage is bounded by the (compact)
+resulting columns. The columns of every scenario directory are cached in a
+numpy `.npz` file next to the traces and reused as long as the tracefiles do
+not change.
+
+Resulting columns:
+- run (category): the run directory, relative to the parent of the scenario
+  directory
+- router (category): the router which logged the message
+- time (float64): the simulation time
+- sender (category): the id of the sending router
+- type (category): the message type
+- size (int64): the size of the serialized message in bytes
+"""
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dmprsim.analyze._utils.cache import fingerprint
+from dmprsim.analyze._utils.extract_messages import find_runs
+
+CHUNK_SIZE = 100000
+CACHE_FILE = '.{}.columns.npz'
+# Bump if the layout of the cached columns changes
+CACHE_VERSION = 1
+
+CATEGORICALS = ('run', 'router', 'sender', 'type')
+NUMERICALS = (('time', np.float64), ('size', np.int64))
+COLUMNS = ('run', 'router', 'time', 'sender', 'type', 'size')
+
+logger = logging.getLogger(__name__)
+
+
+class _CategoryEncoder(object):
+    """
+    Assign integer codes to category values in order of their appearance
+    """
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, value) -> int:
+        try:
+            return self.codes[value]
+        except KeyError:
+            code = self.codes[value] = len(self.codes)
+            return code
+
+    @property
+    def categories(self) -> np.ndarray:
+        categories = sorted(self.codes, key=self.codes.get)
+        return np.array(['' if c is None else str(c) for c in categories],
+                        dtype=str)
+
+
+def _tracefiles(scenario_dir: Path, tracepoint: str):
+    for run_dir in find_runs(scenario_dir):
+        run = str(run_dir.relative_to(scenario_dir.parent))
+        for router_dir in sorted((run_dir / 'routers').iterdir()):
+            yield run, router_dir.name, router_dir / 'trace' / tracepoint
+
+
+def _parse(scenario_dir: Path, tracepoint: str, chunk_size: int) -> dict:
+    encoders = {name: _CategoryEncoder() for name in CATEGORICALS}
+    chunks = {name: [] for name in COLUMNS}
+    rows = {name: [] for name in COLUMNS}
+    dtypes = dict(NUMERICALS)
+    dtypes.update((name, np.int32) for name in CATEGORICALS)
+
+    def flush():
+        for name in COLUMNS:
+            chunks[name].append(np.array(rows[name], dtype=dtypes[name]))
+            rows[name] = []
+
+    for run, router, tracefile in _tracefiles(scenario_dir, tracepoint):
+        run_code = encoders['run'].encode(run)
+        router_code = encoders['router'].encode(router)
+        try:
+            f = tracefile.open()
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                time, _, raw = line.partition(' ')
+                raw = raw.rstrip('\n')
+                if not raw:
+                    continue
+                msg = json.loads(raw)
+                rows['run'].append(run_code)
+                rows['router'].append(router_code)
+                rows['time'].append(float(time))
+                rows['sender'].append(encoders['sender'].encode(msg.get('id')))
+                rows['type'].append(encoders['type'].encode(msg.get('type')))
+                rows['size'].append(len(raw))
+                if len(rows['time']) >= chunk_size:
+                    flush()
+    flush()
+
+    columns = {name: np.concatenate(chunks[name]) for name in COLUMNS}
+    for name in CATEGORICALS:
+        columns[name + '_categories'] = encoders[name].categories
+    return columns
+
+
+def _load_columns(scenario_dir: Path, tracepoint: str, chunk_size: int,
+                  use_cache: bool) -> dict:
+    files = [tracefile for _, _, tracefile in
+             _tracefiles(scenario_dir, tracepoint)]
+    digest = fingerprint(scenario_dir, files, tracepoint, CACHE_VERSION)
+    cache_file = scenario_dir / CACHE_FILE.format(tracepoint)
+
+    if use_cache:
+        try:
+            with np.load(str(cache_file)) as cached:
+                if str(cached['fingerprint']) == digest:
+                    logger.debug("Using cached columns {}".format(cache_file))
+                    return {name: cached[name] for name in cached.files
+                            if name != 'fingerprint'}
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            pass
+
+    logger.info("Parsing {} tracefiles in {}".format(tracepoint,
+                                                     scenario_dir))
+    columns = _parse(scenario_dir, tracepoint, chunk_size)
+    if use_cache:
+        # np.savez appends .npz to names without that suffix
+        tmp_file = cache_file.with_name(cache_file.name + '.tmp.npz')
+        np.savez(str(tmp_file), fingerprint=np.array(digest), **columns)
+        tmp_file.replace(cache_file)
+    return columns
+
+
+def _merge_categorical(parts: list, name: str) -> pd.Categorical:
+    """
+    Merge the codes of all parts into one categorical with the union of all
+    categories
+    """
+    categories = np.unique(np.concatenate(
+        [part[name + '_categories'] for part in parts]))
+    codes = []
+    for part in parts:
+        # Map the codes of this part onto the merged categories
+        mapping = np.searchsorted(categories, part[name + '_categories'])
+        codes.append(mapping[part[name]] if len(mapping) else part[name])
+    return pd.Categorical.from_codes(
+        np.concatenate(codes).astype(np.int32), categories)
+
+
+def load_traces(scenario_dirs, tracepoint: str = 'tx.msg',
+                chunk_size: int = CHUNK_SIZE,
+                use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load the tracefiles of one or many scenario directories into a DataFrame
+
+    :param scenario_dirs: A scenario directory or a list of them, each may be
+        a single run or contain multiple runs in subdirectories
+    :param tracepoint: The tracepoint to load, e.g. tx.msg or rx.msg.valid
+    :param chunk_size: The number of messages parsed before they are
+        converted into compact columns
+    :param use_cache: Read and write the column cache next to the traces
+    """
+    if isinstance(scenario_dirs, (str, Path)):
+        scenario_dirs = [scenario_dirs]
+    parts = [_load_columns(Path(scenario_dir), tracepoint, chunk_size,
+                           use_cache)
+             for scenario_dir in scenario_dirs]
+
+    data = {}
+    for name in COLUMNS:
+        if name in CATEGORICALS:
+            data[name] = _merge_categorical(parts, name)
+        else:
+            data[name] = np.concatenate([part[name] for part in parts])
+    return pd.DataFrame(data, columns=COLUMNS)
@@ -1,36 +1,84 @@
 """
-Count duplicate paths in a message
+Count duplicate paths in routing messages and estimate the savings of a wire
+format which transmits every distinct path only once per message
 """
 
+import collections
 import json
 import sys
+from pathlib import Path
+
+FIELDS = ('messages', 'paths', 'duplicates', 'bytes', 'interned_bytes')
 
 
 def count_dupl(m: dict):
+    """
+    Return the number of paths and the number of duplicate paths of a
+    routing message or None if the message contains no routing data
+    """
     if 'routing-data' not in m:
         return
-    paths = []
-    for policy, p in m['routing-data'].items():
-        for node, path in p.items():
-            paths.append(path['path'])
+    paths = [path['path'] for p in m['routing-data'].values()
+             for path in p.values() if path is not None]
 
     num_paths = len(paths)
     num_dupl = num_paths - len(set(paths))
     return num_paths, num_dupl
 
 
+def intern_paths(m: dict) -> dict:
+    """
+    Return a copy of the routing message where all paths are moved into a
+    table of distinct paths and replaced by their index in that table, the
+    other fields of the node entries are kept
+    """
+    table = {}
+    routing_data = {}
+    for policy, nodes in m['routing-data'].items():
+        routing_data[policy] = {
+            node: None if entry is None else
+            dict(entry, path=table.setdefault(entry['path'], len(table)))
+            for node, entry in nodes.items()
+        }
+    interned = dict(m)
+    interned['routing-data'] = routing_data
+    interned['paths'] = sorted(table, key=table.get)
+    return interned
+
+
+def analyze_tracefile(tracefile: Path) -> collections.Counter:
+    """
+    Stream over a tx.msg tracefile and sum up the statistics in FIELDS for all
+    messages containing routing data
+    """
+    stats = collections.Counter()
+    try:
+        with tracefile.open() as f:
+            for line in f:
+                _, _, msg = line.partition(' ')
+                msg = msg.strip()
+                if not msg:
+                    continue
+                m = json.loads(msg)
+                counts = count_dupl(m)
+                if counts is None:
+                    continue
+                stats['messages'] += 1
+                stats['paths'] += counts[0]
+                stats['duplicates'] += counts[1]
+                stats['bytes'] += len(msg)
+                stats['interned_bytes'] += len(
+                    json.dumps(intern_paths(m), sort_keys=True,
+                               separators=(',', ':')))
+    except FileNotFoundError:
+        pass
+    return stats
+
+
 def main():
-    with open(sys.argv[1]) as f:
-        messages = list(f)
-
-    dupls = set()
-    for m in messages:
-        dupls.add(count_dupl(json.loads(m)))
-    if None in dupls:
-        dupls.remove(None)
-    for num_paths, num_dupl in sorted(dupls, key=lambda x: x[0]):
-        print('{} | {} | {:.2%}'.format(num_paths, num_dupl,
-                                        num_dupl / num_paths))
+    stats = analyze_tracefile(Path(sys.argv[1]))
+    for field in FIELDS:
+        print('{}: {}'.format(field, stats[field]))
 
 
 if __name__ == '__main__':
@@ -8,14 +8,35 @@ def all_tracefiles(input_dirs, tracepoint) -> tuple:
             yield router.name, tracefile
 
 
-def extract_messages(tracefile: Path) -> list:
-    messages = []
+def find_runs(scenario_dir: Path) -> list:
+    """
+    Return all run directories, i.e. directories with a routers subdirectory
+    """
+    if (scenario_dir / 'routers').is_dir():
+        return [scenario_dir]
+    return sorted(p.parent for p in scenario_dir.glob('**/routers')
+                  if p.is_dir())
+
+
+def iter_messages(tracefile: Path, start: float = None, end: float = None):
+    """
+    Yield the (time, message) entries of a tracefile one by one, only those
+    with start <= time < end if given, the tracefile is ordered by time and
+    only read up to end
+    """
     try:
         with tracefile.open() as f:
             for line in f:
-                time = line.split()[0]
-                msg = ' '.join(line.split()[1:])
-                messages.append((time, msg))
+                fields = line.split()
+                time = fields[0]
+                if end is not None and float(time) >= end:
+                    return
+                if start is not None and float(time) < start:
+                    continue
+                yield time, ' '.join(fields[1:])
     except FileNotFoundError:
         pass
-    return messages
+
+
+def extract_messages(tracefile: Path) -> list:
+    return list(iter_messages(tracefile))
@@ -3,13 +3,18 @@ Helper methods to process tracefiles
 """
 
 import argparse
+import collections
+import json
+import logging
 import lzma
 import zlib
 from pathlib import Path
 
-from dmprsim.analyze._utils.compress_path import compress_paths
+from dmprsim.analyze._utils.compress_path import reduce_msg
 from dmprsim.analyze._utils.extract_messages import extract_messages
 
+logger = logging.getLogger(__name__)
+
 
 def extract(input_file: Path):
     try:
@@ -31,8 +36,18 @@ def messages_lzma(messages: list):
     return (lzma.compress(m.encode('utf-8')) for m in messages)
 
 
-def reduce_paths(messages: list):
-    return (compress_paths(m) for m in messages)
+def reduce_paths(messages: list, stats: collections.Counter = None):
+    """
+    Reduce the paths of all messages, the bytes saved are counted in
+    stats['saved'] message by message
+    """
+    if stats is None:
+        stats = collections.Counter()
+    for message in messages:
+        reduced = json.dumps(reduce_msg(json.loads(message)),
+                             separators=(',', ':'))
+        stats['saved'] += len(message) - len(reduced)
+        yield reduced
 
 
 ACTIONS = {
@@ -43,14 +58,27 @@ ACTIONS = {
 }
 
 
-def process_files(dirs: list, output: Path, actions: list):
+def process_files(dirs: list, output: Path, actions: list) -> int:
+    """
+    Apply the actions to all messages of the tracefiles and write the results
+    to output, one line per message
+
+    :return: The number of bytes saved by the 'reduce' action
+    """
+    stats = collections.Counter()
     with output.open('w') as f:
         for input_file in dirs:
             messages = extract(input_file)
             for action in actions:
-                messages = ACTIONS[action](messages)
+                if action == 'reduce':
+                    messages = reduce_paths(messages, stats)
+                else:
+                    messages = ACTIONS[action](messages)
             f.write('\n'.join(str(i) for i in messages))
             f.write('\n')
+    if 'reduce' in actions:
+        logger.debug('path reduction saved {} bytes'.format(stats['saved']))
+    return stats['saved']
 
 
 def main():
@@ -64,7 +92,10 @@ def main():
     args = parser.parse_args()
 
     actions = [action.strip() for action in args.action.split(',')]
-    process_files(args.input, args.output, actions)
+    saved = process_files([Path(i) for i in args.input], Path(args.output),
+                          actions)
+    if 'reduce' in actions:
+        print('path reduction saved {} bytes'.format(saved))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,32 @@
+"""
+Summary statistics for replicated simulation runs
+"""
+import math
+
+# Two-sided 95% quantiles of the student t distribution by degrees of freedom
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160,
+    14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093,
+    20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060,
+    26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+}
+Z_95 = 1.960
+
+
+def mean_confidence_interval(values) -> tuple:
+    """
+    Return (n, mean, lower, upper) of the 95% confidence interval of the mean
+    of `values`, None values are ignored. The bounds are None for less than
+    two values
+    """
+    values = [v for v in values if v is not None]
+    n = len(values)
+    if not n:
+        return 0, None, None, None
+    mean = sum(values) / n
+    if n < 2:
+        return n, mean, None, None
+    variance = sum((v - mean) ** 2 for v in values) / (n - 1)
+    half_width = T_95.get(n - 1, Z_95) * math.sqrt(variance / n)
+    return n, mean, mean - half_width, mean + half_width
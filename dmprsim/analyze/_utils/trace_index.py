@@ -0,0 +1,267 @@
+"""
+Import tracefiles into an indexed SQLite database for ad-hoc queries
+
+All runs below a scenario directory (every directory containing a `routers`
+subdirectory) are imported with their router configurations and the tx.msg and
+rx.msg.valid tracefiles. Besides the message metadata, the first time every
+node is mentioned in a message (as the sender or in the routing data) of a
+tracefile is stored in a separate table, so questions like "when did router 3
+first learn about router 7" can be answered with a single index lookup.
+
+Usage:
+    python3 -m dmprsim.analyze._utils.trace_index import SCENARIO_DIR DB
+    python3 -m dmprsim.analyze._utils.trace_index query DB large-messages \\
+        --min-size 1000 --start 300 --end 400
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+from pathlib import Path
+
+from dmprsim.analyze._utils.extract_messages import find_runs
+
+TRACEPOINTS = ('tx.msg', 'rx.msg.valid')
+BATCH_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS routers (
+    run INTEGER NOT NULL,
+    router TEXT NOT NULL,
+    config TEXT,
+    PRIMARY KEY (run, router)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    run INTEGER NOT NULL,
+    router TEXT NOT NULL,
+    tracepoint TEXT NOT NULL,
+    time REAL NOT NULL,
+    sender TEXT,
+    type TEXT,
+    size INTEGER NOT NULL,
+    msg TEXT
+);
+CREATE TABLE IF NOT EXISTS known_nodes (
+    run INTEGER NOT NULL,
+    router TEXT NOT NULL,
+    tracepoint TEXT NOT NULL,
+    time REAL NOT NULL,
+    node TEXT NOT NULL,
+    PRIMARY KEY (run, router, tracepoint, node)
+);
+"""
+
+# Indices are created after the bulk import, which is a lot faster than
+# updating them on every insert
+INDICES = """
+CREATE INDEX IF NOT EXISTS messages_time
+    ON messages (tracepoint, time);
+CREATE INDEX IF NOT EXISTS messages_router
+    ON messages (run, router, tracepoint, time);
+"""
+
+QUERIES = {
+    'large-messages': (
+        "Routers which sent messages larger than --min-size bytes between "
+        "--start and --end",
+        """
+        SELECT runs.name, router, count(*), max(size)
+        FROM messages JOIN runs ON runs.id = messages.run
+        WHERE tracepoint = 'tx.msg' AND time BETWEEN :start AND :end
+            AND size > :min_size
+        GROUP BY run, router
+        ORDER BY runs.name, count(*) DESC
+        """,
+    ),
+    'first-learned': (
+        "The first time --router received a valid message mentioning --node",
+        """
+        SELECT runs.name, min(time)
+        FROM known_nodes JOIN runs ON runs.id = known_nodes.run
+        WHERE router = :router AND node = :node
+            AND tracepoint = 'rx.msg.valid'
+        GROUP BY run
+        ORDER BY runs.name
+        """,
+    ),
+    'message-stats': (
+        "Number of messages and their sizes per router and tracepoint "
+        "between --start and --end",
+        """
+        SELECT runs.name, router, tracepoint, count(*), min(size),
+            avg(size), max(size)
+        FROM messages JOIN runs ON runs.id = messages.run
+        WHERE time BETWEEN :start AND :end
+        GROUP BY run, router, tracepoint
+        ORDER BY runs.name, router, tracepoint
+        """,
+    ),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def connect(database: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(database))
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _mentioned_nodes(msg: dict) -> set:
+    nodes = {msg.get('id')}
+    for policy_data in (msg.get('routing-data') or {}).values():
+        nodes.update(policy_data)
+    nodes.discard(None)
+    return nodes
+
+
+def _read_trace(run: int, router: str, tracepoint: str, tracefile: Path,
+                store_messages: bool, first: dict):
+    """
+    Yield the message row of every traced message and update `first` with
+    the earliest time every mentioned node was seen
+    """
+    with tracefile.open() as f:
+        for line in f:
+            time, _, raw = line.partition(' ')
+            raw = raw.rstrip('\n')
+            if not raw:
+                continue
+            msg = json.loads(raw)
+            time = float(time)
+            message = (run, router, tracepoint, time, msg.get('id'),
+                       msg.get('type'), len(raw),
+                       raw if store_messages else None)
+            for node in _mentioned_nodes(msg):
+                if node not in first or time < first[node]:
+                    first[node] = time
+            yield message
+
+
+def _flush(conn: sqlite3.Connection, messages: list, nodes: list):
+    conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     messages)
+    conn.executemany("INSERT INTO known_nodes VALUES (?, ?, ?, ?, ?)", nodes)
+    del messages[:]
+    del nodes[:]
+
+
+def import_run(conn: sqlite3.Connection, run_dir: Path, name: str,
+               store_messages: bool = False) -> int:
+    """
+    Import (or re-import) one run and return the number of imported messages
+    """
+    conn.execute("INSERT OR IGNORE INTO runs (name) VALUES (?)", (name,))
+    run, = conn.execute("SELECT id FROM runs WHERE name = ?",
+                        (name,)).fetchone()
+    for table in ('routers', 'messages', 'known_nodes'):
+        conn.execute("DELETE FROM {} WHERE run = ?".format(table), (run,))
+
+    count = 0
+    messages = []
+    nodes = []
+    for router_dir in sorted((run_dir / 'routers').iterdir()):
+        router = router_dir.name
+        try:
+            config = (router_dir / 'config').read_text()
+        except FileNotFoundError:
+            config = None
+        conn.execute("INSERT INTO routers VALUES (?, ?, ?)",
+                     (run, router, config))
+
+        for tracepoint in TRACEPOINTS:
+            tracefile = router_dir / 'trace' / tracepoint
+            if not tracefile.exists():
+                continue
+            first = {}
+            for message in _read_trace(run, router, tracepoint, tracefile,
+                                       store_messages, first):
+                messages.append(message)
+                count += 1
+                if len(messages) >= BATCH_SIZE:
+                    _flush(conn, messages, nodes)
+            nodes.extend((run, router, tracepoint, time, node)
+                         for node, time in first.items())
+    _flush(conn, messages, nodes)
+    return count
+
+
+def import_scenario(scenario_dir: Path, database: Path,
+                    store_messages: bool = False) -> int:
+    """
+    Import all runs of a scenario directory into the database and return the
+    number of imported messages
+    """
+    conn = connect(database)
+    # The database can be rebuilt from the tracefiles at any time, so we trade
+    # durability for import speed
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    count = 0
+    try:
+        with conn:
+            for run_dir in find_runs(scenario_dir):
+                name = str(run_dir.relative_to(scenario_dir))
+                logger.info("Importing run {}".format(name))
+                count += import_run(conn, run_dir, name, store_messages)
+        conn.executescript(INDICES)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return count
+
+
+def query(database: Path, name: str, **params) -> list:
+    conn = connect(database)
+    try:
+        return conn.execute(QUERIES[name][1], params).fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="import tracefiles into a SQLite database and query it")
+    sub_parsers = parser.add_subparsers(dest='command')
+    sub_parsers.required = True
+
+    import_parser = sub_parsers.add_parser('import', help='import a scenario')
+    import_parser.add_argument('scenario_dir', type=Path)
+    import_parser.add_argument('database', type=Path)
+    import_parser.add_argument('--store-messages', action='store_true',
+                               help='also store the raw messages')
+
+    query_parser = sub_parsers.add_parser(
+        'query', help='run a prepared query',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='\n'.join('{}: {}'.format(name, help_)
+                              for name, (help_, _) in sorted(QUERIES.items())))
+    query_parser.add_argument('database', type=Path)
+    query_parser.add_argument('query', choices=sorted(QUERIES))
+    query_parser.add_argument('--start', type=float, default=float('-inf'))
+    query_parser.add_argument('--end', type=float, default=float('inf'))
+    query_parser.add_argument('--min-size', type=int, default=0)
+    query_parser.add_argument('--router')
+    query_parser.add_argument('--node')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'import':
+        count = import_scenario(args.scenario_dir, args.database,
+                                args.store_messages)
+        print('Imported {} messages'.format(count))
+    else:
+        rows = query(args.database, args.query, start=args.start,
+                     end=args.end, min_size=args.min_size,
+                     router=args.router, node=args.node)
+        for row in rows:
+            print('\t'.join(str(column) for column in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,21 @@
 """
-Draw a sequence diagram of all transmitted messages,
+Draw sequence diagrams of all transmitted messages, one per time window,
 requires rx.msg.valid tracepoint
 """
+import html
 import json
+import logging
+import multiprocessing
 from pathlib import Path
 
-from seqdiag import builder, drawer, parser as seq_parser
-
 from dmprsim.analyze._utils.extract_messages import all_tracefiles, \
-    extract_messages
-from dmprsim.scenarios.disappearing_node import main as scenario
+    iter_messages
+from dmprsim.scenarios.disappearing_node import DISAPPEAR_TIME, \
+    REAPPEAR_TIME, SIMULATION_TIME, main as scenario
+
+# Seconds of simulated time per diagram
+WINDOW = 60
+DIAGRAM_DIR = 'sequence_diagrams'
 
 skel = """
    seqdiag {{
@@ -18,51 +24,133 @@ skel = """
    }}
 """
 
+logger = logging.getLogger(__name__)
 
-def main(args, results_dir: Path, scenario_dir: Path):
-    scenario(args, results_dir, scenario_dir)
 
-    if not getattr(args, 'sequence_diagram', False):
-        return
-    routers = set()
-    messages = {}
-    for router, tracefile in all_tracefiles([scenario_dir], 'rx.msg.valid'):
-        routers.add(router)
-        for time, message in extract_messages(tracefile):
-            messages.setdefault(time, []).append((router, message))
+def windows(window: int = WINDOW, around_events: bool = False) -> list:
+    """
+    The (start, end) seconds of the diagrams, either consecutive windows
+    over the whole simulation or one window centered on the disappearance
+    and the reappearance of the node
+    """
+    if around_events:
+        return [(max(0, event - window // 2), event + window - window // 2)
+                for event in (DISAPPEAR_TIME, REAPPEAR_TIME)]
+    return [(start, min(start + window, SIMULATION_TIME))
+            for start in range(0, SIMULATION_TIME, window)]
 
+
+def diagram_source(routers, messages) -> str:
+    """
+    The seqdiag source of the (time, receiver, message) entries
+    """
     diag = []
     diag_skel = '{sender} -> {receiver} [label="{time}\n{type}\n{data}"]'
-    for time in sorted(messages, key=float):
-        for receiver, message in messages[time]:
-            message = json.loads(message)
-            sender = message['id']
-            type = message['type']
-            data = []
-            if 'routing-data' in message:
-                for policy in message['routing-data']:
-                    for node, path in message['routing-data'][policy].items():
-                        if path is not None:
-                            path = path['path']
-                        data.append('{}: {}'.format(node, path))
-            data = '\n'.join(sorted(data))
-
-            diag.append(diag_skel.format(sender=sender,
-                                         receiver=receiver,
-                                         type=type,
-                                         data=data,
-                                         time=time))
+    for time, receiver, message in messages:
+        message = json.loads(message)
+        sender = message['id']
+        type = message['type']
+        data = []
+        if 'routing-data' in message:
+            for policy in message['routing-data']:
+                for node, path in message['routing-data'][policy].items():
+                    if path is not None:
+                        path = path['path']
+                    data.append('{}: {}'.format(node, path))
+        data = '\n'.join(sorted(data))
+
+        diag.append(diag_skel.format(sender=sender,
+                                     receiver=receiver,
+                                     type=type,
+                                     data=data,
+                                     time=time))
 
     diag.insert(0, ';'.join(sorted(routers)) + ';')
-    result = skel.format('\n'.join(diag))
+    return skel.format('\n'.join(diag))
 
-    tree = seq_parser.parse_string(result)
+
+def window_messages(tracefiles, start: int, end: int) -> list:
+    """
+    Read the messages received in [start, end) from the tracefiles, ordered
+    by time
+    """
+    messages = []
+    for router, tracefile in tracefiles:
+        messages.extend((time, router, message) for time, message
+                        in iter_messages(tracefile, start, end))
+    messages.sort(key=lambda entry: float(entry[0]))
+    return messages
+
+
+def _render_window(job) -> int:
+    """
+    Draw the diagram of a (tracefiles, start, end, type, filename) job,
+    returns the number of messages
+    """
+    from seqdiag import builder, drawer, parser as seq_parser
+
+    tracefiles, start, end, diag_type, filename = job
+    messages = window_messages(tracefiles, start, end)
+    if not messages:
+        return 0
+    routers = [router for router, _ in tracefiles]
+    tree = seq_parser.parse_string(diagram_source(routers, messages))
     diagram = builder.ScreenNodeBuilder.build(tree)
-    filename = str(results_dir / 'sequence_diagram.svg')
+    draw = drawer.DiagramDraw(diag_type, diagram, filename=filename)
+    draw.draw()
+    draw.save()
+    return len(messages)
+
+
+def write_index(path: Path, entries: list):
+    """
+    Write an html page linking the diagrams of all (start, end, filename,
+    messages) entries
+    """
+    with path.open('w') as f:
+        f.write('<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8">'
+                '<title>Sequence diagrams</title></head>\n<body>\n'
+                '<h1>Sequence diagrams</h1>\n<p>The node disappears after '
+                '{} and reappears after {} seconds.</p>\n<ul>\n'.format(
+                    DISAPPEAR_TIME, REAPPEAR_TIME))
+        for start, end, filename, messages in entries:
+            label = '{} - {} s'.format(start, end)
+            if messages:
+                f.write('<li><a href="{}">{}</a>, {} messages</li>\n'.format(
+                    html.escape(filename), label, messages))
+            else:
+                f.write('<li>{}, no messages</li>\n'.format(label))
+        f.write('</ul>\n</body>\n</html>\n')
+
+
+def main(args, results_dir: Path, scenario_dir: Path):
+    scenario(args, results_dir, scenario_dir)
+
+    if not getattr(args, 'sequence_diagram', False):
+        return
+
+    diagram_dir = results_dir / DIAGRAM_DIR
     try:
-        results_dir.mkdir(parents=True)
+        diagram_dir.mkdir(parents=True)
     except FileExistsError:
         pass
-    draw = drawer.DiagramDraw(args.seq_diag_type, diagram, filename=filename)
-    draw.draw()
-    draw.save()
+
+    tracefiles = sorted(all_tracefiles([scenario_dir], 'rx.msg.valid'))
+    diag_type = args.seq_diag_type
+    jobs = []
+    for start, end in windows(getattr(args, 'seq_diag_window', WINDOW),
+                              getattr(args, 'seq_diag_events', False)):
+        filename = '{:04}-{:04}.{}'.format(start, end, diag_type.lower())
+        jobs.append((tracefiles, start, end, diag_type,
+                     str(diagram_dir / filename)))
+
+    pool = multiprocessing.Pool(getattr(args, 'processes', None))
+    counts = pool.map(_render_window, jobs, chunksize=1)
+    pool.close()
+    pool.join()
+
+    write_index(diagram_dir / 'index.html', [
+        (start, end, Path(filename).name, messages)
+        for (_, start, end, _, filename), messages in zip(jobs, counts)])
+    logger.info("Drew {} sequence diagrams into {}".format(
+        sum(1 for messages in counts if messages), diagram_dir))
@@ -0,0 +1,86 @@
+"""
+Aggregate duplicate paths of all transmitted routing messages of the
+message-size scenario per network size and density and estimate how much a
+path-interning wire format would save
+"""
+
+import collections
+import logging
+import multiprocessing
+from pathlib import Path
+
+from dmprsim.analyze._utils.duplicate_paths import FIELDS, analyze_tracefile
+
+RESULT_FILE = 'duplicate_paths.md'
+
+logger = logging.getLogger(__name__)
+
+
+def _tracefiles(input: Path):
+    """
+    Yield ((size, density), tracefile) for all tx.msg tracefiles of the
+    combination directories `size-density-loss-interval` in input
+    """
+    for dir in input.glob('*-*-*-*'):
+        try:
+            size, density, _, _ = (int(i) for i in dir.name.split('-'))
+        except ValueError:
+            continue
+        for tracefile in dir.glob('routers/*/trace/tx.msg'):
+            yield (size, density), tracefile
+
+
+def _worker(args):
+    key, tracefile = args
+    return key, analyze_tracefile(tracefile)
+
+
+def aggregate(input: Path, processes: int = None) -> dict:
+    """
+    Analyze all tracefiles in a process pool and return the summed up
+    statistics per (size, density)
+    """
+    results = collections.defaultdict(collections.Counter)
+    pool = multiprocessing.Pool(processes)
+    for key, stats in pool.imap_unordered(_worker, _tracefiles(input),
+                                          chunksize=20):
+        results[key].update(stats)
+    pool.close()
+    pool.join()
+    return results
+
+
+def write_table(results: dict, output: Path):
+    with output.open('w') as f:
+        f.write('| size | density | messages | paths | duplicates | '
+                'bytes | interned bytes | savings |\n')
+        f.write('|---:|---:|---:|---:|---:|---:|---:|---:|\n')
+        for (size, density), stats in sorted(results.items()):
+            if not stats['bytes']:
+                continue
+            savings = 1 - stats['interned_bytes'] / stats['bytes']
+            f.write('| {} | {} | {} | {} | {} | {} | {} | {:.2%} |\n'.format(
+                size, density, *(stats[field] for field in FIELDS),
+                savings))
+
+
+def main(args, results_dir: Path, scenario_dir: Path):
+    input = Path(getattr(args, 'input', None) or scenario_dir)
+    try:
+        results_dir.mkdir(parents=True)
+    except FileExistsError:
+        pass
+
+    logger.info('Analyzing duplicate paths in {}'.format(input))
+    results = aggregate(input, getattr(args, 'processes', None))
+    if not results:
+        logger.warning('No tx.msg tracefiles found in {}, run the message '
+                       'size scenario first'.format(input))
+        return
+
+    write_table(results, results_dir / RESULT_FILE)
+    total = sum(results.values(), collections.Counter())
+    logger.info('{} of {} paths are duplicates, interning saves {} of {} '
+                'bytes'.format(total['duplicates'], total['paths'],
+                               total['bytes'] - total['interned_bytes'],
+                               total['bytes']))
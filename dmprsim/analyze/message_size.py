@@ -3,20 +3,19 @@ Generate one plot per `chartgroup` with `xaxis` as the x-axis and message size
 as the y-axis
 """
 
+import fnmatch
+import functools
+import hashlib
+import json
 import logging
 import multiprocessing
+import os
 from pathlib import Path
 
-import matplotlib
-import matplotlib.pyplot as plt
-import numpy as np
-
+from dmprsim.analyze._utils.cache import AnalysisCache, fingerprint
 from dmprsim.analyze._utils.process_messages import process_files
 from dmprsim.scenarios.message_size import MessageSizeScenario
 
-matplotlib.use('AGG')
-matplotlib.style.use('ggplot')
-
 configs = {
     'density': {
         'label': "Interface Range",
@@ -89,46 +88,126 @@ PLOTS = {
     ),
 }
 
+# The summary table of a result file, see summarize
+SUMMARY_FILE = '.{}.summary.json'
+# Resolution of the raster formats
+DPI = 300
+
 logger = logging.getLogger(__name__)
 
 
-def accumulate(input: Path, globs: dict, filename: str,
-               xaxis_datapoint: int) -> np.array:
+@functools.lru_cache()
+def _pyplot():
     """
-    for `glob`/filename in input directory, accumulate the message lengths
-    and return a tuple with (x, min, perc25, avg, perc75, max)
+    Import and configure matplotlib on first use, it is only needed for
+    plotting and slow to import
     """
-    files = '{size}-{density}-{loss}-{interval}/{filename}'.format(
-        filename=filename, **globs)
-    input_paths = input.glob(files)
+    import matplotlib
+    matplotlib.use('AGG')
+    # Also imports matplotlib.style
+    import matplotlib.pyplot as plt
+    matplotlib.style.use('ggplot')
+    return plt
+
+
+def _histogram_worker(args):
+    dir, result_file, digest = args
+    import numpy as np
+    try:
+        with (dir / result_file).open() as f:
+            sizes = [int(i) for i in f.read().splitlines() if i]
+    except FileNotFoundError:
+        sizes = []
+    values, counts = np.unique(np.asarray(sizes, dtype=np.int64),
+                               return_counts=True)
+    return dir.name, {'digest': digest, 'values': values.tolist(),
+                      'counts': counts.tolist()}
 
-    message_lengths = ''
-    for file in input_paths:
-        try:
-            with file.open() as fin:
-                message_lengths += fin.read()
-        except FileNotFoundError as e:
-            logger.debug("Could not find file, skipping {}".format(e))
-            continue
 
-    sizes = np.asarray([int(i) for i in message_lengths.splitlines() if i])
-    if len(sizes) == 0:
-        logger.debug("File lengths of {} is zero, skipping".format(files))
+def summarize(input: Path, result_file: str, pool) -> dict:
+    """
+    Return the summary table of `result_file`: the distinct message sizes
+    and how often they occur by combination directory
+
+    The table is stored next to the combination directories, only the
+    directories whose result file changed are read again
+    """
+    table_file = input / SUMMARY_FILE.format(result_file)
+    try:
+        with table_file.open() as f:
+            table = json.load(f)
+    except (FileNotFoundError, ValueError):
+        table = {}
+
+    summary = {}
+    stale = []
+    for dir in input.glob('*-*-*-*'):
+        digest = fingerprint(dir, [dir / result_file])
+        entry = table.get(dir.name)
+        if entry is not None and entry['digest'] == digest:
+            summary[dir.name] = entry
+        else:
+            stale.append((dir, result_file, digest))
+
+    if stale or summary.keys() != table.keys():
+        logger.info('Summarizing {} changed directories'.format(len(stale)))
+        summary.update(pool.imap_unordered(_histogram_worker, stale,
+                                           chunksize=20))
+        tmp_file = table_file.with_name(table_file.name + '.tmp')
+        with tmp_file.open('w') as f:
+            json.dump(summary, f, sort_keys=True)
+        os.replace(str(tmp_file), str(table_file))
+    return summary
+
+
+def accumulate(histograms: list, xaxis_datapoint: int) -> tuple:
+    """
+    Accumulate the (values, counts) message size histograms and return a
+    tuple with (x, min, perc25, avg, perc75, max)
+    """
+    import numpy as np
+    values = np.concatenate([values for values, _ in histograms] or [[]])
+    counts = np.concatenate([counts for _, counts in histograms] or [[]])
+    order = np.argsort(values, kind='mergesort')
+    values, counts = values[order], counts[order].astype(np.int64)
+    values, counts = values[counts > 0], counts[counts > 0]
+    total = counts.sum()
+    if not total:
         return False
 
-    return (xaxis_datapoint, np.min(sizes), np.percentile(sizes, 25),
-            np.average(sizes), np.percentile(sizes, 75), np.max(sizes))
+    # The index after the last sample of every value in the sorted samples
+    ends = np.cumsum(counts)
+
+    def percentile(q: float):
+        # Linear interpolation between the closest ranks like np.percentile
+        rank = (total - 1) * q / 100
+        low = int(rank)
+        below, above = values[np.searchsorted(
+            ends, (low, min(low + 1, total - 1)), side='right')]
+        return below + (above - below) * (rank - low)
+
+    return (xaxis_datapoint, values[0], percentile(25),
+            np.dot(values, counts) / total, percentile(75), values[-1])
+
+
+@functools.lru_cache()
+def _figure():
+    """
+    The figure of this process, reused for all plots so memory does not grow
+    with the number of charts
+    """
+    return _pyplot().figure()
 
 
 def plot(chartgroup: str, chartgroup_datapoint: int, xaxis: str, data: list,
-         output: str):
+         outputs: list):
     """
     plot the data with a defined chartgroup and xaxis with title, labels and
-    a legend into the output directory with the filename
-    chartgroup-chartgroup_datapoint-xaxis
+    a legend into all output files, the format is given by their extension
     """
     x, mins, perc25, avg, perc75, maxs = zip(*data)
-    fig = plt.figure()
+    fig = _figure()
+    fig.clf()
     ax = fig.add_subplot(1, 1, 1)
 
     ax.set_ylabel('Message Size / bytes')
@@ -146,39 +225,96 @@ def plot(chartgroup: str, chartgroup_datapoint: int, xaxis: str, data: list,
 
     ax.legend()
 
-    fig.savefig(output, dpi=300)
+    for output in outputs:
+        fig.savefig(output, dpi=DPI)
 
 
-def generate_plots(input: Path, output: Path, filename: str, chartgroup: str,
-                   xaxis: str, globs: dict):
-    # Generate a separate chart for each datapoint in chartgroup
-    try:
-        output.mkdir(parents=True)
-    except FileExistsError:
-        pass
+def _plot_worker(args):
+    """
+    Accumulate the histograms of every x-axis datapoint and plot them
+    """
+    chartgroup, chartgroup_datapoint, xaxis, points, outputs = args
+    data = []
+    for xaxis_datapoint, histograms in points:
+        accumulated = accumulate(histograms, xaxis_datapoint)
+        if accumulated:
+            data.append(accumulated)
+    if not data:
+        logger.debug("no data for {}-{}, skipping".format(
+            chartgroup_datapoint, xaxis))
+        return False
+    plot(chartgroup, chartgroup_datapoint, xaxis, data, outputs)
+    return True
+
+
+def plot_jobs(summary: dict, output: Path, filename: str, chartgroup: str,
+              xaxis: str, globs: dict, cache: AnalysisCache,
+              formats: tuple = ('png',)):
+    """
+    Return the (chartgroup, datapoint, xaxis, points, outputs) plot jobs of
+    all charts whose data changed, points are the histograms of the
+    matching combinations for every x-axis datapoint, and their cache keys
+    and digests
+    """
+    jobs = []
     for chartgroup_datapoint in configs[chartgroup]['datapoints']:
         globs[chartgroup] = chartgroup_datapoint
-        cumulated_data = []
-
-        # Parse all datafiles for the specified x-axis
+        points = []
+        digests = []
         for xaxis_datapoint in configs[xaxis]['datapoints']:
             globs[xaxis] = xaxis_datapoint
-            data = accumulate(input, globs, filename, xaxis_datapoint)
-            if not data:
-                continue
-            cumulated_data.append(data)
-
-        if not cumulated_data:
-            logger.debug(
-                "no data for {}-{}, skippint".format(chartgroup_datapoint,
-                                                     xaxis))
+            pattern = '{size}-{density}-{loss}-{interval}'.format(**globs)
+            names = sorted(name for name in summary
+                           if fnmatch.fnmatchcase(name, pattern))
+            points.append((xaxis_datapoint, [
+                (summary[name]['values'], summary[name]['counts'])
+                for name in names]))
+            digests.extend('{}:{}'.format(name, summary[name]['digest'])
+                           for name in names)
+
+        if not any(histograms for _, histograms in points):
+            logger.debug("no data for {}-{}, skipping".format(
+                chartgroup_datapoint, xaxis))
             continue
 
-        plot_filename = "{}-{}-{}-{}.png".format(chartgroup,
-                                                 chartgroup_datapoint,
-                                                 xaxis, filename)
-        plot(chartgroup, chartgroup_datapoint, xaxis, cumulated_data,
-             str(output / plot_filename))
+        stem = "{}-{}-{}-{}".format(chartgroup, chartgroup_datapoint, xaxis,
+                                    filename)
+        # Only replot if one of the underlying result files changed
+        digest = hashlib.sha1('\n'.join(digests).encode('utf-8')).hexdigest()
+        keys = ['{}.{}'.format(stem, format) for format in formats]
+        if all(cache.is_fresh(key, digest, output / key) for key in keys):
+            logger.debug("{} is up to date, skipping".format(stem))
+            continue
+        jobs.append(((chartgroup, chartgroup_datapoint, xaxis, points,
+                      [str(output / key) for key in keys]),
+                     keys, digest))
+    return jobs
+
+
+def generate_plots(input: Path, output: Path, filename: str, chartgroup: str,
+                   xaxis: str, globs: dict, cache: AnalysisCache, pool=None,
+                   formats: tuple = ('png',)):
+    # Generate a separate chart for each datapoint in chartgroup
+    try:
+        output.mkdir(parents=True)
+    except FileExistsError:
+        pass
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool()
+    try:
+        summary = summarize(input, filename, pool)
+        jobs = plot_jobs(summary, output, filename, chartgroup, xaxis, globs,
+                         cache, formats)
+        plotted = pool.imap(_plot_worker, [job for job, _, _ in jobs])
+        for (_, keys, digest), done in zip(jobs, plotted):
+            if done:
+                for key in keys:
+                    cache.update(key, digest)
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
 
 
 def run_scenario(args: object, results_dir: Path, scenario_dir: Path):
@@ -190,45 +326,86 @@ def run_scenario(args: object, results_dir: Path, scenario_dir: Path):
         meshes=configs['density']['datapoints'].keys(),
         losses=configs['loss']['datapoints'].keys(),
         intervals=configs['interval']['datapoints'].keys(),
+        threshold=getattr(args, 'adaptive', None),
+        coarse_step=getattr(args, 'coarse_step', 4),
     )
     scenario.start()
 
 
+def _tracefiles(dir: Path) -> list:
+    return list(dir.glob('routers/*/trace/tx.msg'))
+
+
 def _process_message_worker(args):
-    dir, result_file, actions = args
-    process_files(dir.glob('routers/*/trace/tx.msg'), dir / result_file,
-                  actions)
+    dir, result_file, actions, digest = args
+    saved = process_files(_tracefiles(dir), dir / result_file, actions)
+    return dir, digest, saved
 
 
-def process_messages(path: Path, result_file: str, actions: list):
-    dirs = tuple(path.glob('*-*-*-*'))
+def process_messages(path: Path, result_file: str, actions: list,
+                     cache: AnalysisCache):
+    """
+    Apply `actions` to the tracefiles of all combination directories, skipping
+    directories whose tracefiles did not change since the last run
+    """
+    stale = []
+    for dir in path.glob('*-*-*-*'):
+        digest = fingerprint(dir, _tracefiles(dir), *actions)
+        key = '{}/{}'.format(dir.name, result_file)
+        if not cache.is_fresh(key, digest, dir / result_file):
+            stale.append((dir, result_file, actions, digest))
+
+    all_ = len(stale)
+    if not all_:
+        logger.info('{} is up to date'.format(result_file))
+        return
+    logger.info('Processing {} changed directories'.format(all_))
+
     pool = multiprocessing.Pool()
-    all_ = len(dirs)
     cur = 0
-    for _ in pool.imap_unordered(_process_message_worker,
-        ((dir, result_file, actions) for dir in dirs),
-        chunksize = 20):
-        cur += 1
-        logger.info('{:.2%} done'.format(cur/all_))
-    pool.close()
-    pool.join()
+    saved = 0
+    try:
+        for dir, digest, dir_saved in pool.imap_unordered(
+                _process_message_worker, stale, chunksize=20):
+            cur += 1
+            saved += dir_saved
+            cache.update('{}/{}'.format(dir.name, result_file), digest)
+            logger.info('{:.2%} done'.format(cur / all_))
+        pool.close()
+        pool.join()
+    finally:
+        cache.save()
+    if 'reduce' in actions:
+        logger.info('path reduction saved {} bytes'.format(saved))
 
 
 def main(args: object, results_dir: Path, scenario_dir: Path):
-    if not (scenario_dir / '.done').exists():
-        run_scenario(args, results_dir, scenario_dir)
+    # The scenario keeps track of finished combinations itself and only runs
+    # the missing ones
+    run_scenario(args, results_dir, scenario_dir)
+
+    cache = AnalysisCache(scenario_dir)
+    formats = getattr(args, 'plot_formats', None) or ('png',)
 
     logger.info("Start plotting")
-    for chartgroup in PLOTS:
-        for xaxis, conf in PLOTS[chartgroup]:
-            actions = conf['actions']
-            result_file = '-'.join(actions)
-            logger.info(
-                'Processing {}-{}-{}'.format(chartgroup, xaxis, result_file))
-            done_file = scenario_dir / ('.done-' + result_file)
-            if not done_file.exists():
-                process_messages(scenario_dir, result_file, actions)
-                done_file.touch()
-            generate_plots(input=scenario_dir, output=results_dir,
-                           filename=result_file, chartgroup=chartgroup,
-                           xaxis=xaxis, globs=conf.copy())
+    pool = multiprocessing.Pool(getattr(args, 'processes', None))
+    try:
+        for chartgroup in PLOTS:
+            for xaxis, conf in PLOTS[chartgroup]:
+                actions = conf['actions']
+                result_file = '-'.join(actions)
+                logger.info('Processing {}-{}-{}'.format(
+                    chartgroup, xaxis, result_file))
+                process_messages(scenario_dir, result_file, actions, cache)
+                try:
+                    generate_plots(input=scenario_dir, output=results_dir,
+                                   filename=result_file,
+                                   chartgroup=chartgroup, xaxis=xaxis,
+                                   globs=conf.copy(), cache=cache, pool=pool,
+                                   formats=formats)
+                finally:
+                    cache.save()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
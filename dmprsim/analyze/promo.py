@@ -1,10 +1,10 @@
-import random
 from pathlib import Path
 
+from dmprsim.simulator import RandomVelocity
 from dmprsim.topologies.randomized import RandomTopology
-from dmprsim.topologies.utils import ffmpeg, video_gen_intro
 
 SIMULATION_TIME = 1200
+TITLE = "Dynamic MultiPath Routing"
 
 INTERFACES = [
     {
@@ -40,12 +40,9 @@ def main(args, results_dir: Path, scenario_dir: Path):
         results_dir=results_dir,
         args=args,
         area=(1600, 900),
-        velocity=lambda: random.random() ** 6,
+        velocity=RandomVelocity(exponent=6),
     )
+    sim.title = TITLE
     sim.prepare()
     for _ in sim.start():
         pass
-
-    if sim.gen_movie:
-        video_gen_intro(results_dir, scenario_dir)
-        ffmpeg(results_dir, scenario_dir)
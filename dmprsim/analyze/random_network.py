@@ -1,28 +1,145 @@
-import random
+"""
+Simulate a random network, optionally replicated with multiple runtime seeds
+on the same network to get confidence intervals of the key metrics
+"""
+import json
+import logging
+import multiprocessing
 from pathlib import Path
 
+from dmprsim.analyze._utils.statistics import mean_confidence_interval
+from dmprsim.scenarios.sweep import collect_message_sizes
+from dmprsim.simulator import RandomVelocity
 from dmprsim.topologies.randomized import RandomTopology
 from dmprsim.topologies.utils import ffmpeg
 
 SIMU_TIME = 300
 
+METRICS = (
+    ('mean_message_size', 'Mean message size / bytes'),
+    ('messages', 'Transmitted messages'),
+    ('delivery_ratio', 'Delivery ratio'),
+    ('convergence_time', 'Convergence time / s'),
+)
 
-def main(args, results_dir: Path, scenario_dir: Path):
-    sim = RandomTopology(
+logger = logging.getLogger(__name__)
+
+# The prepared topology shared with the forked replication workers
+_prepared = None
+
+
+def _topology(args, results_dir: Path, scenario_dir: Path,
+              random_seed_runtime: int) -> RandomTopology:
+    return RandomTopology(
         simulation_time=getattr(args, 'simulation_time', 300),
         num_routers=getattr(args, 'num_routers', 100),
         random_seed_prep=getattr(args, 'random_seed_prep', 1),
-        random_seed_runtime=getattr(args, 'random_seed_runtime', 1),
+        random_seed_runtime=random_seed_runtime,
         scenario_dir=scenario_dir,
         results_dir=results_dir,
         args=args,
         tracepoints=('tx.msg',),
         area=(640, 720),
-        velocity=lambda: random.random()**6,
+        velocity=RandomVelocity(exponent=6),
     )
+
+
+def main(args, results_dir: Path, scenario_dir: Path):
+    if getattr(args, 'replications', 1) > 1:
+        return replicate(args, results_dir, scenario_dir)
+
+    sim = _topology(args, results_dir, scenario_dir,
+                    getattr(args, 'random_seed_runtime', 1))
     sim.prepare()
     for _ in sim.start():
         pass
 
-    if sim.gen_movie:
+    if sim.gen_movie and not sim.stream_video:
         ffmpeg(results_dir, scenario_dir)
+
+
+def _replication_worker(job):
+    args, results_dir, scenario_dir, seed = job
+    run_dir = scenario_dir / 'seed-{}'.format(seed)
+    # The replications run in parallel, each writes its video on its own
+    run_results_dir = results_dir / 'seed-{}'.format(seed)
+    if _prepared is None:
+        # Not forked from the preparing process, prepare the same network
+        # again, the preparation seed guarantees an identical network
+        sim = _topology(args, run_results_dir, run_dir, seed)
+        sim.prepare()
+    else:
+        sim = _prepared
+        sim.relocate(run_dir, run_results_dir)
+        sim.random_seed_runtime = seed
+
+    for _ in sim.start():
+        pass
+    for model in sim.models:
+        model.router.tracer.flush()
+
+    sizes = collect_message_sizes(sim, run_dir)
+    sent = sum(s['sent'] for s in sim.forwarding_stats.values())
+    delivered = sum(s['delivered'] for s in sim.forwarding_stats.values())
+    return {
+        'seed': seed,
+        'mean_message_size': sizes['mean'],
+        'messages': sizes['messages'],
+        'delivery_ratio': delivered / sent if sent else None,
+        'convergence_time': sim.convergence_time(),
+    }
+
+
+def replicate(args, results_dir: Path, scenario_dir: Path):
+    """
+    Run the same network with `args.replications` runtime seeds in parallel
+    and summarize the key metrics with their 95% confidence intervals, the
+    output of every replication goes to a `seed-N` subdirectory
+    """
+    global _prepared
+    first_seed = getattr(args, 'random_seed_runtime', 1)
+    seeds = range(first_seed, first_seed + args.replications)
+
+    # Prepare the network once, the forked workers each run a copy of it
+    _prepared = _topology(args, results_dir, scenario_dir / 'prepared',
+                          first_seed)
+    _prepared.prepare()
+
+    # A fresh process per replication, each starts with the untouched
+    # prepared network
+    pool = multiprocessing.Pool(getattr(args, 'processes', None),
+                                maxtasksperchild=1)
+    try:
+        results = []
+        for result in pool.imap_unordered(
+                _replication_worker,
+                ((args, results_dir, scenario_dir, seed) for seed in seeds)):
+            logger.info('Replication with seed {} done'.format(
+                result['seed']))
+            results.append(result)
+        pool.close()
+        pool.join()
+    finally:
+        _prepared = None
+
+    results.sort(key=lambda r: r['seed'])
+    try:
+        results_dir.mkdir(parents=True)
+    except FileExistsError:
+        pass
+    with (results_dir / 'replications.json').open('w') as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+
+    with (results_dir / 'replications.md').open('w') as f:
+        f.write('| metric | n | mean | 95% CI |\n')
+        f.write('|---|---:|---:|---|\n')
+        for metric, label in METRICS:
+            n, mean, lower, upper = mean_confidence_interval(
+                r[metric] for r in results)
+            if mean is None:
+                f.write('| {} | 0 | - | - |\n'.format(label))
+            elif lower is None:
+                f.write('| {} | {} | {:.4g} | - |\n'.format(label, n, mean))
+            else:
+                f.write('| {} | {} | {:.4g} | [{:.4g}, {:.4g}] |\n'.format(
+                    label, n, mean, lower, upper))
@@ -0,0 +1,38 @@
+"""
+Run a declarative parameter sweep and summarize the results of all runs
+"""
+import json
+import logging
+from pathlib import Path
+
+from dmprsim.scenarios.sweep import RESULT_FILE, SweepScenario, load_spec
+
+SUMMARY_FILE = 'summary.jsonl'
+
+logger = logging.getLogger(__name__)
+
+
+def main(args, results_dir: Path, scenario_dir: Path):
+    spec = load_spec(Path(args.spec))
+    results_dir = results_dir / spec['name']
+    scenario_dir = scenario_dir / spec['name']
+
+    scenario = SweepScenario(args, results_dir, scenario_dir, spec)
+    scenario.start()
+
+    try:
+        results_dir.mkdir(parents=True)
+    except FileExistsError:
+        pass
+
+    # One line with the parameters and results per run
+    with (results_dir / SUMMARY_FILE).open('w') as summary:
+        for name in scenario.runs:
+            try:
+                with (results_dir / name / RESULT_FILE).open() as f:
+                    result = json.load(f)
+            except FileNotFoundError:
+                logger.warning("No results for run {}".format(name))
+                continue
+            summary.write(json.dumps(result, sort_keys=True) + '\n')
+    logger.info("Summary written to {}".format(results_dir / SUMMARY_FILE))
@@ -0,0 +1,108 @@
+"""
+Detect when a simulated network has converged and when enough measurements
+were taken
+
+The detector goes through two phases:
+- settling: the network is considered stable when no routing table changed
+  for `stable_window` seconds and the mean message size of the last window
+  differs by less than `tolerance` from the window before. After
+  `max_settling` seconds the measurement starts regardless.
+- measuring: the message sizes are grouped into batches of `batch` seconds.
+  The measurement stops after at least `min_measure` seconds once the 95%
+  confidence interval of the mean message size (over the batch means) is
+  narrower than `target` times the mean, or after `max_measure` seconds.
+"""
+import logging
+
+from dmprsim.analyze._utils.statistics import mean_confidence_interval
+
+logger = logging.getLogger(__name__)
+
+
+class ConvergenceDetector(object):
+    def __init__(self, stable_window: int, max_settling: int,
+                 min_measure: int, max_measure: int, batch: int = 60,
+                 tolerance: float = 0.05, target: float = 0.02):
+        self.stable_window = stable_window
+        self.max_settling = max_settling
+        self.min_measure = min_measure
+        self.max_measure = max_measure
+        self.batch = batch
+        self.tolerance = tolerance
+        self.target = target
+
+        # The first second of the measurement window, None while settling
+        self.measurement_start = None
+        self.measurement_end = None
+        self.last_change = 0
+        # Number and sum of message sizes per second
+        self.sizes = {}
+
+    def measuring(self, time) -> bool:
+        return self.measurement_start is not None and \
+            time >= self.measurement_start
+
+    def record_message(self, time, size: int):
+        count, total = self.sizes.get(int(time), (0, 0))
+        self.sizes[int(time)] = (count + 1, total + size)
+
+    def _mean_size(self, start: int, end: int):
+        count = total = 0
+        for sec in range(start, end):
+            c, t = self.sizes.get(sec, (0, 0))
+            count += c
+            total += t
+        return total / count if count else None
+
+    def mean_size(self):
+        """
+        Return the mean message size of the measurement window or None
+        """
+        if self.measurement_start is None:
+            return None
+        end = self.measurement_end
+        if end is None:
+            end = max(self.sizes, default=self.measurement_start) + 1
+        return self._mean_size(self.measurement_start, end)
+
+    def _stationary(self, sec: int) -> bool:
+        window = self.stable_window
+        current = self._mean_size(sec - window + 1, sec + 1)
+        previous = self._mean_size(sec - 2 * window + 1, sec - window + 1)
+        if current is None or previous is None:
+            return False
+        return abs(current - previous) <= self.tolerance * previous
+
+    def _precise(self, sec: int) -> bool:
+        batches = []
+        for start in range(self.measurement_start, sec + 1, self.batch):
+            batches.append(self._mean_size(start, start + self.batch))
+        n, mean, lower, upper = mean_confidence_interval(batches)
+        if lower is None or not mean:
+            return False
+        return (upper - lower) / 2 <= self.target * mean
+
+    def step(self, sec: int, churn: int) -> bool:
+        """
+        Update the detector after simulating second `sec` in which `churn`
+        routing tables changed, returns True if the simulation can stop
+        """
+        if self.measurement_start is None:
+            if churn:
+                self.last_change = sec
+            stable = sec - self.last_change >= self.stable_window and \
+                self._stationary(sec)
+            if stable or sec + 1 >= self.max_settling:
+                self.measurement_start = sec + 1
+                logger.debug("Start measuring at {}s, {}".format(
+                    self.measurement_start,
+                    'converged' if stable else 'not converged'))
+            return False
+
+        measured = sec - self.measurement_start + 1
+        if measured >= self.max_measure or (
+                measured >= self.min_measure and
+                measured % self.batch == 0 and self._precise(sec)):
+            self.measurement_end = sec + 1
+            return True
+        return False
@@ -0,0 +1,303 @@
+"""
+A long-lived daemon which runs simulation jobs without paying the startup
+costs of a fresh interpreter
+
+The daemon imports the simulator, the topologies and the heavy optional
+modules (numpy, matplotlib, PIL, cairo) once and then waits for jobs on a
+local Unix socket. Every job runs in a process forked from the warm daemon, so
+it starts within milliseconds and always sees the pristine state of a daemon
+which never ran a simulation. At most `workers` jobs run at once, further jobs
+wait for a free worker.
+
+A job is a json object on a single line, the keys are those of a single sweep
+run (see dmprsim.scenarios.sweep):
+
+    {"topology": "grid", "parameters": {"size": 3}, "name": "grid-3",
+     "scenario_dir": "results/.scenarios/grid-3",
+     "results_dir": "results/grid-3", "tracepoints": ["tx.msg"],
+     "collectors": ["message-sizes"], "args": {"simulate_forwarding": true}}
+
+The daemon answers with json lines, `started`, a `progress` event for every
+percent of simulated time and finally `result` (with the collected results,
+also written to result.json like a sweep run) or `error`.
+
+Usage:
+    python3 -m dmprsim.scenarios.daemon serve --workers 4
+    python3 -m dmprsim.scenarios.daemon submit job.json
+    python3 -m dmprsim.scenarios.daemon shutdown
+"""
+import argparse
+import collections
+import importlib
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from dmprsim.scenarios.sweep import (get_topology_cls, simulate,
+                                     write_result)
+
+SOCKET_PATH = Path('results/.dmpr-simulator.sock')
+# Seconds a client may take to send its request
+REQUEST_TIMEOUT = 10
+
+JOB_KEYS = {'topology', 'parameters', 'name', 'scenario_dir', 'results_dir',
+            'tracepoints', 'collectors', 'args'}
+
+# Imported before accepting jobs, missing optional modules are skipped
+PRELOAD = (
+    'numpy',
+    'matplotlib',
+    'matplotlib.pyplot',
+    'PIL.Image',
+    'cairo',
+    'dmprsim.simulator',
+    'dmprsim.topologies.circle',
+    'dmprsim.topologies.grid',
+    'dmprsim.topologies.randomized',
+    'dmprsim.analyze._utils.extract_messages',
+)
+
+logger = logging.getLogger(__name__)
+
+
+def preload():
+    for module in PRELOAD:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.debug("Not preloading {}: {}".format(module, e))
+
+
+def _send(conn: socket.socket, event: str, **values):
+    values['event'] = event
+    conn.sendall(json.dumps(values, sort_keys=True).encode('utf-8') + b'\n')
+
+
+def run_job(job: dict, progress=None) -> dict:
+    unknown = set(job) - JOB_KEYS
+    if unknown:
+        raise ValueError("Unknown keys in job: {}".format(
+            ', '.join(sorted(unknown))))
+    name = job.get('name', 'default')
+    params = job.get('parameters', {})
+    results_dir = Path(job['results_dir'])
+    args = dict(job.get('args', {}))
+    args.setdefault('quiet', True)
+    results = simulate(
+        get_topology_cls(job['topology']), params,
+        scenario_dir=Path(job['scenario_dir']),
+        results_dir=results_dir,
+        name=name,
+        tracepoints=job.get('tracepoints', ()),
+        args=argparse.Namespace(**args),
+        collectors=job.get('collectors', ()),
+        progress=progress,
+    )
+    write_result(results_dir, name, params, results)
+    return results
+
+
+def _worker(conn: socket.socket, job: dict):
+    """
+    Run a job in a forked worker, the events are written directly to the
+    client connection
+    """
+    start = time.monotonic()
+    last = [-1]
+
+    def progress(sec, total):
+        percent = int(100 * (sec + 1) / total) if total else 100
+        if percent > last[0]:
+            last[0] = percent
+            _send(conn, 'progress', second=sec, total=total)
+
+    try:
+        _send(conn, 'started', pid=os.getpid())
+        results = run_job(job, progress)
+    except Exception:
+        _send(conn, 'error', error=traceback.format_exc())
+    else:
+        _send(conn, 'result', results=results,
+              duration=time.monotonic() - start)
+    finally:
+        conn.close()
+
+
+class Daemon(object):
+    def __init__(self, path: Path = SOCKET_PATH, workers: int = None):
+        self.path = path
+        self.workers = workers or multiprocessing.cpu_count()
+        self.context = multiprocessing.get_context('fork')
+        self.running = []
+        self.pending = collections.deque()
+        # The data read so far and the deadline by incomplete request
+        self.reading = {}
+
+    def _start_pending(self):
+        while self.pending and len(self.running) < self.workers:
+            conn, job = self.pending.popleft()
+            process = self.context.Process(target=_worker, args=(conn, job))
+            process.start()
+            # The worker owns the connection now
+            conn.close()
+            self.running.append(process)
+
+    def _accept(self, listener: socket.socket):
+        """
+        Accept a connection, its request is read once it is ready so a slow
+        client does not hold up the others
+        """
+        conn, _ = listener.accept()
+        conn.setblocking(False)
+        self.reading[conn] = b'', time.monotonic() + REQUEST_TIMEOUT
+
+    def _read(self, conn: socket.socket) -> bool:
+        """
+        Read from a connection whose request is incomplete, returns False on
+        a shutdown request
+        """
+        data, deadline = self.reading.pop(conn)
+        try:
+            chunk = conn.recv(65536)
+        except BlockingIOError:
+            chunk = None
+        except OSError as e:
+            logger.warning("Invalid request: {}".format(e))
+            conn.close()
+            return True
+        if chunk is None or (chunk and not (data + chunk).endswith(b'\n')):
+            self.reading[conn] = data + (chunk or b''), deadline
+            return True
+
+        conn.setblocking(True)
+        return self._handle(conn, data + chunk)
+
+    def _handle(self, conn: socket.socket, data: bytes) -> bool:
+        """
+        Answer a complete request, returns False on a shutdown request
+        """
+        try:
+            job = json.loads(data.decode('utf-8'))
+            command = job.pop('command', 'run')
+            if command == 'ping':
+                _send(conn, 'pong', running=len(self.running),
+                      pending=len(self.pending))
+            elif command == 'shutdown':
+                _send(conn, 'bye')
+                conn.close()
+                return False
+            else:
+                self.pending.append((conn, job))
+                return True
+        except (OSError, ValueError) as e:
+            logger.warning("Invalid request: {}".format(e))
+        conn.close()
+        return True
+
+    def _expire(self):
+        now = time.monotonic()
+        for conn, (_, deadline) in list(self.reading.items()):
+            if deadline <= now:
+                logger.warning("No request within {}s, closing the "
+                               "connection".format(REQUEST_TIMEOUT))
+                del self.reading[conn]
+                conn.close()
+
+    def serve(self):
+        try:
+            self.path.parent.mkdir(parents=True)
+        except FileExistsError:
+            pass
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+        preload()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(str(self.path))
+        listener.listen(128)
+        logger.info("Listening on {} with {} workers".format(
+            self.path, self.workers))
+        try:
+            while True:
+                ready = multiprocessing.connection.wait(
+                    [listener] + list(self.reading) +
+                    [p.sentinel for p in self.running],
+                    REQUEST_TIMEOUT if self.reading else None)
+                if listener in ready:
+                    self._accept(listener)
+                if not all(self._read(conn) for conn in ready
+                           if conn in self.reading):
+                    break
+                self._expire()
+                for process in self.running[:]:
+                    if not process.is_alive():
+                        process.join()
+                        self.running.remove(process)
+                self._start_pending()
+        finally:
+            listener.close()
+            self.path.unlink()
+            for conn, _ in self.pending:
+                conn.close()
+            for conn in self.reading:
+                conn.close()
+            for process in self.running:
+                process.join()
+
+
+def request(job: dict, path: Path = SOCKET_PATH):
+    """
+    Send a job or command to the daemon and yield the events of the answer
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(str(path))
+        conn.sendall(json.dumps(job).encode('utf-8') + b'\n')
+        with conn.makefile('rb') as f:
+            for line in f:
+                yield json.loads(line.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="run simulation jobs in a warm daemon")
+    parser.add_argument('--socket', type=Path, default=SOCKET_PATH)
+    sub_parsers = parser.add_subparsers(dest='command')
+    sub_parsers.required = True
+
+    serve_parser = sub_parsers.add_parser('serve', help='start the daemon')
+    serve_parser.add_argument('--workers', type=int,
+                              help='maximum number of concurrent jobs, '
+                                   'defaults to the number of cpus')
+    submit_parser = sub_parsers.add_parser('submit', help='run a job')
+    submit_parser.add_argument('job', type=Path, help='the job as json')
+    sub_parsers.add_parser('ping', help='check if the daemon is running')
+    sub_parsers.add_parser('shutdown', help='stop the daemon')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'serve':
+        Daemon(args.socket, args.workers).serve()
+        return
+
+    if args.command == 'submit':
+        job = json.loads(args.job.read_text())
+    else:
+        job = {'command': args.command}
+    failed = False
+    for event in request(job, args.socket):
+        print(json.dumps(event, sort_keys=True))
+        failed |= event['event'] == 'error'
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,9 @@ from dmprsim.topologies.circle import CircleTopology
 from dmprsim.topologies.utils import ffmpeg
 
 SIMULATION_TIME = 1200
+# The seconds after which the node disappears and reappears
+DISAPPEAR_TIME = 300
+REAPPEAR_TIME = 900
 
 CONFIG = {
     'max-full-update-interval': 6,
@@ -36,12 +39,12 @@ def main(args, results_dir: Path, scenario_dir: Path):
     simulation.simulate_forwarding = True
 
     for sec in simulation.start():
-        if sec > 900:
+        if sec > REAPPEAR_TIME:
             models[1].visible = True
-        elif sec > 300:
+        elif sec > DISAPPEAR_TIME:
             models[1].visible = False
 
-    if simulation.gen_movie:
+    if simulation.gen_movie and not simulation.stream_video:
         ffmpeg(results_dir, scenario_dir)
 
 
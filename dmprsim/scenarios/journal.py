@@ -0,0 +1,105 @@
+"""
+An append-only journal of finished sweep runs
+
+Every finished run is appended as one json line with its duration, peak
+memory usage and optional result values. Lines are flushed immediately and
+synced to disk in batches, a crash loses at most the runs of the last
+unsynced batch. A torn last line, e.g. when the process was killed
+mid-write, is ignored when reading and cut off before new entries are
+appended.
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+SYNC_EVERY = 20
+SYNC_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+
+class Journal(object):
+    def __init__(self, path: Path, sync_every: int = SYNC_EVERY,
+                 sync_interval: float = SYNC_INTERVAL):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.entries = {}
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._valid_size = self._read()
+
+    def _read(self) -> int:
+        """
+        Read all complete entries and return the size of the valid part of
+        the journal in bytes
+        """
+        valid_size = 0
+        try:
+            with self.path.open('rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        logger.warning("Ignoring truncated last entry of "
+                                       "{}".format(self.path))
+                        break
+                    try:
+                        entry = json.loads(line.decode('utf-8'))
+                        key = tuple(entry.pop('run'))
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Ignoring corrupt entry in {}: "
+                                       "{!r}".format(self.path, line))
+                    else:
+                        self.entries[key] = entry
+                    valid_size += len(line)
+        except FileNotFoundError:
+            pass
+        return valid_size
+
+    def __contains__(self, run) -> bool:
+        return tuple(run) in self.entries
+
+    def done(self) -> set:
+        return set(self.entries)
+
+    def append(self, run, duration: float = None, peak_rss: int = None,
+               **values):
+        if self._file is None:
+            try:
+                self.path.parent.mkdir(parents=True)
+            except FileExistsError:
+                pass
+            self._file = open(str(self.path), 'ab')
+            # Cut off a torn last line so the next entry starts on a new line
+            self._file.truncate(self._valid_size)
+
+        entry = dict(values, duration=duration, peak_rss=peak_rss)
+        self.entries[tuple(run)] = entry
+        line = json.dumps(dict(entry, run=list(run)), sort_keys=True)
+        self._file.write(line.encode('utf-8') + b'\n')
+        self._file.flush()
+
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or \
+                time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
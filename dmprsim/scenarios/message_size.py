@@ -1,5 +1,6 @@
 import functools
 import itertools
+import json
 import logging
 import math
 import multiprocessing
@@ -8,107 +9,304 @@ import random
 from pathlib import Path
 
 import dmprsim.simulator
+from dmprsim.analyze._utils.extract_messages import extract_messages
+from dmprsim.scenarios.convergence import ConvergenceDetector
+from dmprsim.scenarios.journal import Journal
+from dmprsim.scenarios.scheduler import GB, MemoryScheduler
+from dmprsim.scenarios.workqueue import WorkQueue
 from dmprsim.topologies.grid import GridTopology
 from core.dmpr.config import DefaultConfiguration as DMPRDefaultConfiguration
 
+JOURNAL_FILE = '.message_sizes.journal'
+# Pickled set of finished runs written by former versions
 CHECKPOINT_FILE = '.message_sizes.checkpoint'
+QUEUE_DIR = '.message_sizes.queue'
 
 AVG_MSG_INTERVAL = DMPRDefaultConfiguration.rtn_msg_interval + \
                    DMPRDefaultConfiguration.rtn_msg_interval_jitter / 2
 
+# Assumed growth of the memory usage with the number of routers, used to
+# extrapolate from finished to not yet run network sizes
+MEMORY_GROWTH = 1.5
+
+# The maximum and minimum length of the measurement window in seconds
 EFFECTIVE_SIMULATION_TIME = 1200
+MIN_MEASUREMENT_TIME = 300
 SETTLING_TIME_BUFFER = 100
 
+CONVERGENCE_FILE = 'convergence.json'
+
 logger = logging.getLogger(__name__)
 
 
 class FilterTracer(dmprsim.simulator.Tracer):
+    """
+    Only traces messages after min_time or, if a ConvergenceDetector is
+    given, during its measurement window. All transmitted message sizes are
+    reported to the detector.
+    """
     def __init__(self, *args, **kwargs):
         self.min_time = kwargs.pop('min_time', float('-inf'))
+        self.detector = kwargs.pop('detector', None)
         super(FilterTracer, self).__init__(*args, **kwargs)
 
     def log(self, tracepoint, msg, time):
-        if time < self.min_time:
+        if self.detector is None:
+            if time < self.min_time:
+                return
+            return super(FilterTracer, self).log(tracepoint, msg, time)
+
+        files = self.get_files(tracepoint)
+        if not files:
             return
-        return super(FilterTracer, self).log(tracepoint, msg, time)
+        json_msg = self.serialize(msg)
+        if tracepoint.startswith('tx.msg'):
+            self.detector.record_message(time, len(json_msg))
+        if self.detector.measuring(time):
+            self.write(files, json_msg, time)
 
 
 class MessageSizeScenario(object):
+    """
+    Simulate grid topologies for all combinations of sizes, meshes, losses
+    and intervals
+
+    With a `threshold` the sweep is adaptive: only every `coarse_step`-th
+    value of each parameter (and the last one) is run first. Afterwards the
+    midpoint between two neighboring runs along one parameter is added
+    whenever their mean message sizes differ by more than `threshold`
+    (relative), until no more points are added.
+    """
+
     def __init__(self, args: object, results_dir: Path, scenario_dir: Path,
-                 sizes, meshes, losses, intervals):
+                 sizes, meshes, losses, intervals, threshold: float = None,
+                 coarse_step: int = 4):
         self.args = args
         self.scenario_dir = scenario_dir
         self.results_dir = results_dir
+        self.journal_file = self.scenario_dir / JOURNAL_FILE
         self.checkpoint_file = self.scenario_dir / CHECKPOINT_FILE
+        self.threshold = threshold
+        self.coarse_step = coarse_step
 
-        self.combinations = set(
-            itertools.product(sizes, meshes, losses, intervals))
+        self.axes = tuple(sorted(values)
+                          for values in (sizes, meshes, losses, intervals))
+        self.combinations = set(itertools.product(*self.axes))
         self.all = self.combinations.copy()
 
     def start(self):
-        very_high_memory = {c for c in self.combinations if c[0] == 15}
-        combinations = self.combinations - very_high_memory
-
-        high_memory = {c for c in combinations if c[0] >= 13}
-        combinations = combinations - high_memory
-
-        mid_memory = {c for c in combinations if c[0] >= 9 and c[1] >= 2}
-        low_memory = combinations - mid_memory
-
-        ram = getattr(self.args, 'max_ram', 16)
-        if ram < 14:
-            print("Need at least 14 GB")
-            exit(1)
-
-        logger.info("Starting low memory scenarios, ~2GB each")
-        self._apply(math.floor(ram / 2), low_memory)
-        logger.info("Starting mid memory scenarios, ~4GB each")
-        self._apply(math.floor(ram / 4), mid_memory)
-        logger.info("Starting high memory scenarios, ~8GB each")
-        self._apply(math.floor(ram / 8), high_memory)
-        logger.info("Starting very high memory scenarios, ~12GB each")
-        self._apply(math.floor(ram / 12), very_high_memory)
-
-        (self.scenario_dir / '.done').touch()
+        with Journal(self.journal_file) as journal:
+            self._migrate_checkpoint(journal)
+
+            ram = getattr(self.args, 'max_ram', 16)
+            scheduler = MemoryScheduler(
+                budget=ram * GB,
+                key=lambda combination: combination[:2],
+                prior=self._estimate_memory,
+            )
+            # Resumed sweeps start with the memory usage of finished runs
+            for combination, entry in journal.entries.items():
+                if entry.get('peak_rss'):
+                    scheduler.observe(combination[:2], entry['peak_rss'])
+
+            if getattr(self.args, 'queue', False):
+                queue = WorkQueue(self.scenario_dir / QUEUE_DIR)
+                self._sweep(journal, functools.partial(
+                    self._run_queued, queue, journal, scheduler))
+                failed = queue.failed()
+                if failed:
+                    logger.error("{} scenarios failed: {}".format(
+                        len(failed), ', '.join(sorted(failed))))
+            else:
+                self._sweep(journal, functools.partial(
+                    self._run_all, journal, scheduler))
+
         logger.info("Scenarios done")
 
-    def _save_checkpoint(self, data):
-        try:
-            self.checkpoint_file.parent.mkdir(parents=True)
-        except FileExistsError:
-            pass
-        with self.checkpoint_file.open('wb') as f:
-            pickle.dump(data, f)
-
-    def _apply(self, cores, data):
-        pool = multiprocessing.Pool(cores)
+    def _sweep(self, record, run):
+        """
+        Run all combinations or, for an adaptive sweep, refine level by level
+        with `run(combinations)`, `record` is the Journal with the finished
+        runs
+        """
+        if self.threshold is None:
+            run(self.combinations)
+            return
+
+        todo = self._coarse()
+        level = 0
+        while todo:
+            logger.info("Adaptive sweep level {}: {} combinations".format(
+                level, len(todo)))
+            run(todo)
+            todo = self._refine(record)
+            level += 1
+        logger.info("Adaptive sweep ran {} of {} combinations".format(
+            len(self.all & record.done()), len(self.all)))
+
+    def _run_queued(self, queue: WorkQueue, journal: Journal,
+                    scheduler: MemoryScheduler, combinations: set):
+        """
+        Queue the combinations and work on the queue with local worker
+        processes until the queue is empty, workers on other hosts may work
+        on the same queue. The finished runs of all hosts are added to the
+        journal.
+        """
+        queue.put(sorted(combinations - journal.done()))
+        for combination, entry in queue.entries.items():
+            if entry.get('peak_rss'):
+                scheduler.observe(combination[:2], entry['peak_rss'])
+
+        # Every worker may claim the largest of the combinations, only start
+        # as many as fit into the memory budget
+        largest = max(scheduler.predict(combination[:2])
+                      for combination in combinations)
+        processes = min(getattr(self.args, 'processes', None) or
+                        multiprocessing.cpu_count(),
+                        max(1, scheduler.budget // largest))
+        logger.info("Starting {} local workers for up to {:.1f} GB per "
+                    "scenario".format(processes, largest / GB))
+        workers = [multiprocessing.Process(target=queue.work,
+                                           args=(self._run_job,))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode for worker in workers) and queue.pending():
+            logger.error("Local workers died, unfinished scenarios are left "
+                         "in the queue for the next run")
+
+        for combination, entry in queue.entries.items():
+            if combination not in journal:
+                journal.append(combination, duration=entry.get('duration'),
+                               peak_rss=entry.get('peak_rss'),
+                               mean_size=entry.get('mean_size'))
+
+    def _run_job(self, combination: tuple) -> dict:
+        return {'mean_size': self._run(combination)}
+
+    def _run_all(self, journal: Journal, scheduler: MemoryScheduler,
+                 combinations: set):
+        todo = combinations - journal.done()
+        if not todo:
+            logger.info("All scenarios already done")
+            return
+
+        cur = len(combinations) - len(todo)
+        num = len(combinations)
+        # sorted with random (i.e. shuffle) because pypy sets are ordered
+        # but we want our progress percentage to be representative
+        for processed, mean_size, usage in scheduler.run(
+                self._run, sorted(todo, key=lambda k: random.random())):
+            cur += 1
+            logger.info('DONE: {:.2%}'.format(cur / num))
+            if usage.exitcode:
+                # Not journaled, a resumed sweep runs it again
+                continue
+            journal.append(processed, duration=usage.duration,
+                           peak_rss=usage.peak_rss, mean_size=mean_size)
+
+    def _coarse(self) -> set:
+        """
+        Return the combinations of every `coarse_step`-th value of each axis
+        """
+        coarse = []
+        for values in self.axes:
+            indices = set(range(0, len(values), self.coarse_step))
+            indices.add(len(values) - 1)
+            coarse.append([values[i] for i in sorted(indices)])
+        return set(itertools.product(*coarse))
+
+    def _result(self, combination: tuple, entries: dict):
+        """
+        Return the mean message size of a finished combination, runs of
+        former versions only have their tracefiles
+        """
+        entry = entries[combination]
+        if 'mean_size' not in entry:
+            count = total = 0
+            name = '{}-{}-{}-{}'.format(*combination)
+            for tracefile in (self.scenario_dir / name).glob(
+                    'routers/*/trace/tx.msg'):
+                for _, msg in extract_messages(tracefile):
+                    count += 1
+                    total += len(msg)
+            entry['mean_size'] = total / count if count else None
+        return entry['mean_size']
+
+    def _differ(self, a, b) -> bool:
+        if a is None or b is None:
+            return False
+        return abs(a - b) > self.threshold * max(abs(a), abs(b))
+
+    def _refine(self, record) -> set:
+        """
+        Return the midpoints between neighboring finished combinations whose
+        results differ by more than the threshold
+        """
+        entries = record.entries
+        done = self.all & set(entries)
+        refine = set()
+        for axis, values in enumerate(self.axes):
+            index = {value: i for i, value in enumerate(values)}
+            # All finished combinations on a line parallel to the axis
+            lines = {}
+            for combination in done:
+                rest = combination[:axis] + combination[axis + 1:]
+                lines.setdefault(rest, []).append(combination)
+            for line in lines.values():
+                line.sort(key=lambda c: index[c[axis]])
+                for a, b in zip(line, line[1:]):
+                    low, high = index[a[axis]], index[b[axis]]
+                    if high - low < 2 or not self._differ(
+                            self._result(a, entries),
+                            self._result(b, entries)):
+                        continue
+                    middle = values[(low + high) // 2]
+                    refine.add(a[:axis] + (middle,) + a[axis + 1:])
+        return refine - done
+
+    def _migrate_checkpoint(self, journal: Journal):
+        """
+        Import the finished runs of the former pickled checkpoint
+        """
         try:
             with self.checkpoint_file.open('rb') as f:
                 done = pickle.load(f)
         except FileNotFoundError:
-            done = set()
+            return
+        for combination in done - journal.done():
+            journal.append(combination)
+        journal.sync()
+        self.checkpoint_file.unlink()
 
-        cur = len(done)
-        num = len(self.all)
-        data = data - done
+    @staticmethod
+    def _num_routers(size: int) -> int:
+        return 2 if size == 1 else size * size
 
-        try:
-            # sorted with random (i.e. shuffle) because pypy sets are ordered
-            # but we want our progress percentage to be representative
-            for processed in pool.imap_unordered(
-                    self._run,
-                    sorted(data, key=lambda k: random.random()),
-                    chunksize=5):
-                cur += 1
-                logger.info('DONE: {:.2%}'.format(cur / num))
-                done.add(processed)
-                if cur % 100 == 0:
-                    self._save_checkpoint(done)
-
-            pool.close()
-            pool.join()
-        finally:
-            self._save_checkpoint(done)
+    def _estimate_memory(self, key: tuple, observed: dict) -> int:
+        """
+        Estimate the memory usage of a (size, mesh) combination which has not
+        been run yet
+
+        Extrapolates from the largest finished network with the same density,
+        before the first of those finished use a pessimistic estimate
+        """
+        size, mesh = key
+        candidates = [s for s, m in observed if m == mesh and s < size]
+        if candidates:
+            known = max(candidates)
+            factor = self._num_routers(size) / self._num_routers(known)
+            return int(observed[(known, mesh)] * factor ** MEMORY_GROWTH)
+
+        if size >= 15:
+            return 12 * GB
+        if size >= 13:
+            return 8 * GB
+        if size >= 9 and mesh >= 2:
+            return 4 * GB
+        return 2 * GB
 
     def _run(self, data):
         size, mesh, loss, full_interval = data
@@ -123,17 +321,24 @@ class MessageSizeScenario(object):
         else:
             min_prop_path_length = size
 
+        # The measurement starts once the network converged, at the latest
+        # after the estimated settling time
         settling_time = (min_prop_path_length + min_prop_path_length * loss) * \
                         (AVG_MSG_INTERVAL / 2)
-        simu_time = EFFECTIVE_SIMULATION_TIME + SETTLING_TIME_BUFFER + \
-                    settling_time
-        simu_time = int(math.ceil(simu_time))
-        min_trace_time = simu_time - EFFECTIVE_SIMULATION_TIME
+        max_settling = int(math.ceil(SETTLING_TIME_BUFFER + settling_time))
+        detector = ConvergenceDetector(
+            stable_window=int(math.ceil(2 * AVG_MSG_INTERVAL)),
+            max_settling=max_settling,
+            min_measure=MIN_MEASUREMENT_TIME,
+            max_measure=EFFECTIVE_SIMULATION_TIME,
+        )
+        simu_time = max_settling + EFFECTIVE_SIMULATION_TIME
 
-        tracer = functools.partial(FilterTracer, min_time=min_trace_time)
+        tracer = functools.partial(FilterTracer, detector=detector)
 
         logger.info("Starting scenario: size {size}x{size} loss {loss:.0%} "
-                    "density {mesh:.2f} interval {interval} time {time}".format(
+                    "density {mesh:.2f} interval {interval} "
+                    "max. time {time}".format(
             size=size, loss=loss, mesh=mesh, interval=full_interval,
             time=simu_time))
 
@@ -152,6 +357,12 @@ class MessageSizeScenario(object):
         sim.quiet = not getattr(self.args, 'verbose', False)
         sim.interfaces[0]['rx-loss'] = loss
         sim.prepare()
-        for _ in sim.start():
-            pass
-        return data
+        for sec in sim.start():
+            if detector.step(sec, sim.churn[-1]):
+                break
+
+        with (scenario_dir / CONVERGENCE_FILE).open('w') as f:
+            json.dump({'measurement_start': detector.measurement_start,
+                       'measurement_end': detector.measurement_end},
+                      f, sort_keys=True)
+        return detector.mean_size()
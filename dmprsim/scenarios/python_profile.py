@@ -3,6 +3,7 @@ A quick scenario for code profiling
 """
 from pathlib import Path
 
+from dmprsim.simulator import ConstantVelocity
 from dmprsim.topologies.randomized import RandomTopology
 
 
@@ -12,7 +13,7 @@ def main(args, results_dir: Path, scenario_dir: Path):
         simulation_time=50,
         num_routers=100,
         area=(500, 500),
-        velocity=lambda: 0.05,
+        velocity=ConstantVelocity(0.05),
         args=args,
         scenario_dir=scenario_dir,
         results_dir=results_dir,
@@ -0,0 +1,219 @@
+"""
+A memory-aware job scheduler for parameter sweeps
+
+Every job runs in its own worker process whose peak memory (RSS) is measured.
+The scheduler learns the memory usage per job class (e.g. network size and
+density) from finished jobs and only starts new jobs while the predicted memory
+usage of all running jobs fits into the configured budget. Large and small jobs
+are mixed dynamically to make the best use of memory and cores. A worker which
+is killed, e.g. by the out of memory killer, fails its job instead of stalling
+the sweep.
+"""
+import collections
+import logging
+import multiprocessing
+import multiprocessing.connection
+import resource
+import sys
+import time
+
+GB = 1024 ** 3
+
+# Resources used by a finished job, peak_rss is the peak memory usage of the
+# job on top of the pages shared with the scheduler in bytes and duration in
+# seconds. The exitcode of the worker is nonzero if it was killed, peak_rss is
+# None then.
+Usage = collections.namedtuple('Usage', ('peak_rss', 'duration', 'exitcode'))
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss() -> int:
+    """
+    Return the peak resident set size of the current process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform != 'darwin':
+        peak *= 1024
+    return peak
+
+
+def rss() -> int:
+    """
+    Return the current resident set size of the current process in bytes or
+    0 where it is not known
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _measure(func, job, conn):
+    start = time.monotonic()
+    # A forked worker starts with the pages of the scheduling process, which
+    # it shares and which do not belong to the job
+    inherited = rss()
+    try:
+        result = func(job)
+        message = result, Usage(max(peak_rss() - inherited, 0),
+                                time.monotonic() - start, 0)
+    except Exception as e:
+        message = e
+    conn.send(message)
+    conn.close()
+
+
+def start_job(func, job):
+    """
+    Run func(job) in a fresh process so the measured peak memory usage
+    belongs to exactly this job, returns the reading end of the result pipe
+    and the process
+    """
+    conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_measure,
+                                      args=(func, job, child_conn))
+    process.start()
+    child_conn.close()
+    return conn, process
+
+
+def finish_job(conn, process, job, start: float) -> tuple:
+    """
+    Wait for a job started with start_job and return its (result, usage),
+    exceptions raised by the job are reraised. The result of a job whose
+    process was killed is None.
+    """
+    try:
+        message = conn.recv()
+    except EOFError:
+        message = None
+    conn.close()
+    process.join()
+
+    if isinstance(message, BaseException):
+        raise message
+    if message is None:
+        exitcode = process.exitcode or -1
+        logger.error("Job {} failed, its worker exited with {}".format(
+            job, exitcode))
+        return None, Usage(None, time.monotonic() - start, exitcode)
+    return message
+
+
+def run_job(func, job) -> tuple:
+    """
+    Run func(job) in a fresh process and return its (result, usage) like
+    finish_job
+    """
+    start = time.monotonic()
+    conn, process = start_job(func, job)
+    return finish_job(conn, process, job, start)
+
+
+class MemoryScheduler(object):
+    """
+    Run jobs in a process pool while keeping the predicted total memory usage
+    below `budget` bytes
+
+    :param budget: The memory budget in bytes
+    :param key: Maps a job to its job class, all jobs of a class are expected
+        to use roughly the same amount of memory
+    :param prior: Called with the job class and a dict of all observed peak
+        memory usages per job class, returns an estimate in bytes for job
+        classes which have not been observed yet
+    :param processes: The maximum number of concurrent jobs, defaults to the
+        number of cpus
+    :param margin: Safety factor applied to observed memory usages
+    """
+
+    def __init__(self, budget: int, key, prior, processes: int = None,
+                 margin: float = 1.2):
+        self.budget = budget
+        self.key = key
+        self.prior = prior
+        self.processes = processes or multiprocessing.cpu_count()
+        self.margin = margin
+        self.observed = {}
+
+    def observe(self, key, peak: int):
+        """
+        Record the peak memory usage of a finished job of class `key`
+        """
+        self.observed[key] = max(peak, self.observed.get(key, 0))
+
+    def predict(self, key) -> int:
+        if key in self.observed:
+            return int(self.observed[key] * self.margin)
+        return int(self.prior(key, self.observed))
+
+    def _pick(self, pending: dict, free: int):
+        """
+        Return the job class with the largest predicted memory usage which
+        still fits into `free` bytes or None
+        """
+        best = None
+        best_prediction = -1
+        for key in pending:
+            prediction = self.predict(key)
+            if best_prediction < prediction <= free:
+                best, best_prediction = key, prediction
+        return best
+
+    def run(self, func, jobs):
+        """
+        Apply func to all jobs and yield (job, result, usage) in order of
+        completion, usage is the Usage of the job. The result of a job whose
+        worker was killed is None, exceptions raised by func are reraised
+
+        func and the jobs must be picklable
+        """
+        pending = {}
+        for job in jobs:
+            pending.setdefault(self.key(job), []).append(job)
+
+        running = {}
+        used = 0
+        try:
+            while pending or running:
+                while pending and len(running) < self.processes:
+                    key = self._pick(pending, self.budget - used)
+                    if key is None:
+                        if running:
+                            break
+                        # Not even a single job fits, run the largest alone
+                        key = max(pending, key=self.predict)
+                        logger.warning(
+                            "Job {} needs an estimated {:.1f} GB, more than "
+                            "the budget of {:.1f} GB, running it alone".format(
+                                key, self.predict(key) / GB,
+                                self.budget / GB))
+                    job = pending[key].pop()
+                    if not pending[key]:
+                        del pending[key]
+                    prediction = self.predict(key)
+                    used += prediction
+                    conn, process = start_job(func, job)
+                    running[conn] = job, prediction, process, time.monotonic()
+
+                # A killed worker closes its end of the pipe as well
+                for conn in multiprocessing.connection.wait(list(running)):
+                    job, prediction, process, start = running.pop(conn)
+                    used -= prediction
+                    yield self._finish(conn, process, job, start)
+        finally:
+            for conn, (_, _, process, _) in running.items():
+                process.terminate()
+                conn.close()
+
+    def _finish(self, conn, process, job, start: float):
+        result, usage = finish_job(conn, process, job, start)
+        if usage.exitcode:
+            return job, result, usage
+
+        self.observe(self.key(job), usage.peak_rss)
+        logger.debug("Job {} used {:.2f} GB in {:.0f}s".format(
+            job, usage.peak_rss / GB, usage.duration))
+        return job, result, usage
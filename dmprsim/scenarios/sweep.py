@@ -0,0 +1,303 @@
+"""
+A declarative parameter sweep over any topology in dmprsim.topologies
+
+A sweep is described by a json (or, if a toml parser is available, toml) spec:
+
+    {
+        "name": "grid-density",
+        "topology": "grid",
+        "parameters": {"size": [3, 5, 7], "range_factor": [1, 1.5, 2]},
+        "fixed": {"simulation_time": 300,
+                  "core_config": {"max-full-update-interval": 3}},
+        "seeds": [1, 2, 3],
+        "tracepoints": ["tx.msg"],
+        "collectors": ["message-sizes", "routing-tables"],
+        "args": {"simulate_forwarding": true},
+        "max_ram": 16,
+        "memory_estimate": 1
+    }
+
+- topology: one of TOPOLOGIES or `package.module:Class`
+- parameters: the grid of constructor arguments, every combination is run
+- fixed: constructor arguments shared by all runs
+- seeds: every combination is run once per seed, the seed is used for
+  preparing and simulating the network. For other combinations add
+  random_seed_prep or random_seed_runtime to parameters instead
+- tracepoints: the enabled tracepoints of all routers
+- collectors: the results collected after each run, see COLLECTORS
+- args: overrides of the command line options, e.g. simulate_forwarding
+- max_ram, memory_estimate: memory budget and the initial per run estimate
+  in GB, see dmprsim.scenarios.scheduler
+
+A velocity parameter is either a number (constant velocity) or a dict with
+the arguments of RandomVelocity, e.g. {"exponent": 6}.
+
+Every run writes its parameters and collected results to
+`<results_dir>/<run>/result.json`, finished runs are recorded in a journal
+so an interrupted sweep can be resumed.
+"""
+import argparse
+import hashlib
+import importlib
+import itertools
+import json
+import logging
+import random
+from collections import OrderedDict
+from pathlib import Path
+
+from dmprsim.analyze._utils.extract_messages import extract_messages
+from dmprsim.scenarios.journal import Journal
+from dmprsim.scenarios.scheduler import GB, MemoryScheduler
+from dmprsim.simulator import ConstantVelocity, RandomVelocity
+from dmprsim.topologies.utils import GenericTopology
+
+JOURNAL_FILE = '.sweep.journal'
+RESULT_FILE = 'result.json'
+
+# The topologies of dmprsim.topologies by their short name
+TOPOLOGIES = {
+    'circle': 'dmprsim.topologies.circle:CircleTopology',
+    'grid': 'dmprsim.topologies.grid:GridTopology',
+    'randomized': 'dmprsim.topologies.randomized:RandomTopology',
+}
+
+SPEC_KEYS = {'name', 'topology', 'parameters', 'fixed', 'seeds',
+             'tracepoints', 'collectors', 'args', 'max_ram',
+             'memory_estimate'}
+
+logger = logging.getLogger(__name__)
+
+
+def collect_message_sizes(topology: GenericTopology, scenario_dir: Path):
+    count = total = maximum = 0
+    for tracefile in scenario_dir.glob('routers/*/trace/tx.msg'):
+        for _, msg in extract_messages(tracefile):
+            count += 1
+            total += len(msg)
+            maximum = max(maximum, len(msg))
+    return {
+        'messages': count,
+        'bytes': total,
+        'mean': total / count if count else None,
+        'max': maximum,
+    }
+
+
+def collect_routing_tables(topology: GenericTopology, scenario_dir: Path):
+    entries = {}
+    for model in topology.models:
+        for tos, table in model.router.routing_table.items():
+            entries.setdefault(tos, []).append(len(table))
+    return {tos: sum(e) / len(topology.models)
+            for tos, e in entries.items()}
+
+
+def collect_forwarding(topology: GenericTopology, scenario_dir: Path):
+    return {tos: dict(stats, ratio=stats['delivered'] / stats['sent'])
+            for tos, stats in topology.forwarding_stats.items()}
+
+
+# Results collected after a run, each collector is called with the topology
+# and the scenario directory of the run and returns a json serializable result
+COLLECTORS = {
+    'message-sizes': collect_message_sizes,
+    'routing-tables': collect_routing_tables,
+    'forwarding': collect_forwarding,
+}
+
+
+def load_spec(path: Path) -> dict:
+    text = path.read_text()
+    if path.suffix == '.toml':
+        try:
+            import tomllib as toml
+        except ImportError:
+            import toml
+        spec = toml.loads(text)
+    else:
+        spec = json.loads(text)
+    validate_spec(spec)
+    return spec
+
+
+def validate_spec(spec: dict):
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise ValueError("Unknown keys in sweep spec: {}".format(
+            ', '.join(sorted(unknown))))
+    for key in ('name', 'topology'):
+        if key not in spec:
+            raise ValueError("Sweep spec needs a {}".format(key))
+    for collector in spec.get('collectors', ()):
+        if collector not in COLLECTORS:
+            raise ValueError("Unknown collector {}, choose from {}".format(
+                collector, ', '.join(sorted(COLLECTORS))))
+    get_topology_cls(spec['topology'])
+
+
+def get_topology_cls(name: str) -> type:
+    if ':' not in name:
+        if name not in TOPOLOGIES:
+            raise ValueError("Unknown topology {}, use one of {} or "
+                             "package.module:Class".format(
+                                 name, ', '.join(sorted(TOPOLOGIES))))
+        name = TOPOLOGIES[name]
+    module, cls = name.split(':')
+    return getattr(importlib.import_module(module), cls)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, (int, float, str)):
+        return str(value)
+    serialized = json.dumps(value, sort_keys=True)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()[:8]
+
+
+def expand_runs(spec: dict) -> OrderedDict:
+    """
+    Return the parameters of all runs of a sweep by run name
+    """
+    parameters = OrderedDict(sorted(spec.get('parameters', {}).items()))
+    seeds = spec.get('seeds', [None])
+
+    runs = OrderedDict()
+    for values in itertools.product(*parameters.values()):
+        varying = OrderedDict(zip(parameters, values))
+        for seed in seeds:
+            params = dict(spec.get('fixed', {}))
+            params.update(varying)
+            name = ['{}={}'.format(k, _format_value(v))
+                    for k, v in varying.items()]
+            if seed is not None:
+                params['random_seed_prep'] = seed
+                params['random_seed_runtime'] = seed
+                name.append('seed={}'.format(seed))
+            runs[','.join(name) or 'default'] = params
+    return runs
+
+
+def _convert(name: str, value):
+    """
+    Convert the json representation of a constructor argument
+    """
+    if name == 'velocity':
+        if isinstance(value, dict):
+            return RandomVelocity(**value)
+        return ConstantVelocity(value)
+    if name == 'area':
+        return tuple(value)
+    return value
+
+
+def simulate(topology_cls: type, params: dict, scenario_dir: Path,
+             results_dir: Path, name: str, tracepoints, args: object,
+             collectors, progress=None) -> dict:
+    """
+    Simulate one topology with the json representation of its constructor
+    arguments and return the results of the collectors
+
+    progress is called with the current and the last second of the
+    simulation after every simulated second
+    """
+    kwargs = {k: _convert(k, v) for k, v in params.items()}
+    sim = topology_cls(
+        scenario_dir=scenario_dir,
+        results_dir=results_dir,
+        name=name,
+        tracepoints=tuple(tracepoints),
+        args=args,
+        **kwargs
+    )
+    sim.prepare()
+    for sec in sim.start():
+        if progress is not None:
+            progress(sec, sim.simulation_time)
+    for model in sim.models:
+        model.router.tracer.flush()
+
+    return {collector: COLLECTORS[collector](sim, scenario_dir)
+            for collector in collectors}
+
+
+def write_result(results_dir: Path, name: str, params: dict, results: dict):
+    try:
+        results_dir.mkdir(parents=True)
+    except FileExistsError:
+        pass
+    with (results_dir / RESULT_FILE).open('w') as f:
+        json.dump({'name': name, 'parameters': params, 'results': results},
+                  f, sort_keys=True, indent=4)
+
+
+class SweepScenario(object):
+    def __init__(self, args: object, results_dir: Path, scenario_dir: Path,
+                 spec: dict):
+        self.args = args
+        self.results_dir = results_dir
+        self.scenario_dir = scenario_dir
+        self.spec = spec
+        self.journal_file = scenario_dir / JOURNAL_FILE
+        self.runs = expand_runs(spec)
+
+        # Runs which only differ in their seed use the same amount of memory
+        self.groups = {}
+        for name in self.runs:
+            self.groups[name] = ','.join(
+                part for part in name.split(',')
+                if not part.startswith('seed='))
+
+    def start(self):
+        with Journal(self.journal_file) as journal:
+            todo = [name for name in self.runs if (name,) not in journal]
+            if not todo:
+                logger.info("All runs of sweep {} already done".format(
+                    self.spec['name']))
+                return
+
+            estimate = self.spec.get('memory_estimate', 1) * GB
+            scheduler = MemoryScheduler(
+                budget=self.spec.get('max_ram', 16) * GB,
+                key=self.groups.__getitem__,
+                prior=lambda key, observed: estimate,
+            )
+            for (name,), entry in journal.entries.items():
+                if name in self.groups and entry.get('peak_rss'):
+                    scheduler.observe(self.groups[name], entry['peak_rss'])
+
+            cur = len(self.runs) - len(todo)
+            num = len(self.runs)
+            for name, _, usage in scheduler.run(
+                    self._run, sorted(todo, key=lambda k: random.random())):
+                cur += 1
+                logger.info('DONE: {:.2%}'.format(cur / num))
+                if usage.exitcode:
+                    # Not journaled, a resumed sweep runs it again
+                    continue
+                journal.append((name,), duration=usage.duration,
+                               peak_rss=usage.peak_rss)
+
+        logger.info("Sweep {} done".format(self.spec['name']))
+
+    def _topology_args(self) -> argparse.Namespace:
+        args = {k: v for k, v in getattr(self.args, '__dict__', {}).items()
+                if k != 'func'}
+        args.setdefault('quiet', True)
+        args.update(self.spec.get('args', {}))
+        return argparse.Namespace(**args)
+
+    def _run(self, name: str) -> str:
+        params = self.runs[name]
+        results_dir = self.results_dir / name
+        logger.info("Starting run {}".format(name))
+        results = simulate(
+            get_topology_cls(self.spec['topology']), params,
+            scenario_dir=self.scenario_dir / name,
+            results_dir=results_dir,
+            name=name,
+            tracepoints=self.spec.get('tracepoints', ()),
+            args=self._topology_args(),
+            collectors=self.spec.get('collectors', ()),
+        )
+        write_result(results_dir, name, params, results)
+        return name
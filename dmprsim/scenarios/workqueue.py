@@ -0,0 +1,253 @@
+"""
+A work queue in a (shared) directory for running a sweep on several hosts
+
+Every job is a file which moves through the subdirectories of the queue:
+
+    todo/ -> claimed/ -> done/
+                      -> failed/
+
+A worker claims a job by renaming it from todo/ to claimed/, the rename is
+atomic so exactly one worker wins. While running the job the worker touches
+its claimed file regularly, a claimed job whose file was not touched for
+`lease` seconds belongs to a dead worker and is moved back to todo/ by any
+other worker. Every job runs in its own process, a job whose process is
+killed, e.g. by the out of memory killer, is moved back to todo/ right away.
+Every claim is counted in the job file, a job which was claimed
+`max_attempts` times without finishing is moved to failed/ instead of being
+run again. A finished job is written to done/ with its duration, its peak
+memory usage and the values returned by the job function.
+
+Any number of workers on any number of hosts can work on the same queue as
+long as the hosts share the directory, the clocks of the hosts should be
+synchronized to within a fraction of the lease.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import urllib.parse
+from pathlib import Path
+
+from dmprsim.scenarios.scheduler import run_job
+
+LEASE = 300
+POLL_INTERVAL = 5
+MAX_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def worker_id() -> str:
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+class WorkQueue(object):
+    """
+    :param path: The queue directory
+    :param lease: Seconds after which a claimed job of an unresponsive worker
+        is run again
+    :param poll_interval: Seconds to wait for jobs claimed by other workers
+    :param max_attempts: How often a job is claimed, i.e. run again after
+        its process was killed or its lease expired, before it is failed
+    """
+
+    def __init__(self, path: Path, lease: float = LEASE,
+                 poll_interval: float = POLL_INTERVAL,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.dirs = {name: path / name
+                     for name in ('todo', 'claimed', 'done', 'failed')}
+        for directory in self.dirs.values():
+            try:
+                directory.mkdir(parents=True)
+            except FileExistsError:
+                pass
+
+    @staticmethod
+    def _name(run) -> str:
+        return urllib.parse.quote('-'.join(str(v) for v in run), safe='')
+
+    def _list(self, state: str) -> list:
+        return [f.name for f in self.dirs[state].iterdir()
+                if not f.name.startswith('.')]
+
+    def _write(self, state: str, name: str, content: dict):
+        """
+        Atomically write a job file, readers never see a partial file
+        """
+        tmp = self.dirs[state] / '.{}.{}'.format(name, worker_id())
+        with tmp.open('w') as f:
+            json.dump(content, f, sort_keys=True)
+        os.replace(str(tmp), str(self.dirs[state] / name))
+
+    def _read(self, state: str, name: str):
+        try:
+            with (self.dirs[state] / name).open() as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, runs):
+        """
+        Add runs which are not queued, running or done yet
+        """
+        known = set()
+        for state in self.dirs:
+            known.update(self._list(state))
+        for run in runs:
+            name = self._name(run)
+            if name not in known:
+                self._write('todo', name, {'run': list(run)})
+                known.add(name)
+
+    @property
+    def entries(self) -> dict:
+        """
+        The results of all finished runs by run, like Journal.entries
+        """
+        entries = {}
+        for name in self._list('done'):
+            entry = self._read('done', name)
+            if entry is not None:
+                entries[tuple(entry.pop('run'))] = entry
+        return entries
+
+    def done(self) -> set:
+        return set(self.entries)
+
+    def __contains__(self, run) -> bool:
+        return (self.dirs['done'] / self._name(run)).exists()
+
+    def failed(self) -> dict:
+        return {name: self._read('failed', name)
+                for name in self._list('failed')}
+
+    def requeue_expired(self) -> int:
+        """
+        Move claimed jobs with an expired lease back to todo/
+        """
+        requeued = 0
+        now = time.time()
+        for name in self._list('claimed'):
+            claimed = self.dirs['claimed'] / name
+            try:
+                if now - claimed.stat().st_mtime < self.lease:
+                    continue
+                os.rename(str(claimed), str(self.dirs['todo'] / name))
+            except FileNotFoundError:
+                # Finished or requeued by another worker in the meantime
+                continue
+            logger.warning("Lease of {} expired, requeued".format(name))
+            requeued += 1
+        return requeued
+
+    def claim(self):
+        """
+        Return the name and run of a claimed job or None if no job is left
+        in todo/
+        """
+        names = self._list('todo')
+        random.shuffle(names)
+        for name in names:
+            todo = self.dirs['todo'] / name
+            try:
+                # The rename keeps the modification time, renew it first so
+                # the lease of the claimed job never looks expired
+                os.utime(str(todo))
+                os.rename(str(todo), str(self.dirs['claimed'] / name))
+            except FileNotFoundError:
+                # Another worker was faster
+                continue
+            if (self.dirs['done'] / name).exists():
+                # Finished by a worker whose lease had expired
+                self._release(name)
+                continue
+            job = self._read('claimed', name)
+            attempts = job.get('attempts', 0)
+            if attempts >= self.max_attempts:
+                logger.error("{} was claimed {} times without finishing, "
+                             "giving up".format(name, attempts))
+                self._write('failed', name, dict(
+                    job, worker=worker_id(),
+                    error='Not finished after {} attempts'.format(attempts)))
+                self._release(name)
+                continue
+            self._write('claimed', name, dict(job, attempts=attempts + 1))
+            return name, tuple(job['run'])
+        return None
+
+    def _release(self, name: str):
+        try:
+            (self.dirs['claimed'] / name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _requeue(self, name: str):
+        try:
+            os.rename(str(self.dirs['claimed'] / name),
+                      str(self.dirs['todo'] / name))
+        except FileNotFoundError:
+            pass
+
+    def _heartbeat(self, name: str, stop: threading.Event):
+        while not stop.wait(self.lease / 10):
+            try:
+                os.utime(str(self.dirs['claimed'] / name))
+            except FileNotFoundError:
+                logger.warning("Lost the lease of {}".format(name))
+                return
+
+    def pending(self) -> bool:
+        return bool(self._list('todo') or self._list('claimed'))
+
+    def work(self, func):
+        """
+        Run func(run) for all queued runs until the queue is empty and no
+        other worker is running a job, func returns a dict of json
+        serializable values stored with the result
+        """
+        while True:
+            claimed = self.claim()
+            if claimed is None:
+                if self.requeue_expired():
+                    continue
+                if not self.pending():
+                    return
+                time.sleep(self.poll_interval)
+                continue
+
+            name, run = claimed
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat,
+                                         args=(name, stop), daemon=True)
+            heartbeat.start()
+            error = None
+            try:
+                values, usage = run_job(func, run)
+            except Exception:
+                logger.exception("Run {} failed".format(name))
+                error = traceback.format_exc()
+            finally:
+                stop.set()
+                heartbeat.join()
+
+            if error is not None:
+                self._write('failed', name, {'run': list(run),
+                                             'worker': worker_id(),
+                                             'error': error})
+            elif usage.exitcode:
+                # Run again until it was claimed max_attempts times
+                self._requeue(name)
+                continue
+            else:
+                self._write('done', name, dict(
+                    values or {}, run=list(run), worker=worker_id(),
+                    duration=usage.duration, peak_rss=usage.peak_rss))
+            self._release(name)
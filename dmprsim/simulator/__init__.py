@@ -1,2 +1,3 @@
-from .models import TimeWrapper, MobilityArea, MovingMobilityModel
+from .models import TimeWrapper, MobilityArea, MovingMobilityModel, \
+    ConstantVelocity, RandomVelocity
 from .router import Router, Tracer
@@ -1,5 +1,7 @@
+import collections
 import math
 import shutil
+import zlib
 from pathlib import Path
 
 import numpy as np
@@ -9,8 +11,7 @@ try:
 except ImportError:
     import cairocffi as cairo
 
-from .middlewares import RouterForwardedPacketMiddleware, \
-    RouterTransmittedMiddleware
+from .frames import Frame, FrameRenderer, snapshot
 
 RESOLUTION = {
     '4k': (3840, 2160),
@@ -19,8 +20,6 @@ RESOLUTION = {
     'vga': (640, 480),
 }
 
-MAP_TOS_TO_COLOR = {}
-
 link_colors = [
     (255, 0, 0),  # red
     (255, 20, 147),  # pink
@@ -36,34 +35,210 @@ link_colors = [
 link_colors = [tuple(map(lambda x: x / 255, color)) for color in link_colors]
 
 
-def draw_images(args, ld: Path, area, img_idx):
-    IMAGE_WIDTH, IMAGE_HEIGHT = RESOLUTION[getattr(args, 'resolution')]
+def tos_color(tos: str) -> tuple:
+    # Stable across processes unlike hash()
+    return link_colors[zlib.crc32(tos.encode('utf-8')) % len(link_colors)]
 
-    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, IMAGE_WIDTH, IMAGE_HEIGHT)
-    full_ctx = cairo.Context(surface)
-    full_ctx.rectangle(0, 0, IMAGE_WIDTH, IMAGE_HEIGHT)
+
+def tos_dash(tos: str) -> int:
+    return zlib.crc32(tos.encode('utf-8')) % 15 + 1
+
+
+# Frames with more nodes or links than max_nodes or max_links are drawn with
+# less detail: the nodes are aggregated into density cells of cell pixels and
+# the links into one bundle between every pair of cells, only the transmitter
+# and receiver are drawn as nodes with a label
+Detail = collections.namedtuple('Detail', ('max_nodes', 'max_links', 'cell'))
+DETAIL = Detail(max_nodes=400, max_links=1000, cell=16)
+# Number of distinct opacities of the density cells
+DENSITY_LEVELS = 8
+
+# Surfaces of the static layers of recently rendered frames by their content,
+# every rendering process keeps its own cache
+LAYER_CACHE_SIZE = 6
+_layers = collections.OrderedDict()
+# The nodes of the last frame rendered by this process, the layers of the
+# nodes are only cached while they do not move
+_last_nodes = None
+
+
+def _cached_layer(key: tuple, resolution: tuple, draw_layer):
+    """
+    Return the surface drawn by draw_layer(ctx) for key, the layer is only
+    drawn if its key changed, i.e. a node moved, appeared or disappeared
+    """
+    try:
+        _layers.move_to_end(key)
+        return _layers[key]
+    except KeyError:
+        pass
+    layer = cairo.ImageSurface(cairo.FORMAT_ARGB32, *resolution)
+    draw_layer(cairo.Context(layer))
+    _layers[key] = layer
+    while len(_layers) > LAYER_CACHE_SIZE:
+        _layers.popitem(last=False)
+    return layer
+
+
+def _draw_background(ctx, resolution):
+    IMAGE_WIDTH, IMAGE_HEIGHT = resolution
+    ctx.rectangle(0, 0, IMAGE_WIDTH, IMAGE_HEIGHT)
 
     # Fill background
-    full_ctx.set_source_rgb(0.05, 0.05, 0.05)
-    full_ctx.fill()
+    ctx.set_source_rgb(0.05, 0.05, 0.05)
+    ctx.fill()
+
+    draw_backgroud_grid(ctx, IMAGE_WIDTH, IMAGE_HEIGHT)
+
 
-    draw_backgroud_grid(full_ctx, IMAGE_WIDTH, IMAGE_HEIGHT)
+def _scale(frame: Frame, resolution: tuple) -> float:
+    IMAGE_WIDTH, IMAGE_HEIGHT = resolution
+    return min(IMAGE_WIDTH / frame.width, IMAGE_HEIGHT / frame.height)
 
-    draw_frame_info(full_ctx, img_idx)
+
+def _area_context(surface, frame: Frame, resolution: tuple):
+    """
+    Return a context which maps the simulated area onto the surface
+    """
+    IMAGE_WIDTH, IMAGE_HEIGHT = resolution
 
     # Compute the scale factor and center the main context on the surface
-    scale_factor = min(IMAGE_WIDTH / area.width, IMAGE_HEIGHT / area.height)
+    scale_factor = _scale(frame, resolution)
 
-    x_center_offset = IMAGE_WIDTH / 2 - (area.width * scale_factor / 2)
-    y_center_offset = IMAGE_HEIGHT / 2 - (area.height * scale_factor / 2)
+    x_center_offset = IMAGE_WIDTH / 2 - (frame.width * scale_factor / 2)
+    y_center_offset = IMAGE_HEIGHT / 2 - (frame.height * scale_factor / 2)
 
     ctx = cairo.Context(surface)
     ctx.translate(x_center_offset, y_center_offset)
     ctx.scale(scale_factor, scale_factor)
+    return ctx
+
+
+def _node_layer(key, frame: Frame, resolution: tuple, surface, ctx,
+                static: bool, *funcs):
+    """
+    Draw funcs(frame, ctx) onto the surface, through a cached layer if the
+    nodes did not move since the last frame. Drawing the nodes of a moving
+    topology directly saves the extra surface of a layer which is never
+    reused.
+    """
+    if not static:
+        for func in funcs:
+            func(frame, ctx)
+        return
+
+    def draw_layer(layer_ctx):
+        layer_ctx = _area_context(layer_ctx.get_target(), frame, resolution)
+        for func in funcs:
+            func(frame, layer_ctx)
+
+    full_ctx = cairo.Context(surface)
+    full_ctx.set_source_surface(_cached_layer(key, resolution, draw_layer))
+    full_ctx.paint()
+
+
+def render(frame: Frame, resolution: tuple, detail: Detail = DETAIL):
+    """
+    Draw a frame onto a new cairo surface of the given resolution
+
+    The background is drawn onto a cached layer, so is everything which only
+    depends on the position of the nodes while they do not move. Only the
+    frame info, transmissions and links are drawn for every frame.
+    """
+    global _last_nodes
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, *resolution)
+    full_ctx = cairo.Context(surface)
+
+    full_ctx.set_source_surface(_cached_layer(
+        ('background', resolution), resolution,
+        lambda ctx: _draw_background(ctx, resolution)))
+    full_ctx.paint()
+
+    draw_frame_info(full_ctx, frame.index, frame.legend)
+
+    nodes = (resolution, frame.width, frame.height, tuple(
+        (node.x, node.y, node.id, node.role, node.visible)
+        for node in frame.nodes))
+    static = nodes == _last_nodes
+    _last_nodes = nodes
+
+    if (len(frame.nodes) > detail.max_nodes or
+            len(frame.links) > detail.max_links):
+        _render_aggregated(frame, resolution, detail, surface, static)
+        return surface
+
+    ctx = _area_context(surface, frame, resolution)
+    _node_layer(('rings',) + nodes, frame, resolution, surface, ctx, static,
+                draw_surrounding_rings)
+    draw_transmissions(frame, ctx)
+    draw_paths_between_nodes(frame, ctx)
+    _node_layer(('nodes',) + nodes, frame, resolution, surface, ctx, static,
+                draw_node_circle, draw_node_info)
+    return surface
+
+
+def _render_aggregated(frame: Frame, resolution: tuple, detail: Detail,
+                       surface, static: bool):
+    """
+    Draw the density of the nodes, the link bundles and the transmitter and
+    receiver of a large frame
+    """
+    # The size of the cells in the simulated area
+    size = detail.cell / _scale(frame, resolution)
+    cells, counts = node_density(frame.nodes, size)
+
+    ctx = _area_context(surface, frame, resolution)
+    _node_layer(('density', resolution, frame.width, frame.height, size,
+                 cells.tobytes(), counts.tobytes()),
+                frame, resolution, surface, ctx, static,
+                lambda frame, ctx: draw_node_density(ctx, cells, counts,
+                                                     size))
+    draw_transmissions(frame, ctx)
+    draw_link_bundles(frame, ctx, size)
+
+    important = frame._replace(nodes=tuple(
+        node for node in frame.nodes if node.role is not None))
+    draw_node_circle(important, ctx)
+    draw_node_info(important, ctx)
+
+
+def detail(args) -> Detail:
+    """
+    The level of detail configured by the command line arguments
+    """
+    values = {
+        'max_nodes': getattr(args, 'detail_max_nodes', None),
+        'max_links': getattr(args, 'detail_max_links', None),
+    }
+    return DETAIL._replace(**{key: value for key, value in values.items()
+                              if value is not None})
+
+
+def frame_path(ld: Path, img_idx: int) -> Path:
+    return ld / 'images' / '{:05}.png'.format(img_idx)
+
 
-    draw_nodes(area, ctx)
+def draw_images(args, ld: Path, area, img_idx):
+    resolution = RESOLUTION[getattr(args, 'resolution')]
+    surface = render(snapshot(area, img_idx), resolution, detail(args))
+    surface.write_to_png(str(frame_path(ld, img_idx)))
+
+
+def render_frame(job):
+    """
+    Render a (frame, resolution, detail, directory, raw) job
 
-    surface.write_to_png(str(ld / 'images' / '{:05}.png'.format(img_idx)))
+    Writes the png into the images folder of directory unless it is None and
+    returns the raw ARGB32 pixels if raw is set
+    """
+    frame, resolution, detail, ld, raw = job
+    surface = render(frame, resolution, detail)
+    if ld is not None:
+        surface.write_to_png(str(frame_path(ld, frame.index)))
+    if raw:
+        surface.flush()
+        return bytes(surface.get_data())
+    return None
 
 
 def draw_backgroud_grid(ctx, width, height):
@@ -90,7 +265,7 @@ def draw_backgroud_grid(ctx, width, height):
         x_pos += dist
 
 
-def draw_frame_info(ctx, img_idx):
+def draw_frame_info(ctx, img_idx, legend=()):
     # Add current time in top-left corner
     ctx.set_source_rgba(1., 1., 1., .6)
     ctx.rectangle(10, 10, 40, 20)
@@ -104,190 +279,256 @@ def draw_frame_info(ctx, img_idx):
     ctx.move_to(10, 27)
     ctx.show_text(str(img_idx))
 
-    for i, tos in enumerate(MAP_TOS_TO_COLOR):
+    for i, tos in enumerate(legend):
         ctx.move_to(10, 47 + 20*i)
-        ctx.set_source_rgb(*MAP_TOS_TO_COLOR[tos])
+        ctx.set_source_rgb(*tos_color(tos))
         ctx.show_text(''.join(i[0] for i in tos.split('-')))
 
 
-def draw_nodes(area, ctx):
-    """
-    Draw all elements of the final image
-    """
-    draw_surrounding_rings(area, ctx)
-    draw_paths_between_nodes(area, ctx)
-    draw_node_circle(area, ctx)
-    draw_node_info(area, ctx)
-
-
-def draw_surrounding_rings(area, ctx):
+def draw_surrounding_rings(frame, ctx):
     """
-    Draw the white rings and the red transmission ring around each node
+    Draw the white rings around each node
 
     This is done first so it will be in the background
     """
-    for model in area.models:
+    for node in frame.nodes:
         ctx.set_line_width(0.5)
         ctx.set_source_rgba(1., 1., 1.)
-        ctx.arc(model.x, model.y, 8, 0, 2 * math.pi)
+        ctx.arc(node.x, node.y, 8, 0, 2 * math.pi)
         ctx.stroke()
 
         ctx.set_line_width(0.3)
         ctx.set_source_rgba(1., 1., 1.)
-        ctx.arc(model.x, model.y, 12, 0, 2 * math.pi)
+        ctx.arc(node.x, node.y, 12, 0, 2 * math.pi)
         ctx.stroke()
 
         ctx.set_line_width(0.1)
         ctx.set_source_rgba(1., 1., 1.)
-        ctx.arc(model.x, model.y, 15, 0, 2 * math.pi)
+        ctx.arc(node.x, node.y, 15, 0, 2 * math.pi)
         ctx.stroke()
 
-        if model.router in RouterTransmittedMiddleware.transmitting_routers:
-            ctx.set_line_width(1)
-            ctx.set_source_rgb(1., 0., 0.)
-            ctx.arc(model.x, model.y, 15, 0, 2 * math.pi)
-            ctx.stroke()
+
+def draw_transmissions(frame, ctx):
+    """
+    Draw the red transmission ring around each transmitting node
+    """
+    ctx.set_line_width(1)
+    ctx.set_source_rgb(1., 0., 0.)
+    for node in frame.nodes:
+        if node.transmitting:
+            ctx.new_sub_path()
+            ctx.arc(node.x, node.y, 15, 0, 2 * math.pi)
+    ctx.stroke()
 
 
-def draw_paths_between_nodes(area, ctx):
+def draw_paths_between_nodes(frame, ctx):
     """
     Draw all paths between nodes
 
-    One path for each link, the exact drawing is handeld in draw_connection.
-    Links with a active packet transmission are dashed red.
+    One path for each link, the geometry of all links is computed at once by
+    link_geometry. Links with an active packet transmission get a dashed
+    overlay in the color of each type of service.
     """
-    ctx.set_source_rgb(1., 1., 1.)
+    if not frame.links:
+        return
+    points = link_geometry(frame.links)
+    drawn = ~np.isnan(points[:, 0, 0])
+
+    def add_paths(indices):
+        for polyline in points[indices]:
+            ctx.move_to(*polyline[0])
+            for point in polyline[1:]:
+                ctx.line_to(*point)
+
     ctx.set_line_width(1)
-    for model in area.models:
-        router = model.router
-        connections = {}
-        for interface_name in router.interfaces.keys():
-            for neighbor in router.get_connected_routers(interface_name):
-                connections.setdefault(neighbor, []).append(interface_name)
-
-        for neighbor in connections:
-            if router.id > neighbor.id:
-                continue
-            interfaces = sorted(connections[neighbor])
-
-            for i, interface in enumerate(interfaces):
-                packets = RouterForwardedPacketMiddleware.get_packets(
-                    router, neighbor, interface)
-                packets.extend(RouterForwardedPacketMiddleware.get_packets(
-                    neighbor, router, interface))
-                tos = list(set(packet['tos'] for packet in packets))
-                draw_connection(ctx, model.x, model.y,
-                                neighbor.model.x, neighbor.model.y,
-                                i + 1, len(interfaces),
-                                dashed=tos)
-
-
-rotate_clockwise = np.array(((0, 1), (-1, 0)))
-
-
-def normalize(vector):
-    """
-    Normalize a numpy vector
-    """
-    norm = np.linalg.norm(vector)
-    if norm == 0:
-        return vector
-    return vector / norm
-
-
-def draw_connection(ctx, fromx, fromy, tox, toy, idx, num,
-                    dashed: list = []):
-    """
-    Draw a link between the nodes at from(x/y) and to(x/y).
-
-    The offset to the side is defined by idx and num
-
-    :param ctx: Cairo context
-    :param fromx: x coordinate origin node
-    :param fromy: y coordinate origin node
-    :param tox: x coordinate destination node
-    :param toy: y coordinate destination node
-    :param idx: Index of the link if there are more than one, starts at 1
-    :param num: The total amount of links
-    :param dashed: bool, if true the line will be dashed red
-    """
-
-    # Get vectors from coordinates
-    from_ = np.array((fromx, fromy))
-    to = np.array((tox, toy))
-
-    # Create a new basis where (1, 0) is equal to the connection vector
-    b1 = to - from_
-    b2 = rotate_clockwise.dot(b1)  # perpendicular, linear independent vector
-
-    # Compute the matrices for basis changes
-    basis_to_context = np.transpose(np.array([b1, b2]))
-    basis_to_normalized = np.linalg.inv(basis_to_context)
-
-    # The length of the start and end strips, converted into normalized basis
-    normalized_length = np.linalg.norm(
-        basis_to_normalized.dot(np.array((10, 0))))
-
-    # Offset of the link to the side of the straight line
-    offset = (num - 1) * (-0.5) + (idx - 1) * 1
-    start = np.array((2, offset))
-    end = np.array((2, -offset))
-
-    # Scale the offsets correctly
-    start = normalize(start) * normalized_length * math.sqrt(abs(offset))
-    end = normalize(end) * normalized_length * math.sqrt(abs(offset))
-
-    # Handle short connections
-    diff = 1 - start[0] - end[0]
-    if diff < 0:
-        # The connection is shorter than the start and end strips
-        # We must cap them
-        start /= start[0] - diff / 2
-        end /= end[0] - diff / 2
-        # Also we don't need a line between them as they are directly next to
-        # each other
-        line = (0, 0)
-    else:
+    ctx.set_source_rgb(0.259, 0.647, 0.961)
+    add_paths(np.flatnonzero(drawn))
+    ctx.stroke()
+
+    by_tos = {}
+    for i, link in enumerate(frame.links):
+        if drawn[i]:
+            for tos in link.tos:
+                by_tos.setdefault(tos, []).append(i)
+    for tos, indices in sorted(by_tos.items()):
+        ctx.set_source_rgb(*tos_color(tos))
+        ctx.set_dash([tos_dash(tos)])
+        add_paths(indices)
+        ctx.stroke()
+    ctx.set_dash([])
+
+
+def link_geometry(links) -> np.ndarray:
+    """
+    Compute the polylines of all links at once
+
+    Returns an array of shape (links, 4, 2) with the start, the ends of the
+    start and end strips and the end point of every link. Links between two
+    interfaces are offset to the side of the straight line so all links
+    between two nodes are visible, the offset is defined by the index of the
+    link and the number of links. Links between nodes at the same position
+    are NaN.
+    """
+    x1, y1, x2, y2, idx, num = np.array(
+        [link[:6] for link in links], dtype=float).T
+    from_ = np.stack((x1, y1), axis=1)
+    # The connection vector and a perpendicular vector of the same length,
+    # the basis in which the strips are computed
+    b1 = np.stack((x2 - x1, y2 - y1), axis=1)
+    b2 = np.stack((b1[:, 1], -b1[:, 0]), axis=1)
+    length = np.hypot(b1[:, 0], b1[:, 1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Offset of the link to the side of the straight line
+        offset = (num - 1) * (-0.5) + (idx - 1)
+        # The length of the start and end strips (10) in the basis, scaled
+        # by the offset, along the normalized (2, +-offset) direction
+        scale = 10 / length * np.sqrt(np.abs(offset)) / \
+            np.hypot(2, offset)
+        start = np.stack((2 * scale, offset * scale), axis=1)
+        end = np.stack((2 * scale, -offset * scale), axis=1)
+
         # The line is the remaining bit between the start and end strips
-        line = np.array((diff, 0))
+        diff = 1 - start[:, 0] - end[:, 0]
+        line = np.stack((diff, np.zeros_like(diff)), axis=1)
+
+        # The connection is shorter than the start and end strips, cap them,
+        # there is no line between them as they are directly next to each
+        # other
+        short = diff < 0
+        cap = (start[short, 0] - diff[short] / 2)[:, np.newaxis]
+        start[short] /= cap
+        end[short] /= cap
+        line[short] = 0
+
+    def to_context(vectors):
+        return vectors[:, :1] * b1 + vectors[:, 1:] * b2
+
+    points = np.empty((len(x1), 4, 2))
+    points[:, 0] = from_
+    points[:, 1] = points[:, 0] + to_context(start)
+    points[:, 2] = points[:, 1] + to_context(line)
+    points[:, 3] = points[:, 2] + to_context(end)
+    points[length == 0] = np.nan
+    return points
+
+
+def node_density(nodes, size: float) -> tuple:
+    """
+    Count the nodes in square cells of the given size
+
+    Returns the column and row of every non-empty cell and its number of
+    nodes
+    """
+    if not nodes:
+        return np.empty((0, 2), dtype=int), np.empty(0, dtype=int)
+    positions = np.array([(node.x, node.y) for node in nodes], dtype=float)
+    return np.unique(np.floor(positions / size).astype(int), axis=0,
+                     return_counts=True)
+
+
+def draw_node_density(ctx, cells: np.ndarray, counts: np.ndarray,
+                      size: float):
+    """
+    Fill every cell with an opacity growing logarithmically with its number
+    of nodes, cells of the same opacity are filled at once
+    """
+    if not len(counts):
+        return
+    levels = np.ceil(DENSITY_LEVELS * np.log1p(counts) /
+                     np.log1p(counts.max())).astype(int)
+    for level in np.unique(levels):
+        ctx.set_source_rgba(1., 1., 1., .9 * level / DENSITY_LEVELS)
+        for x, y in cells[levels == level]:
+            ctx.rectangle(x * size, y * size, size, size)
+        ctx.fill()
+
+
+def link_bundles(links, size: float) -> tuple:
+    """
+    Group the links by the cells of their ends
+
+    Returns the centers of the two cells of every bundle as an array of shape
+    (bundles, 2, 2), the number of links and the types of service of the
+    links of every bundle. Links within a single cell are left out, they are
+    covered by the density of the cell.
+    """
+    if not links:
+        return np.empty((0, 2, 2)), np.empty(0, dtype=int), []
+    ends = np.array([link[:4] for link in links],
+                    dtype=float).reshape(-1, 2, 2)
+    cells = np.floor(ends / size).astype(int)
+    # Both directions of a link belong to the same bundle
+    first, second = cells[:, 0], cells[:, 1]
+    swap = (first[:, 0] > second[:, 0]) | (
+        (first[:, 0] == second[:, 0]) & (first[:, 1] > second[:, 1]))
+    cells[swap] = cells[swap, ::-1]
+    between = np.flatnonzero((cells[:, 0] != cells[:, 1]).any(axis=1))
+    if not len(between):
+        return np.empty((0, 2, 2)), np.empty(0, dtype=int), []
+
+    pairs, inverse, counts = np.unique(
+        cells[between].reshape(-1, 4), axis=0, return_inverse=True,
+        return_counts=True)
+    tos = [set() for _ in counts]
+    for bundle, i in zip(inverse.ravel(), between):
+        tos[bundle].update(links[i].tos)
+    return (pairs.reshape(-1, 2, 2) + 0.5) * size, counts, tos
+
+
+def draw_link_bundles(frame, ctx, size: float):
+    """
+    Draw a line between the centers of the cells of every link bundle
+
+    The width of the line grows logarithmically with the number of links,
+    bundles with an active packet transmission get a dashed overlay in the
+    color of each type of service like single links
+    """
+    centers, counts, tos = link_bundles(frame.links, size)
+    if not len(counts):
+        return
+    widths = np.minimum(1 + np.floor(np.log2(counts)), size / 2)
+
+    def add_paths(indices):
+        for (x1, y1), (x2, y2) in centers[indices]:
+            ctx.move_to(x1, y1)
+            ctx.line_to(x2, y2)
 
-    # Draw
     ctx.set_source_rgb(0.259, 0.647, 0.961)
-    ctx.move_to(*from_)
-    ctx.rel_line_to(*basis_to_context.dot(start))
-    ctx.rel_line_to(*basis_to_context.dot(line))
-    ctx.rel_line_to(*basis_to_context.dot(end))
-    ctx.stroke()
+    for width in np.unique(widths):
+        ctx.set_line_width(width)
+        add_paths(np.flatnonzero(widths == width))
+        ctx.stroke()
 
-    for tos in dashed:
-        color = link_colors[hash(tos) % len(link_colors)]
-        MAP_TOS_TO_COLOR[tos] = color
-        ctx.set_source_rgb(*color)
-        ctx.set_dash([hash(tos) % 15 + 1])
-        ctx.move_to(*from_)
-        ctx.rel_line_to(*basis_to_context.dot(start))
-        ctx.rel_line_to(*basis_to_context.dot(line))
-        ctx.rel_line_to(*basis_to_context.dot(end))
+    by_tos = {}
+    for i, bundle_tos in enumerate(tos):
+        for t in bundle_tos:
+            by_tos.setdefault(t, []).append(i)
+    ctx.set_line_width(1)
+    for t, indices in sorted(by_tos.items()):
+        ctx.set_source_rgb(*tos_color(t))
+        ctx.set_dash([tos_dash(t)])
+        add_paths(indices)
         ctx.stroke()
     ctx.set_dash([])
 
 
-def draw_node_circle(area, ctx):
+def draw_node_circle(frame, ctx):
     """
     Draw a circle where the node is
     """
     ctx.set_source_rgb(1., 1., 1.)
-    for model in area.models:
-        ctx.arc(model.x, model.y, 4, 0, 2 * math.pi)
+    for node in frame.nodes:
+        ctx.arc(node.x, node.y, 4, 0, 2 * math.pi)
         ctx.fill()
 
 
-def draw_node_info(area, ctx):
+def draw_node_info(frame, ctx):
     """
     Draw a rectangle and the id of the node
     """
-    for model in area.models:
-        x, y = model.x, model.y
+    for node in frame.nodes:
+        x, y = node.x, node.y
         # The lengths of the line
         xdelta = 10
         ydelta = 10
@@ -302,20 +543,17 @@ def draw_node_info(area, ctx):
 
         # If there is not enough space right or down of the node, move to the
         # left or up
-        if x + xdelta + width > area.width:
+        if x + xdelta + width > frame.width:
             xdelta = -xdelta
             x_rect = -width
-        if y + ydelta + height > area.height:
+        if y + ydelta + height > frame.height:
             ydelta = -ydelta
             y_rect = -height
 
         # Generate text for node, adjust rectangle size
-        text = str(model.router.id)
-        if model.router.is_transmitter:
-            text += " (tx)"
-            width += 15
-        elif model.router.is_receiver:
-            text += " (rx)"
+        text = str(node.id)
+        if node.role is not None:
+            text += " ({})".format(node.role)
             width += 15
 
         ctx.set_source_rgba(1., 1., 1., .8)
@@ -0,0 +1,147 @@
+"""
+Lightweight snapshots of the simulation for rendering frames in other
+processes
+
+The simulation captures a Frame every simulated second, a compact and
+picklable copy of everything drawn: node positions and visibility, the links
+between nodes and the transmissions and forwarded packets recorded by the
+middlewares. The frames are rendered by a FrameRenderer in a process pool
+while the simulation continues.
+"""
+import collections
+import multiprocessing
+
+from .middlewares import RouterForwardedPacketMiddleware, \
+    RouterTransmittedMiddleware
+
+Frame = collections.namedtuple(
+    'Frame', ('index', 'width', 'height', 'nodes', 'links', 'legend'))
+# role is 'tx', 'rx' or None
+Node = collections.namedtuple(
+    'Node', ('x', 'y', 'id', 'role', 'visible', 'transmitting'))
+# A link between two nodes, idx is the index of the interface (starting at 1)
+# of num interfaces connecting them, tos the types of service of the packets
+# forwarded over it
+Link = collections.namedtuple(
+    'Link', ('x1', 'y1', 'x2', 'y2', 'idx', 'num', 'tos'))
+
+# Marks a repeated frame in the FrameRenderer backlog
+_REPEAT = object()
+
+
+def snapshot(area, img_idx: int, legend: list = None) -> Frame:
+    """
+    Capture the state of the area needed to draw frame `img_idx`
+
+    :param legend: All types of service seen so far in order of appearance,
+        shown as legend, new ones are appended. Defaults to the types of
+        service of this frame only.
+    """
+    if legend is None:
+        legend = []
+    nodes = []
+    for model in area.models:
+        router = model.router
+        role = None
+        if router.is_transmitter:
+            role = 'tx'
+        elif router.is_receiver:
+            role = 'rx'
+        nodes.append(Node(
+            model.x, model.y, router.id, role, model.visible,
+            router in RouterTransmittedMiddleware.transmitting_routers))
+
+    links = []
+    for model, neighbor_model, distance in area.get_pairs():
+        router, neighbor = model.router, neighbor_model.router
+        # The interfaces of the router with the lower id connect the pair,
+        # as seen from its side
+        interfaces = sorted(name for name, interface in
+                            router.interfaces.items()
+                            if distance <= interface['range'])
+        for i, interface in enumerate(interfaces):
+            packets = RouterForwardedPacketMiddleware.get_packets(
+                router, neighbor, interface)
+            packets = packets + \
+                RouterForwardedPacketMiddleware.get_packets(
+                    neighbor, router, interface)
+            tos = tuple(sorted(set(packet['tos'] for packet in packets)))
+            legend.extend(t for t in tos if t not in legend)
+            links.append(Link(model.x, model.y, neighbor_model.x,
+                              neighbor_model.y, i + 1, len(interfaces), tos))
+
+    return Frame(img_idx, area.width, area.height, tuple(nodes),
+                 tuple(links), tuple(legend))
+
+
+class FrameRenderer(object):
+    """
+    Apply `func` to the submitted jobs in a process pool while the simulation
+    continues
+
+    At most `backlog` jobs are queued, submit blocks until the oldest job is
+    done if the renderer falls behind. The results are passed to `on_frame`
+    in the order the jobs were submitted. Inside daemonic processes (e.g.
+    pool workers of a sweep), which must not start a pool, jobs are run
+    synchronously.
+    """
+
+    def __init__(self, func, processes: int = None, backlog: int = None,
+                 on_frame=None):
+        self.func = func
+        self.on_frame = on_frame
+        self.pending = collections.deque()
+        self._last = None
+        processes = processes or multiprocessing.cpu_count()
+        self.backlog = backlog or 2 * processes
+        if multiprocessing.current_process().daemon:
+            self.pool = None
+        else:
+            self.pool = multiprocessing.Pool(processes)
+
+    def _finish(self, result):
+        self._last = result
+        if self.on_frame is not None:
+            self.on_frame(result)
+
+    def _finish_oldest(self):
+        pending = self.pending.popleft()
+        if pending is not _REPEAT:
+            self._last = pending.get()
+        self._finish(self._last)
+
+    def repeat(self):
+        """
+        Pass the result of the last submitted job on again without running
+        it, e.g. for an unchanged frame
+        """
+        if self.pool is None:
+            self._finish(self._last)
+            return
+
+        while len(self.pending) >= self.backlog:
+            self._finish_oldest()
+        self.pending.append(_REPEAT)
+
+    def submit(self, job):
+        if self.pool is None:
+            self._finish(self.func(job))
+            return
+
+        while len(self.pending) >= self.backlog:
+            self._finish_oldest()
+        self.pending.append(self.pool.apply_async(self.func, (job,)))
+
+    def close(self):
+        """
+        Wait for all submitted jobs
+        """
+        if self.pool is None:
+            return
+        try:
+            while self.pending:
+                self._finish_oldest()
+            self.pool.close()
+            self.pool.join()
+        finally:
+            self.pool.terminate()
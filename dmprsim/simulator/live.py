@@ -0,0 +1,242 @@
+"""
+Stream the state of a running simulation to web browsers
+
+The LiveServer serves a static canvas viewer and a server-sent events stream
+on a local HTTP port. Every simulated second the state of the network, the
+position and role of every router, the links between them, the packets
+forwarded over them and a summary of the routing tables, is compared to the
+state of the previous second and only the differences are sent.
+
+The simulation never waits for a viewer: every client has a small queue of
+pending events, if a slow client falls behind its queue is emptied and it
+gets the complete state instead of the next delta.
+"""
+import json
+import logging
+import queue
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+from .middlewares import RouterForwardedPacketMiddleware, \
+    RouterTransmittedMiddleware
+
+VIEWER = Path(__file__).parent / 'viewer.html'
+# Pending events per client before frames are dropped
+CLIENT_BACKLOG = 8
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE = 15
+
+logger = logging.getLogger(__name__)
+
+
+def live_state(area) -> dict:
+    """
+    Capture the state of all routers in the area
+
+    Returns the routers by id as [x, y, role, visible, transmitting,
+    routes], routes is the number of routing table entries per tos, and the
+    links as [id, neighbor id, interface, types of service] by
+    'id neighbor-id interface'
+    """
+    nodes = {}
+    links = {}
+    for model in area.models:
+        router = model.router
+        role = None
+        if router.is_transmitter:
+            role = 'tx'
+        elif router.is_receiver:
+            role = 'rx'
+        routes = {tos: len(entries)
+                  for tos, entries in sorted(router.routing_table.items())}
+        nodes[str(router.id)] = [
+            model.x, model.y, role, model.visible,
+            router in RouterTransmittedMiddleware.transmitting_routers,
+            routes]
+
+        for interface in sorted(router.interfaces):
+            for neighbor in router.get_connected_routers(interface):
+                if router.id > neighbor.id:
+                    continue
+                packets = RouterForwardedPacketMiddleware.get_packets(
+                    router, neighbor, interface) + \
+                    RouterForwardedPacketMiddleware.get_packets(
+                        neighbor, router, interface)
+                tos = sorted(set(packet['tos'] for packet in packets))
+                key = '{} {} {}'.format(router.id, neighbor.id, interface)
+                links[key] = [str(router.id), str(neighbor.id), interface,
+                              tos]
+    return {'nodes': nodes, 'links': links}
+
+
+def delta(previous: dict, current: dict) -> dict:
+    """
+    The changes from previous to current state, all entries of a kind which
+    changed or appeared and the keys of the removed ones
+    """
+    changes = {}
+    for kind in ('nodes', 'links'):
+        old, new = previous[kind], current[kind]
+        changed = {key: value for key, value in new.items()
+                   if old.get(key) != value}
+        removed = sorted(key for key in old if key not in new)
+        if changed:
+            changes[kind] = changed
+        if removed:
+            changes[kind + '-removed'] = removed
+    return changes
+
+
+class _Client(object):
+    def __init__(self):
+        self.events = queue.Queue(CLIENT_BACKLOG)
+        # A new or lagging client needs the complete state
+        self.needs_state = True
+        self.dropped = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_GET(self):
+        if self.path == '/':
+            self._viewer()
+        elif self.path == '/events':
+            self._events()
+        else:
+            self.send_error(404)
+
+    def _viewer(self):
+        content = VIEWER.read_bytes()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        client = self.server.live.connect()
+        try:
+            while True:
+                try:
+                    event = client.events.get(timeout=KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b': keep-alive\n\n')
+                else:
+                    if event is None:
+                        return
+                    self.wfile.write(b'data: ' + event + b'\n\n')
+                self.wfile.flush()
+        except OSError:
+            # The viewer was closed
+            pass
+        finally:
+            self.server.live.disconnect(client)
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LiveServer(object):
+    """
+    Serve the viewer on http://host:port/ while the simulation runs, call
+    publish every simulated second and close at the end
+    """
+
+    def __init__(self, port: int, host: str = '127.0.0.1'):
+        self.clients = []
+        self.lock = threading.Lock()
+        self._previous = None
+        self.server = _Server((host, port), _Handler)
+        self.server.live = self
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        logger.info("Live viewer at http://{}:{}/".format(
+            host, self.server.server_address[1]))
+
+    def connect(self) -> _Client:
+        client = _Client()
+        with self.lock:
+            self.clients.append(client)
+        return client
+
+    def disconnect(self, client: _Client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    @staticmethod
+    def _encode(event: dict) -> bytes:
+        return json.dumps(event, separators=(',', ':')).encode('utf-8')
+
+    def publish(self, sec: int, area):
+        """
+        Send the changes since the last second to all clients, never blocks
+        """
+        with self.lock:
+            clients = list(self.clients)
+        if not clients:
+            # New clients start with the complete state anyway
+            self._previous = None
+            return
+
+        state = live_state(area)
+        encoded = {}
+
+        def event(kind):
+            if kind not in encoded:
+                if kind == 'state':
+                    values = dict(state, width=area.width,
+                                  height=area.height)
+                else:
+                    values = delta(self._previous, state)
+                encoded[kind] = self._encode(dict(values, time=sec,
+                                                  type=kind))
+            return encoded[kind]
+
+        for client in clients:
+            if self._previous is None or client.needs_state:
+                client.needs_state = False
+                self._put(client, event('state'))
+            else:
+                self._put(client, event('delta'))
+        self._previous = state
+
+    @staticmethod
+    def _drain(client: _Client):
+        while True:
+            try:
+                client.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put(self, client: _Client, event: bytes):
+        try:
+            client.events.put_nowait(event)
+        except queue.Full:
+            # Drop the pending deltas, the client continues with the
+            # complete state of the next second
+            client.dropped += 1
+            self._drain(client)
+            client.needs_state = True
+
+    def close(self):
+        """
+        End the event streams and stop the server
+        """
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            self._drain(client)
+            client.events.put(None)
+        self.server.shutdown()
+        self.server.server_close()
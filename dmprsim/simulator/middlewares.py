@@ -1,5 +1,7 @@
 import random
 
+from .rng import derive_rng
+
 
 class MiddlewareController(object):
     """
@@ -17,6 +19,15 @@ class MiddlewareController(object):
         if middleware not in cls.activated_middleware:
             cls.activated_middleware.append(middleware)
 
+    @classmethod
+    def seed(cls, seed):
+        """
+        Derive new random streams for all activated middleware from the run
+        seed
+        """
+        for middleware in cls.activated_middleware:
+            middleware.seed(seed)
+
     @classmethod
     def forward_routing_msg(cls, msg: dict, **kwargs) -> dict:
         for middleware in cls.activated_middleware:
@@ -35,7 +46,27 @@ class AbstractMiddleware(object):
     A Middleware can be registered in the MiddlewareController and helps
     performing all tasks on a transmitted message or packet between a router and
     a destination
+
+    Middleware which needs randomness should draw from `self.rng(origin)`, a
+    separate stream per middleware and origin router which does not depend on
+    the order in which the routers transmit
     """
+    _seed = None
+    _streams = None
+
+    def seed(self, seed):
+        self._seed = seed
+        self._streams = {}
+
+    def rng(self, router):
+        if self._streams is None:
+            return random
+        try:
+            return self._streams[router.id]
+        except KeyError:
+            stream = self._streams[router.id] = derive_rng(
+                self._seed, type(self).__name__, router.id)
+            return stream
 
     def forward_routing_msg(self, origin, destination,
                             interface_name: str, msg: dict) -> dict:
@@ -76,8 +107,8 @@ class RoutingMsgLossMiddleware(AbstractMiddleware):
 
     def forward_routing_msg(self, origin, destination,
                             interface_name: str, msg: dict) -> dict:
-        if origin.interfaces[interface_name].get('rx-loss',
-                                                 0) > random.random():
+        loss = origin.interfaces[interface_name].get('rx-loss', 0)
+        if loss > self.rng(origin).random():
             return None
         return msg
 
@@ -135,7 +166,7 @@ class AsymmetricMiddleware(AbstractMiddleware):
     def forward_routing_msg(self, origin, destination, interface_name: str,
                             msg: dict) -> dict:
         probability = self.asymmetric_connections.get((origin, destination), 0)
-        if probability > random.random():
+        if probability > self.rng(origin).random():
             return None
         return msg
 
@@ -12,19 +12,24 @@ class TimeWrapper(object):
 
 
 def patch_log_record_factory():
+    """
+    Let log records carry the simulated time, called when a simulation
+    starts instead of on import so importing the simulator has no side
+    effects
+    """
     default_record_factory = logging.getLogRecordFactory()
+    if getattr(default_record_factory, 'simulated_time', False):
+        return
 
     def patch_time_factory(*args, **kwargs):
         record = default_record_factory(*args, **kwargs)
         record.created = TimeWrapper.time
         return record
 
+    patch_time_factory.simulated_time = True
     logging.setLogRecordFactory(patch_time_factory)
 
 
-patch_log_record_factory()
-
-
 class MobilityArea(object):
     """
     Defines an area where all nodes live and move on, can be subclassed
@@ -34,27 +39,59 @@ class MobilityArea(object):
         self.width = width
         self.height = height
         self.models = set()
+        # Neighbors by model and range, valid until a model moves or changes
+        # its visibility
+        self._neighbors = {}
 
     def start(self):
+        patch_log_record_factory()
         for model in self.models:
             model.start()
 
     def step(self, time):
         TimeWrapper.time = time
-        self._get_distance.cache_clear()
+        self.positions_changed()
         for model in self.models:
             model.step()
 
     def get_neighbors(self, model, interface: dict) -> set:
-        result = set()
+        """
+        Return the routers in range of the interface, the result is shared by
+        all callers during a step and must not be modified
+        """
         range_ = interface['range']
+        try:
+            return self._neighbors[(model, range_)]
+        except KeyError:
+            pass
+        result = set()
         for candidate in self.models:
             if candidate == model or not candidate.visible:
                 continue
             if self._get_distance(frozenset((candidate, model))) <= range_:
                 result.add(candidate.router)
+        self._neighbors[(model, range_)] = result
         return result
 
+    def get_pairs(self):
+        """
+        Yield every pair of visible models once with their distance, the
+        model of the router with the lower id first
+        """
+        visible = sorted((model for model in self.models if model.visible),
+                         key=lambda model: model.router.id)
+        for i, model1 in enumerate(visible):
+            for model2 in visible[i + 1:]:
+                yield model1, model2, self._get_distance(
+                    frozenset((model1, model2)))
+
+    def neighbors_changed(self):
+        self._neighbors.clear()
+
+    def positions_changed(self):
+        self._get_distance.cache_clear()
+        self._neighbors.clear()
+
     @staticmethod
     @functools.lru_cache(maxsize=None)
     def _get_distance(models: frozenset) -> float:
@@ -68,17 +105,19 @@ class MobilityModel(object):
     methods.
     """
     def __init__(self, area: MobilityArea, coords: tuple = None,
-                 disappearance_pattern: tuple = (0, 0, 0)):
+                 disappearance_pattern: tuple = (0, 0, 0), rng=None):
         self.area = area
         area.models.add(self)
+        # The random stream of this model, see dmprsim.simulator.rng
+        self.rng = random if rng is None else rng
         if coords is None:
-            self.x = random.randint(0, area.width)
-            self.y = random.randint(0, area.height)
+            self.x = self.rng.randint(0, area.width)
+            self.y = self.rng.randint(0, area.height)
         else:
             self.x, self.y = coords
 
         self.disappearance_pattern = disappearance_pattern
-        if random.random() < disappearance_pattern[0]:
+        if self.rng.random() < disappearance_pattern[0]:
             self.disappear = True
         else:
             self.disappear = False
@@ -86,6 +125,16 @@ class MobilityModel(object):
         self.visible = True
         self.router = None
 
+    @property
+    def visible(self) -> bool:
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible: bool):
+        if visible != getattr(self, '_visible', None):
+            self._visible = visible
+            self.area.neighbors_changed()
+
     def start(self):
         self.router.start()
 
@@ -94,9 +143,9 @@ class MobilityModel(object):
         self.router.step()
 
     def toggle_visibility(self):
-        # call random.random() exactly once for every step so we stay
+        # call random() exactly once for every step so we stay
         # reproducible
-        r = random.random()
+        r = self.rng.random()
         if self.disappear:
             if self.visible:
                 self.visible = r > self.disappearance_pattern[1]
@@ -112,17 +161,55 @@ class MobilityModel(object):
         return self.x, self.y
 
 
+class VelocityGenerator(object):
+    """
+    Base class for picklable velocity generators, called with the random
+    stream of the model
+    """
+    def __call__(self, rng=random) -> float:
+        raise NotImplementedError
+
+
+class ConstantVelocity(VelocityGenerator):
+    """
+    A velocity generator which always returns the same velocity
+    """
+    def __init__(self, velocity: float = 0):
+        self.velocity = velocity
+
+    def __call__(self, rng=random) -> float:
+        return self.velocity
+
+
+class RandomVelocity(VelocityGenerator):
+    """
+    A velocity generator returning random() ** exponent * scale, a high
+    exponent results in mostly slow and few fast routers
+    """
+    def __init__(self, scale: float = 1, exponent: float = 1):
+        self.scale = scale
+        self.exponent = exponent
+
+    def __call__(self, rng=random) -> float:
+        return rng.random() ** self.exponent * self.scale
+
+
 class MovingMobilityModel(MobilityModel):
     """
     A moving model
     """
     def __init__(self, area: MobilityArea, coords: tuple = None,
-                 disappearance_pattern: tuple = (0, 0, 0), velocity=lambda: 0):
+                 disappearance_pattern: tuple = (0, 0, 0),
+                 velocity=ConstantVelocity(0), rng=None):
         super(MovingMobilityModel, self).__init__(
             area=area, coords=coords,
-            disappearance_pattern=disappearance_pattern
+            disappearance_pattern=disappearance_pattern, rng=rng
         )
-        self.velocity = (velocity(), velocity())
+        # Plain callables (e.g. lambdas) draw from the global random module
+        if isinstance(velocity, VelocityGenerator):
+            self.velocity = (velocity(self.rng), velocity(self.rng))
+        else:
+            self.velocity = (velocity(), velocity())
 
     def step(self):
         v_x, v_y = self.velocity
@@ -135,5 +222,7 @@ class MovingMobilityModel(MobilityModel):
             v_y = -v_y
 
         self.velocity = v_x, v_y
+        if v_x or v_y:
+            self.area.positions_changed()
 
         super(MovingMobilityModel, self).step()
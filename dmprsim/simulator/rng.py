@@ -0,0 +1,23 @@
+"""
+Independent random number streams for the simulation components
+
+Every component (model, router, middleware) draws from its own stream which
+is derived from the run seed and the name of the component. The draws of a
+component therefore only depend on the seed and its own number of draws, not
+on the iteration order or the draws of any other component.
+
+Components without a stream fall back to the global `random` module, which
+provides the same interface as `random.Random`.
+"""
+import hashlib
+import random
+
+
+def derive_rng(seed, *names) -> random.Random:
+    """
+    Return a random stream for the component identified by `names`, e.g.
+    derive_rng(seed, 'model', 3)
+    """
+    key = repr((seed,) + tuple(str(name) for name in names))
+    digest = hashlib.sha256(key.encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:16], 'big'))
@@ -63,6 +63,19 @@ class Tracer(NoOpTracer):
             path = self.directory / tracepoint
             self.enabled[tracepoint] = path.open('w')
 
+    def relocate(self, directory: pathlib.Path):
+        """
+        Trace into another directory, only possible before any tracepoint
+        is enabled
+        """
+        assert not self.enabled
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+
+    def flush(self):
+        for file in self.enabled.values():
+            file.flush()
+
     def get_files(self, tracepoint: str) -> list:
         result = []
         for i in self.enabled:
@@ -70,14 +83,20 @@ class Tracer(NoOpTracer):
                 result.append(self.enabled[i])
         return result
 
-    def log(self, tracepoint, msg, time):
-        files = self.get_files(tracepoint)
+    @staticmethod
+    def serialize(msg) -> str:
+        return json.dumps(msg, sort_keys=True, cls=JSONPathEncoder,
+                          separators=(',', ':'))
 
+    def write(self, files: list, json_msg: str, time):
         for file in files:
-            json_msg = json.dumps(msg, sort_keys=True, cls=JSONPathEncoder,
-                                  separators=(',', ':'))
             file.write('{} {}\n'.format(time, json_msg))
 
+    def log(self, tracepoint, msg, time):
+        files = self.get_files(tracepoint)
+        if files:
+            self.write(files, self.serialize(msg), time)
+
 
 class RouterDB(object):
     """
@@ -116,8 +135,10 @@ class RouterDB(object):
 class Router(object):
     def __init__(self, id_, model, log_directory: pathlib.Path,
                  interfaces: list = DEFAULT_INTERFACES, config_override={},
-                 policies=None, tracer_cls=None):
+                 policies=None, tracer_cls=None, rng=None):
         self.id = id_
+        # The random stream of this router, see dmprsim.simulator.rng
+        self.rng = random if rng is None else rng
         self.log_directory = log_directory
         self.config_override = config_override
 
@@ -138,11 +159,14 @@ class Router(object):
             )
 
         self.routing_table = {}
+        self.routing_table_changes = 0
         self.is_receiver = False
         self.is_transmitter = False
 
         self.networks, self.interfaces, config = self._get_configuration(
             interfaces)
+        # Saved again when the router is relocated
+        self.config = copy.deepcopy(config)
         self._save_configuration(config)
 
         self.core = DMPR(tracer=self.tracer)
@@ -172,8 +196,8 @@ class Router(object):
             router_interface = copy.deepcopy(interface)
 
             addr = {
-                'addr-v4': self._rand_ip_addr(version=4),
-                'addr-v6': self._rand_ip_addr(version=6),
+                'addr-v4': self._rand_ip_addr(version=4, rng=self.rng),
+                'addr-v6': self._rand_ip_addr(version=6, rng=self.rng),
             }
             core_interface.update(addr)
             router_interface.update(addr)
@@ -182,7 +206,7 @@ class Router(object):
             router_interfaces[interface['name']] = router_interface
 
         for version in (4, 6):
-            prefix, prefix_len = self._rand_ip_prefix(version)
+            prefix, prefix_len = self._rand_ip_prefix(version, rng=self.rng)
             networks.add(prefix)
             entry = {
                 "proto": "v{}".format(version),
@@ -201,6 +225,14 @@ class Router(object):
             file.write(json.dumps(config, sort_keys=True,
                                   indent=4, separators=(',', ': ')))
 
+    def relocate(self, log_directory: pathlib.Path):
+        """
+        Log into another directory, only possible before the router started
+        """
+        self.log_directory = log_directory
+        self.tracer.relocate(log_directory / 'trace')
+        self._save_configuration(self.config)
+
     # Runtime methods
 
     def step(self):
@@ -218,6 +250,8 @@ class Router(object):
 
     def routing_table_update_cb(self, routing_table):
         self.log.debug("New Routing Table")
+        if routing_table != self.routing_table:
+            self.routing_table_changes += 1
         self.routing_table = routing_table
 
     def msg_tx_cb(self, interface_name: str, proto: str, dst_mcast_addr: str,
@@ -331,20 +365,20 @@ class Router(object):
     # Helpers
 
     def get_random_network(self):
-        return random.choice(tuple(self.networks))
+        return self.rng.choice(tuple(sorted(self.networks)))
 
     @classmethod
-    def _rand_ip_prefix(cls, version):
+    def _rand_ip_prefix(cls, version, rng=random):
         """Return a random IPv<version> /24 or /72 network."""
-        addr = cls._rand_ip_addr(version)
+        addr = cls._rand_ip_addr(version, rng)
         prefix_len = (version - 3) * 24
         network = ipaddress.ip_network('{}/{}'.format(addr, prefix_len),
                                        strict=False)
         return str(network.network_address), prefix_len
 
     @classmethod
-    def _rand_ip_addr(cls, version: int):
+    def _rand_ip_addr(cls, version: int, rng=random):
         """Return a random IPv<version> address"""
         assert version in (4, 6)
         return str(ipaddress.ip_address(
-            random.randint((version - 4) ** 32, 2 ** (32 * (version - 3)) - 1)))
+            rng.randint((version - 4) ** 32, 2 ** (32 * (version - 3)) - 1)))
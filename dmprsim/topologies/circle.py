@@ -77,7 +77,8 @@ class CircleTopology(GenericTopology):
             alpha = i * step
             x = radius * math.cos(alpha) + center
             y = radius * math.sin(alpha) + center
-            self.models.append(MovingMobilityModel(self.area, coords=(x, y)))
+            self.models.append(MovingMobilityModel(
+                self.area, coords=(x, y), rng=self._prep_rng('model', i)))
 
         self._generate_routers(self.models)
 
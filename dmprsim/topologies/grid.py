@@ -89,8 +89,9 @@ class GridTopology(GenericTopology):
                 x * distance + padding,
                 y * distance + padding
             )
-            self.models.append(
-                MovingMobilityModel(self.area, coords=coordinates))
+            self.models.append(MovingMobilityModel(
+                self.area, coords=coordinates,
+                rng=self._prep_rng('model', len(self.models))))
 
         self._generate_routers(self.models)
 
@@ -1,7 +1,8 @@
 import random
 from pathlib import Path
 
-from dmprsim.simulator import MobilityArea, MovingMobilityModel
+from dmprsim.simulator import MobilityArea, MovingMobilityModel, \
+    ConstantVelocity
 from dmprsim.topologies.utils import GenericTopology
 
 
@@ -39,7 +40,7 @@ class RandomTopology(GenericTopology):
                  area: tuple = DEFAULT_AREA,
                  interfaces: list = DEFAULT_INTERFACES,
                  random_seed_prep: int = DEFAULT_RAND_SEED,
-                 velocity=lambda: 0,
+                 velocity=ConstantVelocity(0),
                  disappearance_pattern: tuple = (0, 0, 0),
                  ):
         super(RandomTopology, self).__init__(
@@ -67,8 +68,9 @@ class RandomTopology(GenericTopology):
 
         self.models = [MovingMobilityModel(self.area,
                                            velocity=self.velocity,
-                                           disappearance_pattern=self.disappearance_pattern)
-                       for _ in range(self.num_routers)]
+                                           disappearance_pattern=self.disappearance_pattern,
+                                           rng=self._prep_rng('model', i))
+                       for i in range(self.num_routers)]
 
         self._generate_routers(self.models)
 
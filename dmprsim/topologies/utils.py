@@ -1,3 +1,4 @@
+import functools
 import os
 import sys
 import logging
@@ -5,18 +6,42 @@ import random
 import subprocess
 from pathlib import Path
 
-try:
-    from dmprsim.simulator import draw
-    from PIL import Image, ImageDraw, ImageFont, ImageFilter
-except ImportError:
-    draw = None
 from dmprsim.simulator import Router
+from dmprsim.simulator.rng import derive_rng
 
 from dmprsim.simulator.middlewares import MiddlewareController, RouterTransmittedMiddleware, RouterForwardedPacketMiddleware
 
+# Frames (simulated seconds) per second of the generated videos
+FRAMERATE = 10
+# Length of the intro and outro in frames and the smallest blur radius
+# applied to a downscaled copy of the frame
+TITLE_FRAMES = 30
+BLUR_MIN_RADIUS = 4
+# Fonts of the title, tried in order
+TITLE_FONTS = (
+    'DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+)
+
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache()
+def load_draw():
+    """
+    Import the drawing module (numpy, cairo and PIL) on first use, returns
+    None if a dependency is missing
+    """
+    try:
+        from dmprsim.simulator import draw
+        import PIL.Image
+    except ImportError:
+        return None
+    return draw
+
+
 class GenericTopology:
     def __init__(self,
                  simulation_time: int = 100,
@@ -30,6 +55,8 @@ class GenericTopology:
                  args: object = object(),
                  ):
         self.random_seed_runtime = random_seed_runtime
+        # Overridden by topologies which generate random networks
+        self.random_seed_prep = 1
         self.simulation_time = simulation_time
         self.scenario_dir = scenario_dir
         self.results_dir = results_dir
@@ -43,14 +70,24 @@ class GenericTopology:
         self.quiet = getattr(args, 'quiet', False)
         self.gen_images = getattr(args, 'enable_images', False)
         self.gen_movie = getattr(args, 'enable_video', False)
-        if self.gen_movie and not self.gen_images:
-            self.gen_images = True
-
-        if draw is None:
+        # The frames of the video are piped directly into ffmpeg, set to
+        # False to generate it from the png images with ffmpeg() instead
+        self.stream_video = self.gen_movie
+        # Only render frames whose content changed, unchanged seconds extend
+        # the previous frame
+        self.dedup_frames = getattr(args, 'dedup_frames', False)
+        # Port of the live viewer or None
+        self.live = getattr(args, 'live', None)
+        # Text shown over a blurred intro and outro of the streamed video
+        self.title = None
+
+        # Only images need the heavy drawing dependencies
+        if (self.gen_images or self.gen_movie) and load_draw() is None:
             logger.warning("Could not import pil and cairo, skipping image and "
                            "video generation")
             self.gen_movie = False
             self.gen_images = False
+            self.stream_video = False
 
         if scenario_dir is None:
             self.scenario_dir = Path.cwd() / 'run-data' / self.name
@@ -65,10 +102,29 @@ class GenericTopology:
         self.area = None
         self.models = []
         self.interfaces = []
+        # Number of sent and delivered packets per tos
+        self.forwarding_stats = {}
+        # Number of changed routing tables per simulated second
+        self.churn = []
+        # The FrameRenderer and VideoSink while the simulation is running
+        self._renderer = None
+        self._video = None
+        # The content of the last rendered frame
+        self._frame_state = None
+        # All types of service seen in this run in order of appearance
+        self._legend = []
+        # The LiveServer while the simulation is running
+        self._live = None
+        # The last frame written to the video, the outro starts with it
+        self._last_raw = None
 
     def prepare(self):
-        if self.gen_images and draw:
-            draw.setup_img_folder(self.scenario_dir)
+        if self.gen_movie and not self.stream_video:
+            # ffmpeg() needs the images
+            self.gen_images = True
+        if self.gen_images:
+            load_draw().setup_img_folder(self.scenario_dir)
+        if self.gen_images or self.gen_movie or self.live is not None:
             MiddlewareController.activate(RouterForwardedPacketMiddleware())
             MiddlewareController.activate(RouterTransmittedMiddleware())
 
@@ -79,25 +135,145 @@ class GenericTopology:
 
         self.area.start()
 
+        # The core still uses the global random module
         random.seed(self.random_seed_runtime)
-
+        seed = self.random_seed_runtime
+        for model in self.models:
+            model.rng = derive_rng(seed, 'model', model.router.id)
+            model.router.rng = derive_rng(seed, 'router', model.router.id)
+        MiddlewareController.seed(self.random_seed_runtime)
+
+        self._renderer = self._start_renderer()
+        if self.live is not None:
+            from dmprsim.simulator.live import LiveServer
+            try:
+                self._live = LiveServer(self.live)
+            except OSError as e:
+                # E.g. the port is taken by a parallel replication
+                logger.warning(
+                    "Cannot serve the live viewer on port {}, continuing "
+                    "without it: {}".format(self.live, e))
+        try:
+            yield from self._simulate()
+        finally:
+            if self._renderer is not None:
+                self._stop_renderer()
+            if self._live is not None:
+                self._live.close()
+                self._live = None
+
+    def _simulate(self):
+        changes = 0
         for sec in range(self.simulation_time):
             if not self.quiet:
                 logger.info("{}\n\ttime: {}/{}".format("=" * 50, sec,
                                                        self.simulation_time))
             self.area.step(sec)
 
+            total = sum(model.router.routing_table_changes
+                        for model in self.models)
+            self.churn.append(total - changes)
+            changes = total
+
             self._forward_packet('lowest-loss')
             self._forward_packet('highest-bandwidth')
 
             self._draw(sec)
+            if self._live is not None:
+                self._live.publish(sec, self.area)
             yield sec
             RouterTransmittedMiddleware.reset()
             RouterForwardedPacketMiddleware.reset()
 
+    def _start_renderer(self):
+        """
+        Render the frames in other processes while the simulation continues
+        """
+        self._video = None
+        self._frame_state = None
+        self._legend = []
+        self._last_raw = None
+        if not (self.gen_images or self.stream_video):
+            return None
+        if self.stream_video:
+            results_dir = self.results_dir or self.scenario_dir
+            try:
+                results_dir.mkdir(parents=True)
+            except FileExistsError:
+                pass
+            try:
+                self._video = VideoSink(results_dir / 'dmpr.mp4',
+                                        self._resolution())
+            except FileNotFoundError:
+                logger.error("ffmpeg not found, skipping video generation")
+        if not self.gen_images and self._video is None:
+            return None
+        return load_draw().FrameRenderer(
+            load_draw().render_frame,
+            processes=getattr(self.args, 'render_processes', None),
+            on_frame=self._write_frame if self._video else None)
+
+    def _write_frame(self, raw: bytes):
+        if self._last_raw is None and self.title is not None:
+            for frame in title_frames(raw, self._resolution(), self.title):
+                self._video.write(frame)
+        self._last_raw = raw
+        self._video.write(raw)
+
+    def _stop_renderer(self):
+        self._renderer.close()
+        self._renderer = None
+        if self._video is not None:
+            if self.title is not None and self._last_raw is not None:
+                for frame in title_frames(self._last_raw, self._resolution(),
+                                          self.title, reverse=True):
+                    self._video.write(frame)
+            if self._video.close():
+                logger.info("Generated movie at {}".format(self._video.dest))
+            else:
+                logger.error("Generating the movie failed, please take a "
+                             "look at the ffmpeg output")
+            self._video = None
+
+    def _resolution(self) -> tuple:
+        return load_draw().RESOLUTION[getattr(self.args, 'resolution', 'hd')]
+
+    def relocate(self, scenario_dir: Path, results_dir: Path = None):
+        """
+        Move the output of a prepared but not yet started topology to another
+        directory, allows to run one prepared topology multiple times
+        """
+        self.scenario_dir = scenario_dir
+        self.results_dir = results_dir
+        for model in self.models:
+            router = model.router
+            router.relocate(scenario_dir / 'routers' / str(router.id))
+        if self.gen_images:
+            load_draw().setup_img_folder(self.scenario_dir)
+
+    def convergence_time(self, window: int = 60):
+        """
+        Return the second after the last routing table change if no routing
+        table changed for at least `window` seconds until the end of the
+        simulation, None otherwise
+        """
+        changed = [sec for sec, changes in enumerate(self.churn) if changes]
+        if not changed:
+            return None
+        converged = changed[-1] + 1
+        if len(self.churn) - converged < window:
+            return None
+        return converged
+
+    def _prep_rng(self, *names):
+        """
+        Return the random stream for preparing the component `names`
+        """
+        return derive_rng(self.random_seed_prep, *names)
+
     def _set_random_tx_rx_routers(self):
         if self.simulate_forwarding:
-            tx_model, rx_model = random.sample(self.models, 2)
+            tx_model, rx_model = self._prep_rng('tx-rx').sample(self.models, 2)
             self.tx_router = tx_model.router
             self.tx_router.is_transmitter = True
             rx_model.router.is_receiver = True
@@ -105,30 +281,48 @@ class GenericTopology:
 
     def _forward_packet(self, tos):
         if self.simulate_forwarding:
-            self.tx_router.send_packet(self.rx_ip, tos)
+            delivered = self.tx_router.send_packet(self.rx_ip, tos)
+            stats = self.forwarding_stats.setdefault(
+                tos, {'sent': 0, 'delivered': 0})
+            stats['sent'] += 1
+            stats['delivered'] += bool(delivered)
 
     def _draw(self, sec):
-        if self.gen_images and draw:
-            draw.draw_images(self.args, self.scenario_dir, self.area, sec)
+        if self._renderer is None:
+            return
+        frame = load_draw().snapshot(self.area, sec, self._legend)
+        # Everything but the index (i.e. the time label) of the frame
+        state = frame[1:]
+        if self.dedup_frames and state == self._frame_state:
+            self._renderer.repeat()
+            return
+        self._frame_state = state
+        self._renderer.submit((
+            frame, self._resolution(), load_draw().detail(self.args),
+            self.scenario_dir if self.gen_images else None,
+            self._video is not None))
 
     def _generate_routers(self, models):
         generate_routers(interfaces=self.interfaces,
                          log_directory=self.scenario_dir,
                          config_override=self.config_override,
                          mobility_models=models,
-                         router_args=self.router_args)
+                         router_args=self.router_args,
+                         seed=self.random_seed_prep)
 
 
 def generate_routers(interfaces: list, mobility_models: list,
                      log_directory: Path, config_override: dict,
-                     router_args={}):
+                     router_args={}, seed=None):
     for i, model in enumerate(mobility_models):
         ld = log_directory / 'routers' / str(i)
+        rng = None if seed is None else derive_rng(seed, 'router', i)
         Router(str(i),
                interfaces=interfaces,
                model=model,
                log_directory=ld,
                config_override=config_override,
+               rng=rng,
                **router_args)
 
 
@@ -136,7 +330,7 @@ def ffmpeg(result_path: Path, scenario_path: Path):
     source = scenario_path / 'images' / '*.png'
     dest = os.path.join(str(result_path), 'dmpr.mp4')
     cmd = ('ffmpeg',
-           '-framerate', '10',
+           '-framerate', str(FRAMERATE),
            '-pattern_type', 'glob',
            '-i', str(source),
            '-c:v', 'libx264',
@@ -153,41 +347,139 @@ def ffmpeg(result_path: Path, scenario_path: Path):
                     "output and fill a bug report")
 
 
-def _video_blurred(im, no):
-    max_ = 30
-    radius = max_ - no
-    blurred_image = im.filter(ImageFilter.GaussianBlur(radius=radius))
-    return blurred_image
-
-def _text_img(im, text, font, width, height, w, h, no):
-    txt = Image.new('RGBA', im.size, (255,255,255,0))
-    d = ImageDraw.Draw(txt)
-    d.text(((width - w) / 2, (height - h) / 2), text, font=font, fill=(255,255,255,128))
-    return txt
-
-def video_gen_intro(result_path: Path, scenario_path: Path):
-    logger.info("generate promotion video intro now")
-    text = "Dymanic MultiPath Routing"
-    source = os.path.join(str(scenario_path), 'images', '00000.png')
-    # be liberal, skip if no image is available
-    if not os.path.isfile(source):
-        logger.error("No image file for Video intro generation")
-        return
-
-    im = Image.open(source).convert('RGBA')
-    width, height = im.size
-    fnt = ImageFont.truetype('/usr/share/fonts/truetype/ttf-dejavu/DejaVuSans.ttf', 60)
-    w, h = fnt.getsize(text)
-    for i in range(0, 30):
-        im_blur = _video_blurred(im, i)
-        im_text = _text_img(im, text, fnt, width, height, w, h, i)
-        out = Image.alpha_composite(im_blur, im_text)
-        out_file = os.path.join(str(scenario_path), 'images', '{:08}.png'.format(i))
-        out.save(out_file)
-
-    # finally remove the 000000.png image, just because
-    # it will be ordered before any other (blurred) images
-    os.remove(source)
-    logger.info("generate promotion video intro finished")
+class VideoSink(object):
+    """
+    Encode raw ARGB32 frames, as rendered by cairo, with an ffmpeg process
+    reading them from its stdin
+    """
+
+    def __init__(self, dest: Path, resolution: tuple,
+                 framerate: int = FRAMERATE):
+        self.dest = dest
+        # cairo stores the pixels in native byte order
+        pix_fmt = 'bgra' if sys.byteorder == 'little' else 'argb'
+        cmd = ('ffmpeg',
+               '-loglevel', 'error',
+               '-f', 'rawvideo',
+               '-pix_fmt', pix_fmt,
+               '-s', '{}x{}'.format(*resolution),
+               '-framerate', str(framerate),
+               '-i', '-',
+               '-c:v', 'libx264',
+               '-pix_fmt', 'yuv420p',
+               '-y',
+               str(dest))
+        logger.info("streaming video: \"{}\"".format(" ".join(cmd)))
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self.broken = False
+
+    def write(self, data: bytes):
+        """
+        Send a frame to ffmpeg, frames are dropped once ffmpeg has exited,
+        close reports the failure
+        """
+        if self.broken:
+            return
+        try:
+            self.process.stdin.write(data)
+        except BrokenPipeError:
+            logger.error("ffmpeg exited, no more frames are written to "
+                         "\"{}\"".format(self.dest))
+            self.broken = True
+
+    def close(self) -> bool:
+        """
+        Finish the video, returns True on success
+        """
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return self.process.wait() == 0
+
+
+def _raw_to_image(raw: bytes, resolution: tuple):
+    from PIL import Image
+    mode = 'BGRA' if sys.byteorder == 'little' else 'ARGB'
+    return Image.frombuffer('RGBA', resolution, raw, 'raw', mode, 0, 1)
+
+
+def _image_to_raw(image) -> bytes:
+    from PIL import Image
+    if sys.byteorder == 'little':
+        return image.tobytes('raw', 'BGRA')
+    # PIL has no ARGB packer, reorder the bands instead
+    r, g, b, a = image.split()
+    return Image.merge('RGBA', (a, r, g, b)).tobytes()
+
+
+def _title_font(size: int):
+    from PIL import ImageFont
+    for font in TITLE_FONTS:
+        try:
+            return ImageFont.truetype(font, size)
+        except OSError:
+            continue
+    logger.warning("DejaVuSans not found, using the default font")
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow before 10.1 has a single bitmap font
+        return ImageFont.load_default()
+
+
+def _text_layer(resolution: tuple, text: str):
+    """
+    The centered, translucent text on a transparent layer
+    """
+    from PIL import Image, ImageDraw
+    layer = Image.new('RGBA', resolution, (255, 255, 255, 0))
+    draw = ImageDraw.Draw(layer)
+    font = _title_font(60)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    width, height = resolution
+    draw.text(((width - (right - left)) / 2 - left,
+               (height - (bottom - top)) / 2 - top),
+              text, font=font, fill=(255, 255, 255, 128))
+    return layer
+
+
+def blur_sequence(image, radii):
+    """
+    Yield the image blurred with every radius
+
+    Large radii blur a downscaled copy of the image with a correspondingly
+    smaller radius which is scaled back up, the downscaled copies are only
+    computed once for the whole sequence
+    """
+    from PIL import Image, ImageFilter
+    pyramid = [image]
+    for radius in radii:
+        level = 0
+        while radius / 2 ** (level + 1) >= BLUR_MIN_RADIUS:
+            level += 1
+        while len(pyramid) <= level:
+            pyramid.append(pyramid[-1].reduce(2))
+        blurred = pyramid[level].filter(
+            ImageFilter.GaussianBlur(radius=radius / 2 ** level))
+        if level:
+            blurred = blurred.resize(image.size, Image.BILINEAR)
+        yield blurred
+
+
+def title_frames(raw: bytes, resolution: tuple, text: str,
+                 frames: int = TITLE_FRAMES, reverse: bool = False):
+    """
+    Yield the raw frames of an intro which fades from a blurred frame `raw`
+    with the text into the sharp frame, reversed for an outro
+    """
+    image = _raw_to_image(raw, resolution)
+    text_layer = _text_layer(resolution, text)
+    radii = [frames - i for i in range(frames)]
+    if reverse:
+        radii.reverse()
+    from PIL import Image
+    for blurred in blur_sequence(image, radii):
+        yield _image_to_raw(Image.alpha_composite(blurred, text_layer))
 
 
@@ -0,0 +1,19 @@
+import json
+from pathlib import Path
+
+import pytest
+
+
+def _write_trace(path: Path, messages):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w') as f:
+        for time, msg in messages:
+            f.write('{} {}\n'.format(time, json.dumps(msg)))
+
+
+@pytest.fixture
+def write_trace():
+    """
+    Write a tracefile with a (time, message) pair per line
+    """
+    return _write_trace
@@ -44,3 +44,9 @@ class MockArea(object):
     def __init__(self):
         self.width = self.height = 100
         self.models = set()
+
+    def neighbors_changed(self):
+        pass
+
+    def positions_changed(self):
+        pass
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from dmprsim.analyze._utils.cache import AnalysisCache, fingerprint
+
+
+class TestAnalysisCache(object):
+    def test_fingerprint_changes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            file = tmpdir / 'tx.msg'
+            file.write_text('0 {}\n')
+
+            digest = fingerprint(tmpdir, [file], 'len')
+            assert digest == fingerprint(tmpdir, [file], 'len')
+            assert digest != fingerprint(tmpdir, [file], 'zlib', 'len')
+
+            file.write_text('0 {}\n1 {}\n')
+            assert digest != fingerprint(tmpdir, [file], 'len')
+
+    def test_missing_files_ignored(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            assert fingerprint(tmpdir, [tmpdir / 'missing']) == \
+                fingerprint(tmpdir, [])
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            output = tmpdir / 'output'
+
+            cache = AnalysisCache(tmpdir)
+            assert not cache.is_fresh('key', 'digest')
+            cache.update('key', 'digest')
+            cache.save()
+
+            cache = AnalysisCache(tmpdir)
+            assert cache.is_fresh('key', 'digest')
+            assert not cache.is_fresh('key', 'other')
+            assert not cache.is_fresh('key', 'digest', output)
+            output.touch()
+            assert cache.is_fresh('key', 'digest', output)
+
+    def test_corrupt_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            cache = AnalysisCache(tmpdir)
+            with cache.file.open('w') as f:
+                f.write('{"truncated": ')
+            cache = AnalysisCache(tmpdir)
+            assert cache.entries == {}
+
+            # Saving replaces the corrupt file with a valid one
+            cache.update('key', 'digest')
+            cache.save()
+            with cache.file.open() as f:
+                assert json.load(f) == {'key': 'digest'}
+            assert not os.path.exists(str(cache.file) + '.tmp')
@@ -0,0 +1,68 @@
+import collections
+import json
+import tempfile
+from pathlib import Path
+
+from dmprsim.analyze._utils.compress_path import reduce_paths, reduce_msg, \
+    compress_paths
+from dmprsim.analyze._utils.process_messages import process_files, \
+    reduce_paths as reduce_msgs
+
+
+def test_reduce_paths():
+    paths = ['1>wifi0>2', '1>wifi0>2>wifi0>3', '1>tetra0>4', '1>wifi0>2']
+    assert reduce_paths(paths) == ['1>wifi0>2>wifi0>3', '1>tetra0>4']
+
+
+def test_reduce_paths_node_level():
+    # '1>wifi0>2' is a string prefix but no path prefix of '1>wifi0>23'
+    paths = ['1>wifi0>2', '1>wifi0>23']
+    assert reduce_paths(paths) == ['1>wifi0>2', '1>wifi0>23']
+
+
+def test_reduce_msg():
+    msg = {
+        'id': '1',
+        'routing-data': {
+            'lowest-loss': {
+                '2': {'path': '1>wifi0>2'},
+                '3': {'path': '1>wifi0>2>wifi0>3'},
+                '4': None,
+            },
+        },
+    }
+    assert reduce_msg(msg) == {
+        'id': '1',
+        'routing-data': {'lowest-loss': ['1>wifi0>2>wifi0>3']},
+    }
+    assert reduce_msg({'id': '1'}) == {'id': '1'}
+
+
+def test_compress_paths():
+    msg = {'routing-data': {'a': {'2': {'path': '1>w>2'}}}}
+    assert json.loads(compress_paths(json.dumps(msg))) == \
+        {'routing-data': {'a': ['1>w>2']}}
+
+
+def test_process_files_reports_savings():
+    msg = {'routing-data': {'a': {'2': {'path': '1>w>2'},
+                                  '3': {'path': '1>w>2>w>3'}}}}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        tracefile = tmpdir / 'tx.msg'
+        raw = json.dumps(msg, separators=(',', ':'))
+        tracefile.write_text('1 {}\n'.format(raw))
+
+        saved = process_files([tracefile], tmpdir / 'out', ['reduce', 'len'])
+        length = int((tmpdir / 'out').read_text().split()[0])
+        assert saved == len(raw) - length > 0
+
+
+def test_reduce_paths_counts_consumed_messages():
+    msg = json.dumps({'routing-data': {'a': {'2': {'path': '1>w>2'}}}},
+                     separators=(',', ':'))
+    stats = collections.Counter()
+    reduced = reduce_msgs([msg, msg], stats)
+    first = next(reduced)
+    # Counted without exhausting the generator
+    assert stats['saved'] == len(msg) - len(first) > 0
@@ -0,0 +1,54 @@
+from dmprsim.scenarios.convergence import ConvergenceDetector
+
+
+def detector(**kwargs):
+    args = dict(stable_window=10, max_settling=100, min_measure=60,
+                max_measure=300, batch=30)
+    args.update(kwargs)
+    return ConvergenceDetector(**args)
+
+
+def simulate(det, size, churn, seconds):
+    for sec in range(seconds):
+        if det.measuring(sec) or det.measurement_start is None:
+            det.record_message(sec, size(sec))
+        if det.step(sec, churn(sec)):
+            return sec
+    return None
+
+
+def test_converged_network_stops_early():
+    det = detector()
+    stop = simulate(det, lambda sec: 100, lambda sec: int(sec < 5), 1000)
+    # Stable 10s after the last change, then the minimum measurement time
+    assert det.measurement_start == 15
+    assert det.measurement_end == 15 + 60
+    assert stop == det.measurement_end - 1
+
+
+def test_ongoing_churn_waits_for_max_settling():
+    det = detector()
+    simulate(det, lambda sec: 100, lambda sec: 1, 1000)
+    assert det.measurement_start == 100
+
+
+def test_changing_sizes_are_not_stationary():
+    det = detector()
+    simulate(det, lambda sec: 100 + 10 * sec, lambda sec: 0, 1000)
+    assert det.measurement_start == 100
+
+
+def test_noisy_sizes_measure_until_max():
+    det = detector(target=0.001)
+    stop = simulate(det, lambda sec: 100 if sec % 60 < 30 else 200,
+                    lambda sec: 0, 1000)
+    assert det.measurement_end - det.measurement_start == 300
+    assert stop == det.measurement_end - 1
+
+
+def test_measuring():
+    det = detector()
+    assert not det.measuring(0)
+    det.measurement_start = 10
+    assert not det.measuring(9.5)
+    assert det.measuring(10)
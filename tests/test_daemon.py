@@ -0,0 +1,57 @@
+import json
+import multiprocessing
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+from dmprsim.scenarios.daemon import Daemon, request
+
+
+def _wait_for(path: Path):
+    for _ in range(100):
+        if path.exists():
+            return
+        time.sleep(0.05)
+    raise TimeoutError(path)
+
+
+def test_daemon():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        path = tmpdir / 'daemon.sock'
+        daemon = multiprocessing.Process(target=Daemon(path, 2).serve)
+        daemon.start()
+        try:
+            _wait_for(path)
+            # A client which does not send its request does not stall others
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as slow:
+                slow.connect(str(path))
+                slow.sendall(b'{"command": ')
+                pong, = request({'command': 'ping'}, path)
+                assert pong == {'event': 'pong', 'pending': 0, 'running': 0}
+                slow.sendall(b'"ping"}\n')
+                assert json.loads(slow.makefile().readline())['event'] == \
+                    'pong'
+
+            job = {'topology': 'grid', 'name': 'grid',
+                   'parameters': {'size': 2, 'simulation_time': 20},
+                   'scenario_dir': str(tmpdir / 'scenario'),
+                   'results_dir': str(tmpdir / 'results'),
+                   'collectors': ['routing-tables']}
+            events = list(request(job, path))
+            assert events[0]['event'] == 'started'
+            assert events[-1]['event'] == 'result'
+            progress = [e['second'] for e in events
+                        if e['event'] == 'progress']
+            assert progress == sorted(progress) and progress[-1] == 19
+            with (tmpdir / 'results' / 'result.json').open() as f:
+                assert json.load(f)['results'] == events[-1]['results']
+
+            events = list(request(dict(job, unknown=1), path))
+            assert events[-1]['event'] == 'error'
+            assert 'unknown' in events[-1]['error']
+        finally:
+            list(request({'command': 'shutdown'}, path))
+            daemon.join(10)
+        assert not path.exists()
@@ -0,0 +1,40 @@
+import tempfile
+from pathlib import Path
+
+from dmprsim.analyze._utils.dataframe import load_traces, CACHE_FILE
+
+
+def _scenario(write_trace, root: Path, name: str, types: tuple) -> Path:
+    scenario = root / name
+    for router in ('0', '1'):
+        write_trace(scenario / 'routers' / router / 'trace' / 'tx.msg',
+                    [(i, {'id': router, 'type': t})
+                     for i, t in enumerate(types)])
+    return scenario
+
+
+def test_load_traces(write_trace):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        first = _scenario(write_trace, tmpdir, 'first',
+                          ('full', 'partial', 'full'))
+        second = _scenario(write_trace, tmpdir, 'second', ('partial',))
+
+        df = load_traces([first, second], chunk_size=2)
+        assert len(df) == 8
+        assert str(df['router'].dtype) == 'category'
+        assert str(df['type'].dtype) == 'category'
+        assert df['time'].dtype == 'float64'
+        assert sorted(df['run'].unique()) == ['first', 'second']
+        assert list(df[df['run'] == 'second']['type']) == ['partial'] * 2
+        assert (df['type'] == 'full').sum() == 4
+        assert (df['sender'] == df['router']).all()
+        assert (first / CACHE_FILE.format('tx.msg')).exists()
+
+        # The cached result is identical
+        cached = load_traces([first, second])
+        assert cached.equals(df)
+
+        # Changed traces invalidate the cache
+        _scenario(write_trace, tmpdir, 'second', ('partial', 'partial'))
+        assert len(load_traces([first, second])) == 10
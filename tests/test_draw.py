@@ -0,0 +1,85 @@
+import math
+
+import pytest
+
+pytest.importorskip('cairo')
+np = pytest.importorskip('numpy')
+
+from dmprsim.simulator import draw  # noqa: E402
+from dmprsim.simulator.draw import (link_bundles, link_geometry,  # noqa: E402
+                                    node_density)
+from dmprsim.simulator.frames import Frame, Link, Node  # noqa: E402
+
+
+def test_straight_link():
+    points = link_geometry([Link(0, 0, 100, 0, 1, 1, ())])
+    assert np.allclose(points[0], [(0, 0), (0, 0), (100, 0), (100, 0)])
+
+
+def test_parallel_links():
+    points = link_geometry([Link(0, 0, 100, 0, 1, 2, ()),
+                            Link(0, 0, 100, 0, 2, 2, ())])
+    # Both links start and end at the nodes and bend to opposite sides
+    assert np.allclose(points[:, 0], (0, 0))
+    assert np.allclose(points[:, 3], (100, 0))
+    assert np.allclose(points[0, 1:3, 1], -points[1, 1:3, 1])
+    # The start strips are 10 long scaled by the offset
+    strip = np.hypot(*(points[0, 1] - points[0, 0]))
+    assert math.isclose(strip, 10 * math.sqrt(0.5))
+
+
+def test_short_and_degenerate_links():
+    points = link_geometry([Link(0, 0, 3, 0, 1, 3, ()),
+                            Link(5, 5, 5, 5, 1, 1, ())])
+    # The strips are capped and there is no line between them
+    assert np.allclose(points[0, 1], points[0, 2])
+    assert np.hypot(*(points[0, 1] - points[0, 0])) < 3
+    assert np.isnan(points[1]).all()
+
+
+def test_node_density():
+    nodes = [Node(x, y, str(i), None, True, False)
+             for i, (x, y) in enumerate([(1, 1), (9, 9), (11, 1), (35, 5)])]
+    cells, counts = node_density(nodes, 10)
+    assert cells.tolist() == [[0, 0], [1, 0], [3, 0]]
+    assert counts.tolist() == [2, 1, 1]
+
+
+def test_link_bundles():
+    links = [Link(1, 1, 25, 5, 1, 1, ('lowest-loss',)),
+             Link(22, 8, 5, 5, 1, 2, ()),
+             Link(5, 5, 22, 8, 2, 2, ('high-throughput',)),
+             Link(1, 1, 5, 5, 1, 1, ('lowest-loss',))]
+    centers, counts, tos = link_bundles(links, 10)
+    # Both directions end up in one bundle, the link within a cell is left
+    # out
+    assert np.allclose(centers, [[(5, 5), (25, 5)]])
+    assert counts.tolist() == [3]
+    assert tos == [{'lowest-loss', 'high-throughput'}]
+
+
+def test_render_caches_static_nodes():
+    frame = Frame(3, 100, 50, (Node(10, 10, '1', 'tx', True, True),
+                               Node(40, 20, '2', 'rx', True, False)),
+                  (Link(10, 10, 40, 20, 1, 1, ('lowest-loss',)),),
+                  ('lowest-loss',))
+    resolution = (64, 32)
+    draw._layers.clear()
+    draw._last_nodes = None
+    first = bytes(draw.render(frame, resolution).get_data())
+    assert [key[0] for key in draw._layers] == ['background']
+
+    # The nodes did not move, their layers are cached and reused
+    second = bytes(draw.render(frame, resolution).get_data())
+    layers = dict(draw._layers)
+    assert [key[0] for key in layers] == ['background', 'rings', 'nodes']
+    third = bytes(draw.render(frame, resolution).get_data())
+    assert all(draw._layers[key] is layer for key, layer in layers.items())
+    assert first == second == third
+
+    # Moving nodes are drawn directly without new layers
+    for x in (20, 30):
+        moved = frame._replace(nodes=(frame.nodes[0]._replace(x=x),
+                                      frame.nodes[1]))
+        draw.render(moved, resolution)
+    assert draw._layers.keys() == layers.keys()
@@ -0,0 +1,25 @@
+from dmprsim.analyze._utils.duplicate_paths import count_dupl, intern_paths
+
+MSG = {
+    'id': '0',
+    'routing-data': {
+        'a': {'1': {'path': '0>w>1'}, '2': {'path': '0>w>1'}, '3': None},
+        'b': {'1': {'path': '0>w>1'}, '4': {'path': '0>w>4', 'cost': 2}},
+    },
+}
+
+
+def test_count_dupl():
+    assert count_dupl({'id': '0'}) is None
+    assert count_dupl(MSG) == (4, 2)
+
+
+def test_intern_paths():
+    interned = intern_paths(MSG)
+    assert interned['paths'] == ['0>w>1', '0>w>4']
+    assert interned['routing-data'] == {
+        'a': {'1': {'path': 0}, '2': {'path': 0}, '3': None},
+        'b': {'1': {'path': 0}, '4': {'path': 1, 'cost': 2}},
+    }
+    # The original message is not modified
+    assert MSG['routing-data']['a']['1'] == {'path': '0>w>1'}
@@ -0,0 +1,79 @@
+import time
+
+from dmprsim.simulator.frames import FrameRenderer, snapshot
+from dmprsim.simulator.middlewares import RouterForwardedPacketMiddleware, \
+    RouterTransmittedMiddleware
+from dmprsim.simulator.models import MobilityArea, MobilityModel
+
+
+class SnapshotRouter(object):
+    def __init__(self, id_, model):
+        self.id = id_
+        self.model = model
+        model.router = self
+        self.interfaces = {'wifi0': {'range': 20}}
+        self.is_transmitter = id_ == '1'
+        self.is_receiver = id_ == '3'
+
+
+def _slow_square(job):
+    # Later jobs finish first
+    time.sleep(0.01 * (5 - job))
+    return job ** 2
+
+
+class TestFrameRenderer(object):
+    def test_ordered_results(self):
+        results = []
+        renderer = FrameRenderer(_slow_square, processes=3, backlog=2,
+                                 on_frame=results.append)
+        for job in range(5):
+            renderer.submit(job)
+            assert len(renderer.pending) <= 2
+        renderer.close()
+        assert results == [0, 1, 4, 9, 16]
+
+    def test_repeat(self):
+        results = []
+        renderer = FrameRenderer(_slow_square, processes=2, backlog=2,
+                                 on_frame=results.append)
+        renderer.submit(2)
+        for _ in range(3):
+            renderer.repeat()
+            assert len(renderer.pending) <= 2
+        renderer.submit(3)
+        renderer.repeat()
+        renderer.close()
+        assert results == [4, 4, 4, 4, 9, 9]
+
+
+def test_snapshot():
+    area = MobilityArea(100, 100)
+    routers = [SnapshotRouter(str(i), MobilityModel(area, (10 * i, 0)))
+               for i in range(1, 4)]
+    routers[2].model.visible = False
+    RouterTransmittedMiddleware.transmitting_routers = {routers[0]}
+    RouterForwardedPacketMiddleware().forward_packet(
+        routers[1], routers[0], 'wifi0', {'tos': 'lowest-loss'})
+    legend = ['highest-bandwidth']
+    try:
+        frame = snapshot(area, 7, legend)
+    finally:
+        RouterTransmittedMiddleware.reset()
+        RouterForwardedPacketMiddleware.reset()
+
+    assert frame.index == 7 and (frame.width, frame.height) == (100, 100)
+    nodes = {node.id: node for node in frame.nodes}
+    assert nodes['1'].role == 'tx' and nodes['1'].transmitting
+    assert nodes['3'].role == 'rx' and not nodes['3'].visible
+    assert not nodes['2'].transmitting
+
+    # Invisible nodes have no links, every link is captured once
+    link, = frame.links
+    assert {(link.x1, link.y1), (link.x2, link.y2)} == {(10, 0), (20, 0)}
+    assert (link.idx, link.num, link.tos) == (1, 1, ('lowest-loss',))
+    assert frame.legend == ('highest-bandwidth', 'lowest-loss')
+    assert legend == ['highest-bandwidth', 'lowest-loss']
+    # Without a legend only the types of service of the frame are shown
+    assert snapshot(area, 8).legend == ()
+
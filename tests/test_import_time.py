@@ -0,0 +1,55 @@
+"""
+Guard the startup time of the simulator: heavy dependencies must only be
+imported by the features which need them
+"""
+import importlib.util
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ('numpy', 'matplotlib', 'PIL', 'cairo', 'cairocffi', 'seqdiag')
+
+
+def import_times(*args) -> dict:
+    """
+    Return the cumulative import time in seconds of all imported modules,
+    skips the test on Pythons without -X importtime (before 3.7)
+    """
+    result = subprocess.run(
+        (sys.executable, '-X', 'importtime') + args, cwd=str(ROOT),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+        universal_newlines=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1e6
+    if not times:
+        pytest.skip('-X importtime is not supported')
+    return times
+
+
+def check(times: dict):
+    heavy = sorted(name for name in times if name.split('.')[0] in HEAVY)
+    assert not heavy
+
+
+def test_cli_help():
+    check(import_times('dmpr-simulator', '--help'))
+
+
+def test_headless_simulation():
+    try:
+        core = importlib.util.find_spec('core.dmpr')
+    except ImportError:
+        core = None
+    if core is None:
+        pytest.skip('dmpr core is not available')
+    check(import_times('-c', 'import dmprsim.topologies.grid, '
+                             'dmprsim.analyze.random_network, '
+                             'dmprsim.analyze.message_size, '
+                             'dmprsim.analyze.disappearing_node'))
@@ -0,0 +1,34 @@
+import tempfile
+from pathlib import Path
+
+from dmprsim.scenarios.journal import Journal
+
+
+def test_append_and_resume():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'sub' / 'journal'
+        with Journal(path, sync_every=2) as journal:
+            journal.append((1, 2, 0, 3), duration=1.5, peak_rss=100)
+            journal.append((2, 2, 0, 3))
+
+        journal = Journal(path)
+        assert journal.done() == {(1, 2, 0, 3), (2, 2, 0, 3)}
+        assert (1, 2, 0, 3) in journal
+        assert journal.entries[(1, 2, 0, 3)] == {'duration': 1.5,
+                                                 'peak_rss': 100}
+
+
+def test_truncated_tail():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'journal'
+        with Journal(path) as journal:
+            journal.append((1,))
+        with path.open('ab') as f:
+            f.write(b'{"run": [2], "dur')
+
+        with Journal(path) as journal:
+            assert journal.done() == {(1,)}
+            journal.append((3,))
+
+        assert Journal(path).done() == {(1,), (3,)}
+        assert path.read_text().count('\n') == 2
@@ -0,0 +1,95 @@
+import http.client
+import json
+import time
+
+from dmprsim.simulator.live import CLIENT_BACKLOG, LiveServer, delta, \
+    live_state
+from dmprsim.simulator.models import MobilityArea, MobilityModel
+
+
+class LiveRouter(object):
+    def __init__(self, id_, model):
+        self.id = id_
+        self.model = model
+        model.router = self
+        self.interfaces = {'wifi0': {'range': 20}}
+        self.is_transmitter = id_ == '1'
+        self.is_receiver = False
+        self.routing_table = {'lowest-loss': [{}, {}]}
+
+    def get_connected_routers(self, interface_name):
+        return self.model.get_neighbors(self.interfaces[interface_name])
+
+
+def _area():
+    area = MobilityArea(100, 100)
+    for i in range(1, 4):
+        LiveRouter(str(i), MobilityModel(area, (10 * i, 0)))
+    return area
+
+
+def test_live_state_and_delta():
+    area = _area()
+    state = live_state(area)
+    assert state['nodes']['1'] == [10, 0, 'tx', True, False,
+                                   {'lowest-loss': 2}]
+    assert sorted(state['links']) == ['1 2 wifi0', '1 3 wifi0', '2 3 wifi0']
+    assert delta(state, live_state(area)) == {}
+
+    model = next(m for m in area.models if m.router.id == '3')
+    model.visible = False
+    changes = delta(state, live_state(area))
+    assert changes['nodes'] == {'3': [30, 0, None, False, False,
+                                      {'lowest-loss': 2}]}
+    assert changes['links-removed'] == ['1 3 wifi0', '2 3 wifi0']
+    assert 'links' not in changes
+
+
+def test_slow_client_gets_state():
+    area = _area()
+    live = LiveServer(0)
+    try:
+        client = live.connect()
+        for sec in range(CLIENT_BACKLOG + 3):
+            # Never blocks although nobody reads the events
+            live.publish(sec, area)
+        assert client.dropped == 1
+        events = []
+        while not client.events.empty():
+            events.append(json.loads(client.events.get().decode('utf-8')))
+        assert [event['type'] for event in events] == ['state', 'delta']
+    finally:
+        live.close()
+
+
+def test_event_stream():
+    area = _area()
+    live = LiveServer(0)
+    conn = http.client.HTTPConnection(*live.server.server_address)
+    try:
+        conn.request('GET', '/')
+        response = conn.getresponse()
+        assert b'EventSource' in response.read()
+
+        conn.request('GET', '/events')
+        response = conn.getresponse()
+        assert response.getheader('Content-Type') == 'text/event-stream'
+        deadline = time.monotonic() + 5
+        while not live.clients:
+            assert time.monotonic() < deadline, "client never connected"
+            time.sleep(0.01)
+        live.publish(0, area)
+        live.publish(1, area)
+
+        events = []
+        for _ in range(2):
+            line = response.readline()
+            assert line.startswith(b'data: ')
+            events.append(json.loads(line[6:].decode('utf-8')))
+            assert response.readline() == b'\n'
+        assert events[0]['type'] == 'state' and events[0]['width'] == 100
+        assert len(events[0]['nodes']) == 3
+        assert events[1] == {'type': 'delta', 'time': 1}
+    finally:
+        conn.close()
+        live.close()
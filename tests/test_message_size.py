@@ -0,0 +1,155 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from dmprsim.scenarios.journal import Journal
+from dmprsim.scenarios.message_size import MessageSizeScenario
+
+
+def scenario(tmpdir, sizes, threshold=0.1, coarse_step=2):
+    return MessageSizeScenario(object(), Path(tmpdir) / 'results',
+                               Path(tmpdir) / 'scenarios', sizes=sizes,
+                               meshes=[1], losses=[0], intervals=[0, 3],
+                               threshold=threshold, coarse_step=coarse_step)
+
+
+def test_coarse():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sim = scenario(tmpdir, sizes=[5, 1, 2, 3, 4, 6])
+        assert sim._coarse() == {(size, 1, 0, interval)
+                                 for size in (1, 3, 5, 6)
+                                 for interval in (0, 3)}
+
+
+def test_refine_where_results_differ():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sim = scenario(tmpdir, sizes=range(1, 10), coarse_step=4)
+        results = {1: 100, 2: 100, 3: 100, 4: 100, 5: 105, 6: 300, 7: 400,
+                   8: 500, 9: 600}
+        journal = Journal(Path(tmpdir) / 'journal')
+        todo = sim._coarse()
+        runs = 0
+        while todo:
+            for combination in todo:
+                journal.append(combination,
+                               mean_size=results[combination[0]])
+                runs += 1
+            todo = sim._refine(journal)
+        journal.close()
+
+        sizes = {c[0] for c in journal.done()}
+        # The smooth part is skipped, the steep part is fully resolved
+        assert sizes == {1, 5, 6, 7, 8, 9}
+        assert runs < len(sim.all)
+
+
+class NoPool(object):
+    def imap_unordered(self, func, jobs, chunksize=1):
+        assert not jobs
+        return []
+
+
+def test_summary_and_plot_jobs():
+    pytest.importorskip('numpy')
+    from dmprsim.analyze._utils.cache import AnalysisCache
+    from dmprsim.analyze.message_size import accumulate, plot_jobs, summarize
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        for name, sizes in (('1-1-0-0', [10, 20, 20]), ('1-1-5-0', [40]),
+                            ('2-1-0-0', [30])):
+            (tmpdir / name).mkdir()
+            (tmpdir / name / 'len').write_text(
+                ''.join('{}\n'.format(size) for size in sizes))
+        pool = multiprocessing.Pool(1)
+        try:
+            summary = summarize(tmpdir, 'len', pool)
+            assert summary['1-1-0-0']['values'] == [10, 20]
+            assert summary['1-1-0-0']['counts'] == [1, 2]
+        finally:
+            pool.close()
+            pool.join()
+        # Unchanged directories are not read again
+        assert summarize(tmpdir, 'len', NoPool()) == summary
+
+        cache = AnalysisCache(tmpdir)
+        jobs = plot_jobs(summary, tmpdir, 'len', 'density', 'size',
+                         {'interval': '*', 'loss': '*'}, cache,
+                         formats=('png', 'svg'))
+        (job, keys, digest), = jobs
+        chartgroup, datapoint, xaxis, points, outputs = job
+        assert (chartgroup, datapoint, xaxis) == ('density', 1, 'size')
+        assert keys == ['density-1-size-len.png', 'density-1-size-len.svg']
+        points = dict(points)
+        x, min_, _, avg, _, max_ = accumulate(points[1], 1)
+        assert (x, min_, avg, max_) == (1, 10, 22.5, 40)
+        assert not accumulate(points[3], 3)
+
+        for key in keys:
+            (tmpdir / key).touch()
+            cache.update(key, digest)
+        assert not plot_jobs(summary, tmpdir, 'len', 'density', 'size',
+                             {'interval': '*', 'loss': '*'}, cache,
+                             formats=('png', 'svg'))
+
+
+def test_accumulate_matches_samples():
+    np = pytest.importorskip('numpy')
+    from dmprsim.analyze.message_size import accumulate
+
+    histograms = [([10, 20, 35], [1, 2, 0]), ([5, 20, 40], [2, 1, 2])]
+    # The percentiles fall between two samples
+    sizes = [10, 20, 20, 5, 5, 20, 40, 40]
+    x, min_, perc25, avg, perc75, max_ = accumulate(histograms, 7)
+    assert (x, min_, max_) == (7, 5, 40)
+    assert avg == pytest.approx(np.average(sizes))
+    assert perc25 == pytest.approx(np.percentile(sizes, 25))
+    assert perc75 == pytest.approx(np.percentile(sizes, 75))
+    assert not accumulate([([3], [0])], 7)
+
+
+def test_queued_runs_are_journaled(monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sim = scenario(tmpdir, sizes=[1, 2], threshold=None)
+        # Small networks are estimated to need 2 GB
+        sim.args = argparse.Namespace(queue=True, max_ram=2, processes=8)
+        monkeypatch.setattr(MessageSizeScenario, '_run',
+                            lambda self, combination: combination[0] * 10)
+        sim.start()
+        assert 'Starting 1 local workers' in caplog.text
+
+        with Journal(sim.journal_file) as journal:
+            assert journal.done() == sim.all
+            assert all(entry['mean_size'] == run[0] * 10
+                       for run, entry in journal.entries.items())
+
+
+def test_killed_run_is_rerun_on_resume(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sim = scenario(tmpdir, sizes=[1, 2], threshold=None)
+        sim.args = argparse.Namespace(max_ram=4)
+        killed = Path(tmpdir) / 'killed'
+
+        def run(self, combination):
+            if combination == (2, 1, 0, 3) and not killed.exists():
+                # Like the out of memory killer, but only the first time
+                killed.touch()
+                os.kill(os.getpid(), signal.SIGKILL)
+            return combination[0] * 10
+
+        monkeypatch.setattr(MessageSizeScenario, '_run', run)
+        sim.start()
+        with Journal(sim.journal_file) as journal:
+            assert journal.done() == sim.all - {(2, 1, 0, 3)}
+
+        sim.start()
+        with Journal(sim.journal_file) as journal:
+            assert journal.done() == sim.all
+            assert journal.entries[(2, 1, 0, 3)]['mean_size'] == 20
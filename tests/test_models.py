@@ -1,5 +1,6 @@
 from dmprsim.simulator.models import TimeWrapper, MobilityArea, \
-    MovingMobilityModel, MobilityModel
+    MovingMobilityModel, MobilityModel, RandomVelocity
+from dmprsim.simulator.rng import derive_rng
 
 from tests.mocks import MockRouter, MockModel, MockArea
 
@@ -53,6 +54,40 @@ class TestMobilityArea(object):
         assert area.get_neighbors(m1, interface_long_enough) == expected
         assert area.get_neighbors(m1, interface_exact) == expected
 
+    def test_get_neighbors_visibility(self):
+        area = MobilityArea(100, 100)
+        m1 = MobilityModel(area, (0, 0))
+        m2 = MobilityModel(area, (0, 10))
+        m1.router, m2.router = object(), object()
+        interface = {'range': 20}
+        assert area.get_neighbors(m1, interface) == {m2.router}
+        m2.visible = False
+        assert area.get_neighbors(m1, interface) == set()
+        m2.visible = True
+        assert area.get_neighbors(m1, interface) == {m2.router}
+
+    def test_get_neighbors_after_move(self):
+        area = MobilityArea(100, 100)
+        m1 = MobilityModel(area, (0, 0))
+        m2 = MovingMobilityModel(area, (0, 10), velocity=lambda: 20)
+        MockRouter(m1)
+        MockRouter(m2)
+        interface = {'range': 20}
+        assert area.get_neighbors(m1, interface) == {m2.router}
+        # Moving out of range within a step updates the neighbors right away
+        m2.step()
+        assert area.get_neighbors(m1, interface) == set()
+
+    def test_get_pairs(self):
+        area = MobilityArea(100, 100)
+        m1 = MobilityModel(area, (0, 0))
+        m2 = MobilityModel(area, (0, 10))
+        m3 = MobilityModel(area, (30, 10))
+        for i, model in enumerate((m2, m1, m3)):
+            MockRouter(model).id = i
+        m3.visible = False
+        assert list(area.get_pairs()) == [(m2, m1, 10)]
+
 
 class TestMobilityModel(object):
     def _get_model(self):
@@ -111,3 +146,15 @@ class TestMovingMobilityModel(object):
         model.step()
         assert model.router.stepped
         assert model.coordinates() == (1, 1)
+
+    def test_velocity_from_model_stream(self):
+        rng = derive_rng(1, 'model', 0)
+        expected = derive_rng(1, 'model', 0)
+        model = MovingMobilityModel(MockArea(), coords=(0, 0),
+                                    velocity=RandomVelocity(exponent=2),
+                                    rng=rng)
+        # The first draw decides whether the model disappears
+        expected.random()
+        assert model.velocity == (expected.random() ** 2,
+                                  expected.random() ** 2)
+        assert model.rng is rng
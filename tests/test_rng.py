@@ -0,0 +1,13 @@
+from dmprsim.simulator.rng import derive_rng
+
+
+def test_derive_rng():
+    draws = [derive_rng(1, 'model', 3).random() for _ in range(2)]
+    assert draws[0] == draws[1]
+    assert derive_rng(1, 'model', 3).random() != \
+        derive_rng(1, 'model', 4).random()
+    assert derive_rng(1, 'model', 3).random() != \
+        derive_rng(2, 'model', 3).random()
+    # Names are compared by their string representation
+    assert derive_rng(1, 'model', 3).random() == \
+        derive_rng(1, 'model', '3').random()
@@ -1,5 +1,6 @@
 import contextlib
 import copy
+import json
 import tempfile
 
 import pathlib
@@ -69,6 +70,17 @@ class TestRouter(object):
             network = router.get_random_network()
             assert network in router.networks
 
+    def test_relocate(self):
+        with self._get_router() as router, \
+                tempfile.TemporaryDirectory() as other:
+            other = pathlib.Path(other) / 'routers' / '1'
+            router.relocate(other)
+            assert router.log_directory == other
+            assert router.tracer.directory == other / 'trace'
+            config = json.loads((other / 'config').read_text())
+            assert config['id'] == '1'
+            assert config == router.config
+
     def test_get_neighbors(self):
         with self._get_router() as router:
             assert router.get_connected_routers('wifi0') == {router}
@@ -0,0 +1,82 @@
+import os
+import signal
+
+import pytest
+
+from dmprsim.scenarios.scheduler import MemoryScheduler, GB
+
+
+MB = 1024 ** 2
+
+
+def _square(job):
+    # Touch some memory, the usage of the job is measured without the pages
+    # inherited from the scheduler
+    memory = b'x' * (32 * MB)
+    return job[1] ** 2 + memory.count(b'y')
+
+
+def _square_or_die(job):
+    if job[1] < 0:
+        # Like the out of memory killer
+        os.kill(os.getpid(), signal.SIGKILL)
+    return _square(job)
+
+
+def _divide(job):
+    return 1 / job[1]
+
+
+def _prior(key, observed):
+    return GB
+
+
+class TestMemoryScheduler(object):
+    def test_run(self):
+        scheduler = MemoryScheduler(budget=2 * GB, key=lambda job: job[0],
+                                    prior=_prior, processes=2)
+        jobs = [('a', i) for i in range(4)] + [('b', i) for i in range(4)]
+        results = {job: result for job, result, _ in
+                   scheduler.run(_square, jobs)}
+        assert results == {job: job[1] ** 2 for job in jobs}
+        assert set(scheduler.observed) == {'a', 'b'}
+        assert all(peak >= 16 * MB for peak in scheduler.observed.values())
+
+    def test_oversized_job_runs_alone(self):
+        scheduler = MemoryScheduler(budget=GB // 2, key=lambda job: job[0],
+                                    prior=_prior, processes=2)
+        (job, result, usage), = scheduler.run(_square, [('a', 3)])
+        assert (job, result) == (('a', 3), 9)
+        assert usage.peak_rss >= 16 * MB and usage.duration >= 0
+
+    def test_predict_and_pick(self):
+        scheduler = MemoryScheduler(budget=4 * GB, key=lambda job: job,
+                                    prior=_prior, margin=1.5)
+        assert scheduler.predict('a') == GB
+        scheduler.observe('a', GB)
+        scheduler.observe('a', GB // 2)
+        assert scheduler.predict('a') == int(1.5 * GB)
+
+        scheduler.observe('b', 2 * GB)
+        pending = {'a': [], 'b': [], 'c': []}
+        assert scheduler._pick(pending, 4 * GB) == 'b'
+        assert scheduler._pick(pending, 2 * GB) == 'a'
+        assert scheduler._pick(pending, GB // 2) is None
+
+    def test_killed_worker_fails_job(self):
+        scheduler = MemoryScheduler(budget=2 * GB, key=lambda job: job[0],
+                                    prior=_prior, processes=2)
+        results = {job: (result, usage) for job, result, usage in
+                   scheduler.run(_square_or_die, [('a', 2), ('b', -1)])}
+        assert results[('a', 2)][0] == 4
+        assert results[('a', 2)][1].exitcode == 0
+        result, usage = results[('b', -1)]
+        assert result is None and usage.peak_rss is None
+        assert usage.exitcode == -signal.SIGKILL
+        assert set(scheduler.observed) == {'a'}
+
+    def test_exception_is_reraised(self):
+        scheduler = MemoryScheduler(budget=2 * GB, key=lambda job: job[0],
+                                    prior=_prior, processes=1)
+        with pytest.raises(ZeroDivisionError):
+            list(scheduler.run(_divide, [('a', 0)]))
@@ -0,0 +1,31 @@
+import tempfile
+from pathlib import Path
+
+from dmprsim.analyze.disappearing_node import diagram_source, \
+    window_messages, windows
+from dmprsim.scenarios.disappearing_node import SIMULATION_TIME
+
+
+def test_windows():
+    consecutive = windows(500)
+    assert consecutive == [(0, 500), (500, 1000), (1000, SIMULATION_TIME)]
+    assert windows(60, around_events=True) == [(270, 330), (870, 930)]
+
+
+def test_window_messages():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tracefiles = []
+        for router, times in (('a', (1, 5, 9)), ('b', (2, 3, 6))):
+            tracefile = Path(tmpdir) / router
+            tracefile.write_text(''.join(
+                '{}.0 {{"id": "x", "type": "full"}}\n'.format(time)
+                for time in times))
+            tracefiles.append((router, tracefile))
+        tracefiles.append(('c', Path(tmpdir) / 'missing'))
+
+        messages = window_messages(tracefiles, 2, 6)
+    assert [(time, router) for time, router, _ in messages] == [
+        ('2.0', 'b'), ('3.0', 'b'), ('5.0', 'a')]
+    source = diagram_source(['a', 'b', 'c'], messages)
+    assert 'a;b;c;' in source
+    assert 'x -> a [label="5.0\nfull\n"]' in source
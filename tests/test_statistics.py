@@ -0,0 +1,17 @@
+import pytest
+
+from dmprsim.analyze._utils.statistics import mean_confidence_interval
+
+
+def test_mean_confidence_interval():
+    n, mean, lower, upper = mean_confidence_interval([1, 2, 3, None])
+    assert (n, mean) == (3, 2)
+    # standard error is 1 / sqrt(3), t quantile for 2 degrees of freedom
+    assert lower == pytest.approx(2 - 4.303 / 3 ** 0.5)
+    assert upper == pytest.approx(2 + 4.303 / 3 ** 0.5)
+
+
+def test_degenerate():
+    assert mean_confidence_interval([]) == (0, None, None, None)
+    assert mean_confidence_interval([5]) == (1, 5, None, None)
+    assert mean_confidence_interval([5, 5]) == (2, 5, 5, 5)
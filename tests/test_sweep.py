@@ -0,0 +1,51 @@
+import pytest
+
+from dmprsim.scenarios.sweep import expand_runs, validate_spec, _convert
+from dmprsim.simulator import ConstantVelocity, RandomVelocity
+from dmprsim.topologies.grid import GridTopology
+from dmprsim.topologies.randomized import RandomTopology
+from dmprsim.scenarios.sweep import get_topology_cls
+
+
+def test_expand_runs():
+    spec = {
+        'name': 'test',
+        'topology': 'grid',
+        'parameters': {'size': [2, 3], 'range_factor': [1]},
+        'fixed': {'simulation_time': 10},
+        'seeds': [1, 2],
+    }
+    runs = expand_runs(spec)
+    assert list(runs) == [
+        'range_factor=1,size=2,seed=1', 'range_factor=1,size=2,seed=2',
+        'range_factor=1,size=3,seed=1', 'range_factor=1,size=3,seed=2',
+    ]
+    assert runs['range_factor=1,size=3,seed=2'] == {
+        'simulation_time': 10, 'size': 3, 'range_factor': 1,
+        'random_seed_prep': 2, 'random_seed_runtime': 2,
+    }
+    assert list(expand_runs({'name': 'test', 'topology': 'grid'})) == \
+        ['default']
+
+
+def test_validate_spec():
+    validate_spec({'name': 'test', 'topology': 'grid'})
+    with pytest.raises(ValueError):
+        validate_spec({'name': 'test', 'topology': 'grid', 'typo': 1})
+    with pytest.raises(ValueError):
+        validate_spec({'name': 'test', 'topology': 'grid',
+                       'collectors': ['nonexistant']})
+    assert get_topology_cls('grid') is GridTopology
+    assert get_topology_cls('randomized') is RandomTopology
+    assert get_topology_cls(
+        'dmprsim.topologies.randomized:RandomTopology') is RandomTopology
+    with pytest.raises(ValueError):
+        get_topology_cls('utils')
+
+
+def test_convert():
+    assert isinstance(_convert('velocity', 1), ConstantVelocity)
+    velocity = _convert('velocity', {'exponent': 6, 'scale': 0})
+    assert isinstance(velocity, RandomVelocity)
+    assert velocity() == 0
+    assert _convert('area', [1, 2]) == (1, 2)
@@ -0,0 +1,52 @@
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from dmprsim.analyze._utils.trace_index import import_scenario, query
+
+
+def test_import_and_query(write_trace):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        run = tmpdir / '3-2-0-1' / 'routers'
+        big = {'id': '0', 'type': 'full',
+               'routing-data': {'a': {str(i): {'path': '0>w>{}'.format(i)}
+                                      for i in range(20)}}}
+        small = {'id': '0', 'type': 'partial', 'routing-data': {}}
+        write_trace(run / '0' / 'trace' / 'tx.msg',
+                    [(299, big), (300, small), (350, big)])
+        write_trace(run / '1' / 'trace' / 'rx.msg.valid',
+                    [(1, small), (2, big), (3, big)])
+        database = tmpdir / 'trace.db'
+
+        assert import_scenario(tmpdir, database) == 6
+        # Importing again replaces the run
+        assert import_scenario(tmpdir, database) == 6
+
+        assert query(database, 'large-messages', start=300, end=400,
+                     min_size=100) == [('3-2-0-1', '0', 1, len(
+                         json.dumps(big)))]
+        assert query(database, 'first-learned', router='1', node='7') == \
+            [('3-2-0-1', 2.0)]
+        assert query(database, 'first-learned', router='1', node='0') == \
+            [('3-2-0-1', 1.0)]
+
+
+def test_known_nodes_keep_first_time(write_trace):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        msg = {'id': '0', 'type': 'full',
+               'routing-data': {'a': {'7': {'path': '0>w>7'}}}}
+        write_trace(tmpdir / 'run' / 'routers' / '1' / 'trace' /
+                    'rx.msg.valid', [(5, msg), (2, msg), (9, msg)])
+        database = tmpdir / 'trace.db'
+        import_scenario(tmpdir, database)
+
+        conn = sqlite3.connect(str(database))
+        try:
+            rows = conn.execute("SELECT node, time FROM known_nodes "
+                                "ORDER BY node").fetchall()
+        finally:
+            conn.close()
+        assert rows == [('0', 2.0), ('7', 2.0)]
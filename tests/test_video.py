@@ -0,0 +1,82 @@
+import os
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from dmprsim.topologies.utils import VideoSink, title_frames
+
+# Stands in for ffmpeg, saves its arguments and stdin
+FAKE_FFMPEG = """#!{}
+import sys
+dest = sys.argv[-1]
+with open(dest, 'wb') as f:
+    f.write(sys.stdin.buffer.read())
+with open(dest + '.args', 'w') as f:
+    f.write(' '.join(sys.argv[1:]))
+"""
+
+
+def test_video_sink(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        ffmpeg = tmpdir / 'ffmpeg'
+        ffmpeg.write_text(FAKE_FFMPEG.format(sys.executable))
+        ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv('PATH', '{}{}{}'.format(
+            tmpdir, os.pathsep, os.environ.get('PATH', '')))
+
+        sink = VideoSink(tmpdir / 'dmpr.mp4', (4, 2))
+        frames = [bytes([i]) * 4 * 4 * 2 for i in range(3)]
+        for frame in frames:
+            sink.write(frame)
+        assert sink.close()
+
+        assert (tmpdir / 'dmpr.mp4').read_bytes() == b''.join(frames)
+        args = (tmpdir / 'dmpr.mp4.args').read_text().split()
+        assert args[args.index('-s') + 1] == '4x2'
+        assert args[args.index('-i') + 1] == '-'
+
+
+def test_video_sink_ffmpeg_exits(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        ffmpeg = tmpdir / 'ffmpeg'
+        ffmpeg.write_text('#!/bin/sh\nexit 1\n')
+        ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv('PATH', '{}{}{}'.format(
+            tmpdir, os.pathsep, os.environ.get('PATH', '')))
+
+        sink = VideoSink(tmpdir / 'dmpr.mp4', (4, 2))
+        sink.process.wait()
+        # More than the pipe buffer, stdin is buffered
+        for _ in range(64):
+            sink.write(bytes(4 * 4 * 2 * 1024))
+        assert sink.broken
+        assert not sink.close()
+
+
+def test_title_frames():
+    pytest.importorskip('PIL')
+    resolution = (64, 48)
+    # An opaque frame with a bright square in the middle
+    raw = bytearray(b'\x20\x20\x20\xff' * 64 * 48)
+    for y in range(16, 32):
+        for x in range(24, 40):
+            offset = 4 * (64 * y + x)
+            raw[offset:offset + 3] = b'\xff\xff\xff'
+    raw = bytes(raw)
+
+    intro = list(title_frames(raw, resolution, 'DMPR', frames=10))
+    assert len(intro) == 10
+    assert all(len(frame) == len(raw) for frame in intro)
+    # The blur decreases frame by frame
+    square = 4 * (64 * 24 + 32)
+    brightness = [frame[square] for frame in intro]
+    assert brightness == sorted(brightness) and brightness[0] < 0xff
+
+    outro = list(title_frames(raw, resolution, 'DMPR', frames=10,
+                              reverse=True))
+    assert outro == intro[::-1]
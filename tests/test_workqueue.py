@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from pathlib import Path
+
+from dmprsim.scenarios.workqueue import WorkQueue
+
+
+def _job(run):
+    if run == (3, 'fail'):
+        raise ValueError('broken')
+    time.sleep(0.01)
+    return {'pid': os.getpid(), 'square': run[0] ** 2}
+
+
+def test_local_workers():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(Path(tmpdir) / 'queue', poll_interval=0.01)
+        runs = [(i, 'x') for i in range(20)] + [(3, 'fail')]
+        queue.put(runs)
+        queue.put(runs[:5])
+
+        workers = [multiprocessing.Process(target=queue.work, args=(_job,))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        entries = queue.entries
+        assert set(entries) == set(runs[:-1])
+        assert all(e['square'] == run[0] ** 2 for run, e in entries.items())
+        assert len({e['pid'] for e in entries.values()}) > 1
+        assert list(queue.failed()) == ['3-fail']
+        assert not queue.pending()
+
+        # Finished and failed runs are not queued again
+        queue.put(runs)
+        assert not queue.pending()
+
+
+def test_expired_lease():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(Path(tmpdir) / 'queue', lease=60)
+        queue.put([(1,), (2,)])
+        # A worker claims a job and dies
+        name, run = queue.claim()
+        assert queue.requeue_expired() == 0
+
+        claimed = queue.dirs['claimed'] / name
+        os.utime(str(claimed), (time.time() - 120, time.time() - 120))
+        assert queue.requeue_expired() == 1
+
+        queue.work(lambda run: {})
+        assert queue.done() == {(1,), (2,)}
+        assert run in queue
+
+
+def test_expired_lease_attempts():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(Path(tmpdir) / 'queue', lease=60, max_attempts=2)
+        queue.put([(1,)])
+        # The job kills every worker which claims it
+        for _ in range(2):
+            name, _ = queue.claim()
+            claimed = queue.dirs['claimed'] / name
+            os.utime(str(claimed), (time.time() - 120, time.time() - 120))
+            assert queue.requeue_expired() == 1
+
+        assert queue.claim() is None
+        assert not queue.pending()
+        assert queue.failed()['1']['attempts'] == 2
+
+
+def _kill_or_square(run):
+    if run == (2,):
+        # Like the out of memory killer
+        os.kill(os.getpid(), signal.SIGKILL)
+    return {'square': run[0] ** 2}
+
+
+def test_killed_job_is_retried_and_failed():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(Path(tmpdir) / 'queue', poll_interval=0.01,
+                          max_attempts=2)
+        queue.put([(1,), (2,), (3,)])
+        # The worker survives its killed jobs
+        queue.work(_kill_or_square)
+        assert queue.done() == {(1,), (3,)}
+        assert queue.failed()['2']['attempts'] == 2
+        assert all(e['peak_rss'] >= 0 for e in queue.entries.values())
+        assert not queue.pending()